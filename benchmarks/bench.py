@@ -0,0 +1,184 @@
+"""
+Offline benchmarks of the parsing and helper hot paths, run against synthetic datasets through a stubbed client.
+
+usage:
+- python -m benchmarks.bench                      # 1k and 10k rows, compared to the saved baseline if there is one
+- python -m benchmarks.bench --sizes 1000 10000 100000 --save
+- python -m benchmarks.bench --only show_physicians _search_schema
+
+Each benchmark reports the best time of --repeat runs, rows processed per second and the peak memory allocated by a
+separate run under tracemalloc. With a baseline, benchmarks that got slower (or use more memory) by more than
+--threshold are flagged and the exit status is 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from echo_api.api import Helpers
+
+from .fixtures import TABLES, stub_connection
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+CONTACT_LOG_ENTRY = {
+    'FollowUpCompleted': 'false',
+    'ContactLogTypeId': '1',
+    'Notes': 'Left a message about the missing DEA certificate.',
+    'Subject': 'Application follow up',
+    'ContactDate': '2018-03-01T09:30:00',
+}
+
+
+def benchmarks(connection, rows):
+    """
+
+    :param connection: connection built by fixtures.stub_connection
+    :param rows: (int) number of rows in each fixture table
+    :return: (OrderedDict) {name: (function, rows processed per call)}
+    """
+    physicians = connection.client.service.datasets['PhysicianDetail']
+    physician = connection.client.service.single_rows['PhysicianDetail']
+    typed = stub_connection(rows, typed_rows=True)
+    compact = stub_connection(rows, compact_rows=True)
+    return OrderedDict([
+        ('_search_schema', (lambda: Helpers._search_schema(physicians, PhysicianID__ne=-1), rows)),
+        ('_search_schema_last', (lambda: Helpers._search_schema(physicians, show_all=False, PhysicianID__ne=-1), rows)),
+        ('_search_schema_typed', (lambda: Helpers._search_schema(physicians, typed=True, PhysicianID__ne=-1), rows)),
+        ('_search_schema_compact', (
+            lambda: Helpers._search_schema(physicians, compact=True, PhysicianID__ne=-1), rows)),
+        ('show_physician', (lambda: connection.show_physician(1), 1)),
+        ('show_physicians', (lambda: connection.show_physicians(), rows)),
+        ('show_physicians_typed', (lambda: typed.show_physicians(), rows)),
+        ('show_physicians_compact', (lambda: compact.show_physicians(), rows)),
+        ('show_office', (lambda: connection.show_office(1), 1)),
+        ('show_offices', (lambda: connection.show_offices(), rows)),
+        ('show_practices', (lambda: connection.show_practices(), rows)),
+        ('show_physician_medical_licenses', (lambda: connection.show_physician_medical_licenses(1), rows)),
+        ('show_medical_licenses', (lambda: connection.show_medical_licenses(), rows)),
+        ('show_physician_contact_log', (lambda: connection.show_physician_contact_log(1), rows)),
+        ('show_contact_logs', (lambda: connection.show_contact_logs(), rows)),
+        ('show_contact_logs_typed', (lambda: typed.show_contact_logs(), rows)),
+        ('edit_physician_xml', (lambda: Helpers._set_table_values(physician, FirstName='Jane', LastName='Doe'), 1)),
+        ('edit_physician', (lambda: connection.edit_physician(1, FirstName='Jane', LastName='Doe'), 1)),
+        # the default downloads the contact log and uploads it again with the entry appended
+        ('add_contact_log_entry', (lambda: connection.add_contact_log_entry(1, **CONTACT_LOG_ENTRY), rows)),
+        ('add_contact_log_entry_append_only', (
+            lambda: connection.add_contact_log_entries(1, [CONTACT_LOG_ENTRY], append_only=True), 1)),
+    ])
+
+
+def measure(function, repeat):
+    """
+
+    :param function: (callable) the benchmark
+    :param repeat: (int) number of timed runs
+    :return: (dict) best and median seconds per call and peak bytes allocated during one call
+    """
+    function()  # warm up caches (guid, screen schema) the way a long running process would have them
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times.sort()
+    return {'best': times[0], 'median': times[len(times) // 2], 'peak_bytes': peak}
+
+
+def run(sizes, repeat, only=None, out=sys.stdout):
+    """
+
+    :param sizes: (list of int) number of rows in each fixture table
+    :param repeat: (int) number of timed runs per benchmark
+    :param only: (list of str, optional) names of the benchmarks to run
+    :param out: (file) where progress is written
+    :return: (dict) {"<name>@<rows>": measurement}
+    """
+    results = OrderedDict()
+    for rows in sizes:
+        connection = stub_connection(rows)
+        for name, (function, processed) in benchmarks(connection, rows).items():
+            if only and name not in only:
+                continue
+            # fewer repetitions for the large fixtures, they are slow enough to time accurately
+            result = measure(function, max(1, repeat if rows <= 10000 else repeat // 3))
+            result['rows'] = processed
+            result['rows_per_second'] = processed / result['best'] if result['best'] else float('inf')
+            results['{name}@{rows}'.format(name=name, rows=rows)] = result
+            out.write('{key:<45} {best:>10.2f} ms {rate:>14,.0f} rows/s {peak:>10.1f} MiB\n'.format(
+                key='{name}@{rows}'.format(name=name, rows=rows), best=result['best'] * 1000,
+                rate=result['rows_per_second'], peak=result['peak_bytes'] / 2 ** 20))
+            out.flush()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+
+    :param results: (dict) returned by run
+    :param baseline: (dict) results saved by an earlier run
+    :param threshold: (float) allowed relative increase, ex: 0.2 for 20%
+    :return: (list of str) one line per regression
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in ('best', 'peak_bytes'):
+            if before[metric] and result[metric] > before[metric] * (1 + threshold):
+                regressions.append('{key}: {metric} {before:.4g} -> {after:.4g} (+{change:.0%})'.format(
+                    key=key, metric=metric, before=before[metric], after=result[metric],
+                    change=result[metric] / before[metric] - 1))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='rows per fixture table')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--only', nargs='+', help='names of the benchmarks to run')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file to compare to or save')
+    parser.add_argument('--save', action='store_true', help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative slowdown flagged as a regression')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.only or ()) - set(benchmarks(stub_connection(0), 0))
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(', '.join(sorted(unknown))))
+
+    results = run(args.sizes, args.repeat, args.only)
+    status = 0
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            sys.stdout.write('\nregressions against {path}:\n'.format(path=args.baseline))
+            sys.stdout.write(''.join('  {}\n'.format(line) for line in regressions))
+            status = 1
+        else:
+            sys.stdout.write('\nno regressions against {path}\n'.format(path=args.baseline))
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'tables': list(TABLES),
+                       'results': results}, baseline_file, indent=2)
+        sys.stdout.write('\nbaseline saved to {path}\n'.format(path=args.baseline))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+A local stand-in for Echo's OneAppWebService, serving the operations echo_api uses over an in-memory copy of the
+PhysicianDetail, Offices, MedicalLicenses and ContactLog tables. It speaks SOAP 1.1 document/literal like the real
+service, reading arguments by position, so it can be used with the bundled fake_echo.wsdl or with your tenant's own
+WSDL.
+
+usage:
+- python -m benchmarks.fake_echo --port 8080 --rows 10000 --latency 0.02
+- then point wsdl_location in echo.conf at http://localhost:8080/OneAppWebService.svc?singleWsdl; the WSDL it serves
+  has its soap:address rewritten to the fake server. Add --wsdl /path/to/wsdl.xml to serve your tenant's WSDL instead.
+
+API_GeneralQuery understands the SQL that echo_api generates: SELECT [TOP n] columns FROM table [WHERE conditions
+joined by AND] [ORDER BY column [DESC]], where a condition is column op value (=, <>, !=, <, <=, >, >=, against a
+number, a quoted string or another column) or column IN (values).
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from os import path
+from xml.sax.saxutils import escape
+
+from . import fixtures
+
+WSDL_PATH = path.join(path.dirname(path.abspath(__file__)), 'fake_echo.wsdl')
+SOAP_NS = 'http://schemas.xmlsoap.org/soap/envelope/'
+DIFFGRAM_NS = 'urn:schemas-microsoft-com:xml-diffgram-v1'
+
+PRIMARY_KEYS = {
+    'PhysicianDetail': 'PhysicianID',
+    'Offices': 'OfficeID',
+    'MedicalLicenses': 'AutoID',
+    'ContactLog': 'CallID',
+}
+# screen: (table, parameter that selects its rows, parameter type)
+SCREENS = {
+    'PhysicianDetail': ('PhysicianDetail', 'PhysicianID', 'int'),
+    'Office': ('Offices', 'OfficeID', 'int'),
+    'MedicalLicenses': ('MedicalLicenses', 'PhysicianID', 'int'),
+    'CallLog': ('ContactLog', 'EntityGuid', 'guid'),
+}
+
+QUERY = re.compile(r'^\s*SELECT\s+(?:TOP\s+(\d+)\s+)?(.+?)\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?'
+                   r'(?:\s+ORDER\s+BY\s+(\w+)(\s+DESC|\s+ASC)?)?\s*$', re.IGNORECASE | re.DOTALL)
+CONDITION = re.compile(r"^\s*(\w+)\s*(=|<>|!=|<=|>=|<|>)\s*('(?:[^']|'')*'|-?\d+|\w+)\s*$")
+IN_CONDITION = re.compile(r'^\s*(\w+)\s+IN\s*\((.*)\)\s*$', re.IGNORECASE | re.DOTALL)
+COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+class QueryError(Exception):
+    pass
+
+
+def _comparable(value):
+    # integers compare as numbers, everything else case-insensitively as text, like SQL Server's default collation
+    try:
+        return 0, int(value)
+    except (TypeError, ValueError):
+        return 1, str(value).lower()
+
+
+def _literal(token):
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    return token
+
+
+class EchoData:
+    """
+    The in-memory tables behind the fake service, generated with benchmarks.fixtures. Every physician has an equal
+    share of the medical licenses and contact log entries.
+    """
+
+    def __init__(self, rows=1000):
+        """
+
+        :param rows: (int) number of rows in each table
+        """
+        self.lock = threading.RLock()
+        self.tables = {}
+        for table in fixtures.TABLES:
+            self.tables[table] = OrderedDict(
+                (int(row[PRIMARY_KEYS[table]]), row) for row in fixtures.rows(table, rows))
+        for number, row in self.tables['MedicalLicenses'].items():
+            row['PhysicianID'] = str((number - 1) % rows + 1)
+        for number, row in self.tables['ContactLog'].items():
+            row['EntityGuid'] = fixtures.physician_guid((number - 1) % rows + 1)
+
+    def _next_key(self, table):
+        return max(self.tables[table], default=0) + 1
+
+    @staticmethod
+    def _condition(text):
+        text = text.strip()
+        while text.startswith('(') and text.endswith(')') and not IN_CONDITION.match(text):
+            text = text[1:-1].strip()
+        match = IN_CONDITION.match(text)
+        if match:
+            column, values = match.groups()
+            values = set(_comparable(_literal(value.strip())) for value in values.split(',') if value.strip())
+            return lambda row: row.get(column) is not None and _comparable(row[column]) in values
+        match = CONDITION.match(text)
+        if not match:
+            raise QueryError('Unsupported condition: {text}'.format(text=text))
+        column, op, token = match.groups()
+        compare = COMPARISONS[op]
+        if re.match(r'^[A-Za-z_]\w*$', token):
+            return lambda row: row.get(column) is not None and row.get(token) is not None and \
+                compare(_comparable(row[column]), _comparable(row[token]))
+        value = _comparable(_literal(token))
+        return lambda row: row.get(column) is not None and compare(_comparable(row[column]), value)
+
+    def query(self, sql):
+        """
+
+        :param sql: (str) query in the subset described in the module docstring
+        :return: (str) dataset
+        """
+        match = QUERY.match(sql)
+        if not match:
+            raise QueryError('Unsupported query: {sql}'.format(sql=sql))
+        top, columns, table, where, order_by, direction = match.groups()
+        if table not in self.tables:
+            raise QueryError("Invalid object name '{table}'".format(table=table))
+        conditions = [self._condition(part) for part in re.split(r'\s+AND\s+', where, flags=re.IGNORECASE)] \
+            if where else []
+        with self.lock:
+            rows = [row for row in self.tables[table].values() if all(condition(row) for condition in conditions)]
+        if order_by:
+            rows.sort(key=lambda row: _comparable(row.get(order_by)),
+                      reverse=bool(direction) and direction.strip().upper() == 'DESC')
+        if top:
+            rows = rows[:int(top)]
+        columns = None if columns.strip() == '*' else [column.strip() for column in columns.split(',')]
+        unknown = set(columns or ()) - set(fixtures.TABLES[table])
+        if unknown:
+            raise QueryError("Invalid column name '{column}'".format(column=sorted(unknown)[0]))
+        return fixtures.render(table, rows, columns)
+
+    @staticmethod
+    def _parameter(parameters):
+        name, value = parameters.lstrip('@').split('|')[:2]
+        return name, value
+
+    def _screen_rows(self, screen_name, parameters):
+        table, _, _ = SCREENS[screen_name]
+        name, value = self._parameter(parameters)
+        value = _comparable(value)
+        return table, [row for row in self.tables[table].values()
+                       if row.get(name) is not None and _comparable(row[name]) == value]
+
+    def get_data(self, screen_name, parameters):
+        """
+
+        :param screen_name: (str) one of SCREENS
+        :param parameters: (str) @name|value|type selecting the rows of the screen
+        :return: (str) dataset
+        """
+        with self.lock:
+            table, rows = self._screen_rows(screen_name, parameters)
+            return fixtures.render(table, rows)
+
+    def update_data(self, screen_name, parameters, ds_xml):
+        """
+        Applies a dataset uploaded by API_UpdateData. Diffgrams insert their inserted rows and delete the rows found
+        only in their before section. Plain datasets replace the rows selected by parameters: uploaded rows update
+        the row with the same primary key (or are inserted), and selected rows missing from the upload are deleted.
+
+        :param screen_name: (str) one of SCREENS
+        :param parameters: (str) @name|value|type selecting the rows of the screen
+        :param ds_xml: (str) the uploaded dataset
+        :return: (str) dataset of the screen after the update
+        """
+        table, name, _ = SCREENS[screen_name]
+        primary_key = PRIMARY_KEYS[table]
+        dataset = ET.fromstring(ds_xml)
+        diffgram = dataset.find('{%s}diffgram' % DIFFGRAM_NS)
+
+        def fields(element):
+            return OrderedDict((child.tag, child.text or '') for child in element)
+
+        with self.lock:
+            rows = self.tables[table]
+            if diffgram is not None:
+                current = [child for child in diffgram if child.tag != '{%s}before' % DIFFGRAM_NS]
+                before = diffgram.find('{%s}before' % DIFFGRAM_NS)
+                kept = set()
+                for data in current:
+                    for element in data:
+                        row = fields(element)
+                        if element.get('{%s}hasChanges' % DIFFGRAM_NS) == 'inserted' or not row.get(primary_key):
+                            self._insert(table, row)
+                        else:
+                            kept.add(int(row[primary_key]))
+                            rows.setdefault(int(row[primary_key]), OrderedDict()).update(row)
+                for element in (before if before is not None else ()):
+                    key = fields(element).get(primary_key)
+                    if key and int(key) not in kept:
+                        rows.pop(int(key), None)
+            else:
+                _, selected = self._screen_rows(screen_name, parameters)
+                uploaded = set()
+                for element in (dataset[1] if len(dataset) > 1 else ()):
+                    row = fields(element)
+                    key = row.get(primary_key)
+                    if key and int(key) in rows:
+                        rows[int(key)].update(row)
+                        uploaded.add(int(key))
+                    else:
+                        uploaded.add(self._insert(table, row))
+                for row in selected:
+                    if int(row[primary_key]) not in uploaded:
+                        rows.pop(int(row[primary_key]), None)
+            return self.get_data(screen_name, parameters)
+
+    def _insert(self, table, row):
+        primary_key = PRIMARY_KEYS[table]
+        key = self._next_key(table)
+        record = OrderedDict((column, None) for column in fixtures.TABLES[table])
+        record.update((column, value) for column, value in row.items() if column in record)
+        record[primary_key] = str(key)
+        if table == 'ContactLog' and not record.get('TimeEdited'):
+            record['TimeEdited'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.tables[table][key] = record
+        return key
+
+    def tree_data_command(self, stored_proc, operation, param):
+        """
+
+        :return: (str) name|value|type of the created record, or a Success|/Error| message
+        """
+        values = dict(self._parameter('@' + part) for part in param.split('@') if part)
+        with self.lock:
+            if stored_proc == 'PhysicianDetail_Create':
+                key = self._insert('PhysicianDetail', {'EntityGuid': str(uuid.uuid4()), 'EnrollmentStatusID': '1'})
+                return 'PhysicianID|{key}|int'.format(key=key)
+            if stored_proc == 'Offices_Create':
+                key = self._insert('Offices', {'PracticeID': values.get('PracticeID')})
+                return 'OfficeID|{key}|int'.format(key=key)
+            if stored_proc == 'PhysicianDetail_Delete':
+                self.tables['PhysicianDetail'].pop(int(values['PhysicianID']), None)
+                return 'Success|Deleted'
+            if stored_proc == 'Offices_Delete':
+                self.tables['Offices'].pop(int(values['OfficeID']), None)
+                return 'Success|Deleted'
+        return 'Error|Unknown stored procedure {stored_proc}'.format(stored_proc=stored_proc)
+
+
+class FakeEchoServer(ThreadingHTTPServer):
+    """
+    HTTP server answering SOAP requests from an EchoData.
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), data=None, wsdl_path=WSDL_PATH, latency=0.0, jitter=0.0,
+                 session_ttl=None, verbose=False):
+        """
+
+        :param address: (tuple) (host, port); port 0 picks a free port
+        :param data: (EchoData, optional) tables to serve; defaults to EchoData()
+        :param wsdl_path: (str) WSDL served at ?singleWsdl, with its soap:address rewritten to this server
+        :param latency: (float) seconds added to every SOAP call
+        :param jitter: (float) up to this many seconds are randomly added to or removed from latency
+        :param session_ttl: (float, optional) seconds after which a session expires
+        :param verbose: (bool) log every request to stderr
+        """
+        super(FakeEchoServer, self).__init__(address, FakeEchoHandler)
+        self.data = data or EchoData()
+        self.latency = latency
+        self.jitter = jitter
+        self.session_ttl = session_ttl
+        self.verbose = verbose
+        self.sessions = {}
+        self.calls = 0
+        with open(wsdl_path) as wsdl_file:
+            self.wsdl = re.sub(r'(<(?:\w+:)?address\s+location=")[^"]*(")',
+                               lambda match: match.group(1) + escape(self.endpoint) + match.group(2),
+                               wsdl_file.read())
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return 'http://{host}:{port}/OneAppWebService'.format(host=host, port=port)
+
+    @property
+    def wsdl_url(self):
+        return self.endpoint + '.svc?singleWsdl'
+
+    def _session_valid(self, session_id):
+        expires = self.sessions.get(session_id)
+        return expires is not None and (expires is True or expires > time.monotonic())
+
+    def dispatch(self, operation, args):
+        """
+
+        :param operation: (str) name of the SOAP operation
+        :param args: (list of str) arguments in the order of the WSDL
+        :return: (str) the operation's result
+        """
+        self.calls += 1
+        if operation == 'API_Test':
+            return 'Success|This message from WCF Service. You are connected!'
+        if operation == 'API_Login':
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = time.monotonic() + self.session_ttl if self.session_ttl else True
+            return 'SessionID|{session_id}'.format(session_id=session_id)
+        if not self._session_valid(args[0] if args else None):
+            return 'Denied|Invalid or expired session'
+        if operation == 'API_Logout':
+            self.sessions.pop(args[0], None)
+            return 'LoggedOut|fake'
+        try:
+            if operation == 'API_GeneralQuery':
+                return self.data.query(args[1])
+            if operation == 'API_GetData':
+                return self.data.get_data(args[1], args[3])
+            if operation == 'API_UpdateData':
+                return self.data.update_data(args[3], args[5], args[6])
+            if operation == 'API_TreeDataCommand':
+                return self.data.tree_data_command(args[3], args[4], args[5])
+            if operation == 'API_SelectParameters':
+                _, name, parameter_type = SCREENS[args[1]]
+                return '@{name}||{type}'.format(name=name, type=parameter_type)
+            if operation == 'API_CreateNoPenUser':
+                return 'Success|User created'
+        except (QueryError, KeyError, ValueError, IndexError, ET.ParseError) as error:
+            return 'Error|{error}'.format(error=error)
+        return 'Error|Unknown operation {operation}'.format(operation=operation)
+
+
+class FakeEchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body, content_type='text/xml; charset=utf-8'):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if 'wsdl' in self.path.lower():
+            self._send(200, self.server.wsdl)
+        else:
+            self._send(404, 'Not found', 'text/plain')
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            operation_element = ET.fromstring(request).find('{%s}Body' % SOAP_NS)[0]
+        except (ET.ParseError, TypeError, IndexError):
+            self._send(400, self._fault('Malformed SOAP request'))
+            return
+        namespace, _, operation = operation_element.tag[1:].partition('}')
+        args = [child.text or '' for child in operation_element]
+        delay = self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        result = self.server.dispatch(operation, args)
+        self._send(200, (
+            '<s:Envelope xmlns:s="{soap}"><s:Body><{operation}Response xmlns="{namespace}">'
+            '<{operation}Result>{result}</{operation}Result></{operation}Response></s:Body></s:Envelope>'
+        ).format(soap=SOAP_NS, operation=operation, namespace=namespace, result=escape(result)))
+
+    @staticmethod
+    def _fault(message):
+        return ('<s:Envelope xmlns:s="{soap}"><s:Body><s:Fault><faultcode>s:Client</faultcode>'
+                '<faultstring>{message}</faultstring></s:Fault></s:Body></s:Envelope>'
+                ).format(soap=SOAP_NS, message=escape(message))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super(FakeEchoHandler, self).log_message(format, *args)
+
+
+def serve_in_thread(**kwargs):
+    """
+
+    :param kwargs: see FakeEchoServer
+    :return: (FakeEchoServer) a running server; call shutdown() and server_close() when done
+    """
+    server = FakeEchoServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name='fake-echo', daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--rows', type=int, default=1000, help='rows in each table')
+    parser.add_argument('--wsdl', default=WSDL_PATH, help='WSDL to serve')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- seconds added to the latency')
+    parser.add_argument('--session-ttl', type=float, help='seconds after which sessions expire')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    server = FakeEchoServer((args.host, args.port), EchoData(args.rows), args.wsdl, args.latency, args.jitter,
+                            args.session_ttl, args.verbose)
+    print('serving {rows} rows per table; wsdl_location = {url}'.format(rows=args.rows, url=server.wsdl_url),
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
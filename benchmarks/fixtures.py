@@ -0,0 +1,254 @@
+"""
+Synthetic Echo datasets and a stubbed SOAP client for the offline benchmarks. Datasets have the shape the service
+returns from API_GeneralQuery and API_GetData: a DataSet root holding an inline XSD followed by one <Table/> element
+per row.
+"""
+import os
+import re
+import tempfile
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+from echo_api.api import EchoConnection, Settings
+
+PHYSICIAN_GUID = '5f3c1b2a-0000-4000-8000-000000000001'
+
+# table: OrderedDict of column: xsd type ("guid" for System.Guid columns)
+TABLES = OrderedDict([
+    ('PhysicianDetail', OrderedDict([
+        ('PhysicianID', 'int'), ('EntityGuid', 'guid'), ('FirstName', 'string'), ('LastName', 'string'),
+        ('EMail', 'string'), ('EnrollmentStatusID', 'int'), ('DateUpdated', 'dateTime'),
+    ])),
+    ('Offices', OrderedDict([
+        ('OfficeID', 'int'), ('PracticeID', 'int'), ('Name', 'string'), ('Address1', 'string'), ('City', 'string'),
+        ('State', 'string'), ('Zip', 'string'), ('DateUpdated', 'dateTime'),
+    ])),
+    ('MedicalLicenses', OrderedDict([
+        ('AutoID', 'int'), ('PhysicianID', 'int'), ('LicenseStateOfIssue', 'string'), ('LicenseNumber', 'string'),
+        ('LicenseExpirationDate', 'dateTime'), ('Active', 'boolean'), ('DateUpdated', 'dateTime'),
+    ])),
+    ('ContactLog', OrderedDict([
+        ('CallID', 'int'), ('EntityGuid', 'guid'), ('ContactDate', 'dateTime'), ('Subject', 'string'),
+        ('Notes', 'string'), ('FollowUpCompleted', 'boolean'), ('TimeEdited', 'dateTime'),
+    ])),
+])
+
+# screens read by API_GetData, and the table behind each of them
+SCREENS = {
+    'PhysicianDetail': 'PhysicianDetail',
+    'Office': 'Offices',
+    'MedicalLicenses': 'MedicalLicenses',
+    'CallLog': 'ContactLog',
+}
+
+_EPOCH = datetime(2018, 1, 1)
+
+
+def _timestamp(number):
+    return (_EPOCH + timedelta(minutes=number)).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def physician_guid(physician_id):
+    """
+
+    :param physician_id: (int) PhysicianID of a fixture physician
+    :return: (str) EntityGuid of that physician
+    """
+    return PHYSICIAN_GUID if physician_id == 1 else str(uuid.UUID(int=physician_id))
+
+
+def _values(table, number):
+    """
+
+    :param table: (str) one of TABLES
+    :param number: (int) 1-based row number, used as the primary key
+    :return: (tuple) values of the row, in the order of TABLES[table]
+    """
+    if table == 'PhysicianDetail':
+        guid = physician_guid(number)
+        return (number, guid, 'First{}'.format(number), 'Last{}'.format(number % 997),
+                'physician{}@example.com'.format(number), number % 4, _timestamp(number))
+    if table == 'Offices':
+        return (number, (number - 1) // 5 * 5 + 1, 'Office {}'.format(number), '{} Main St'.format(number),
+                'Springfield', 'MO', '{:05d}'.format(number % 100000), _timestamp(number))
+    if table == 'MedicalLicenses':
+        return (number, number % 1000 + 1, 'MO', 'LIC{:08d}'.format(number), _timestamp(number * 60),
+                'true' if number % 3 else 'false', _timestamp(number))
+    return (number, PHYSICIAN_GUID, _timestamp(number), 'Follow up {}'.format(number),
+            'Called the office about the application & <credentialing> packet.', 'false', _timestamp(number))
+
+
+def schema(table, columns=None):
+    """
+
+    :param table: (str) one of TABLES
+    :param columns: (list of str, optional) columns to describe; defaults to every column of the table
+    :return: (str) the inline XSD describing the rows of table
+    """
+    elements = []
+    for column in columns or TABLES[table]:
+        column_type = TABLES[table][column]
+        if column_type == 'guid':
+            elements.append('<xs:element name="{column}" msdata:DataType="System.Guid, mscorlib, Version=4.0.0.0, '
+                            'Culture=neutral, PublicKeyToken=b77a5c561934e089" type="xs:string" minOccurs="0" />'
+                            .format(column=column))
+        else:
+            elements.append('<xs:element name="{column}" type="xs:{column_type}" minOccurs="0" />'
+                            .format(column=column, column_type=column_type))
+    return ('<xs:schema id="NewDataSet" xmlns="" xmlns:xs="http://www.w3.org/2001/XMLSchema" '
+            'xmlns:msdata="urn:schemas-microsoft-com:xml-msdata">'
+            '<xs:element name="NewDataSet" msdata:IsDataSet="true" msdata:UseCurrentLocale="true">'
+            '<xs:complexType><xs:choice minOccurs="0" maxOccurs="unbounded"><xs:element name="Table">'
+            '<xs:complexType><xs:sequence>{elements}</xs:sequence></xs:complexType></xs:element>'
+            '</xs:choice></xs:complexType></xs:element></xs:schema>').format(elements=''.join(elements))
+
+
+def rows(table, count, start=1):
+    """
+
+    :param table: (str) one of TABLES
+    :param count: (int) number of rows
+    :param start: (int) primary key of the first row
+    :return: (list) OrderedDict per row, values as the strings the service sends
+    """
+    columns = list(TABLES[table])
+    return [OrderedDict(zip(columns, (str(value) for value in _values(table, number))))
+            for number in range(start, start + count)]
+
+
+def render(table, table_rows, columns=None):
+    """
+
+    :param table: (str) one of TABLES
+    :param table_rows: (iterable of dict) rows to include; missing and None values are left out
+    :param columns: (list of str, optional) columns to include; defaults to every column of the table
+    :return: (str) a dataset as returned by API_GeneralQuery and API_GetData
+    """
+    columns = columns or list(TABLES[table])
+    body = []
+    for row in table_rows:
+        body.append('<Table>{}</Table>'.format(''.join(
+            '<{column}>{value}</{column}>'.format(column=column, value=escape(str(row[column])))
+            for column in columns if row.get(column) is not None)))
+    return '<DataSet>{schema}<NewDataSet>{rows}</NewDataSet></DataSet>'.format(
+        schema=schema(table, columns), rows=''.join(body))
+
+
+def dataset(table, count, start=1):
+    """
+
+    :param table: (str) one of TABLES
+    :param count: (int) number of rows
+    :param start: (int) primary key of the first row
+    :return: (str) a dataset as returned by API_GeneralQuery
+    """
+    return render(table, rows(table, count, start))
+
+
+class StubService:
+    """
+    Answers the SOAP operations from pre-built datasets. API_GeneralQuery returns the whole fixture of the table it
+    selects from, except for single physician lookups and "WHERE column IN (...)" lookups, which only return the
+    matching rows and selected columns, as the service does; API_GetData returns a single row for the PhysicianDetail
+    and Office screens, as the service does, and the whole fixture for the other screens. Updates echo their dsXML
+    back.
+    """
+    IN_CLAUSE = re.compile(r'^SELECT (.+?) FROM \w+ WHERE (\w+) IN \(([^)]*)\)', re.IGNORECASE)
+
+    def __init__(self, rows):
+        """
+
+        :param rows: (int) number of rows in each table
+        """
+        self.rows = rows
+        self.datasets = {table: dataset(table, rows) for table in TABLES}
+        self.single_rows = {table: dataset(table, 1) for table in TABLES}
+        self.empty = {table: dataset(table, 0) for table in TABLES}
+        # responses to IN lookups, built once per query so that repeated runs only time the client
+        self.lookups = {}
+        self._table_rows = {}
+
+    def _lookup(self, table, columns, column, ids):
+        """
+
+        :return: (str) dataset of the rows of table whose column is one of ids, with the selected columns
+        """
+        if table not in self._table_rows:
+            self._table_rows[table] = rows(table, self.rows)
+        ids = set(value.strip() for value in ids.split(','))
+        columns = None if columns.strip() == '*' else [name.strip() for name in columns.split(',')]
+        return render(table, [row for row in self._table_rows[table] if row[column] in ids], columns)
+
+    def API_GeneralQuery(self, session_id, query, parameters):
+        table = query.split(' FROM ', 1)[1].split()[0]
+        match = self.IN_CLAUSE.match(query)
+        if match:
+            # resolve_guids and the chunked bulk lookups
+            if query not in self.lookups:
+                self.lookups[query] = self._lookup(table, *match.groups())
+            return self.lookups[query]
+        if ' WHERE PhysicianID=' in query:
+            # _get_physician_guid
+            return self.single_rows[table]
+        return self.datasets[table]
+
+    def API_GetData(self, session_id, screen_name, name_space, parameters):
+        table = SCREENS[screen_name]
+        if '|-1|' in parameters or '|00000000-0000-0000-0000-000000000000|' in parameters:
+            return self.empty[table]
+        if screen_name in ('PhysicianDetail', 'Office'):
+            return self.single_rows[table]
+        return self.datasets[table]
+
+    def API_UpdateData(self, session_id, tree_name, level_name, screen_name, name_space, parameters, dsXML):
+        return dsXML if isinstance(dsXML, str) else dsXML.decode()
+
+    def API_SelectParameters(self, session_id, screen_name, name_space):
+        return '@PhysicianID||int'
+
+    def API_Test(self):
+        return 'Success|This message from WCF Service. You are connected!'
+
+
+class StubClient:
+    def __init__(self, rows):
+        self.service = StubService(rows)
+
+
+def settings(wsdl_location, endpoint=None, **options):
+    """
+    Settings only reads configuration files, so one is written for the values and removed once it has been read.
+
+    :param wsdl_location: (str) path or url of the WSDL
+    :param endpoint: (str, optional) defaults to wsdl_location
+    :param options: (kwargs) other keys of the [echo] section, ex: screen_cache_file="/tmp/screens.json"
+    :return: (echo_api.api.Settings)
+    """
+    values = OrderedDict([('username', 'echo'), ('password', 'echo'), ('wsdl_location', wsdl_location),
+                          ('endpoint', endpoint or wsdl_location)])
+    values.update(options)
+    with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as conf_file:
+        conf_file.write('[echo]\n' + ''.join('{key} = {value}\n'.format(key=key, value=value)
+                                             for key, value in values.items()))
+    try:
+        return Settings(conf_file.name)
+    finally:
+        os.remove(conf_file.name)
+
+
+def stub_connection(rows, connection_class=EchoConnection, **connection_kwargs):
+    """
+    Builds a connection whose client is a StubClient, without a WSDL, credentials or network access. The connection
+    goes through connection_class.__init__ like any other; only its client and session are put in place afterwards.
+
+    :param rows: (int) number of rows in each table
+    :param connection_class: (class) EchoConnection or a subclass
+    :param connection_kwargs: (kwargs) passed on to connection_class, ex: typed_rows=True
+    :return: connection_class instance
+    """
+    connection = connection_class(settings('stub://{rows}'.format(rows=rows)), **connection_kwargs)
+    connection.client = StubClient(rows)
+    connection.session_id = 'stub'
+    return connection
@@ -0,0 +1,258 @@
+"""
+Load generator driving EchoConnection helpers against the fake Echo service (benchmarks.fake_echo) or any other
+endpoint, from --concurrency threads sharing an EchoConnectionPool, and reporting p50/p95/p99 latency and calls per
+second for each helper and overall.
+
+usage:
+- python -m benchmarks.load --concurrency 16 --duration 30 --latency 0.05
+- python -m benchmarks.load --calls 2000 --mix show_physician=3,edit_physician=1 --json
+- python -m benchmarks.load --wsdl-location http://localhost:8080/OneAppWebService.svc?singleWsdl --rows 10000
+
+Without --wsdl-location a fake server with --rows rows per table and --latency/--jitter seconds of injected latency
+is started in a separate process, so that it does not compete with the load generator for the GIL; --in-process
+runs it on a thread instead. With --wsdl-location, --rows must match the number of rows the server was started with.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from echo_api.pool import EchoConnectionPool
+
+from .fake_echo import EchoData, serve_in_thread
+from .fixtures import settings
+
+# helper: function(connection, rng, rows) making one call
+OPERATIONS = OrderedDict([
+    ('show_physician', lambda connection, rng, rows: connection.show_physician(rng.randint(1, rows))),
+    ('show_office', lambda connection, rng, rows: connection.show_office(rng.randint(1, rows))),
+    ('show_physician_medical_licenses',
+     lambda connection, rng, rows: connection.show_physician_medical_licenses(rng.randint(1, rows))),
+    ('show_physician_contact_log',
+     lambda connection, rng, rows: connection.show_physician_contact_log(rng.randint(1, rows))),
+    ('show_physicians_by_id',
+     lambda connection, rng, rows: connection.show_physicians_by_id(rng.sample(range(1, rows + 1), min(rows, 25)))),
+    ('show_physicians', lambda connection, rng, rows: connection.show_physicians()),
+    ('edit_physician', lambda connection, rng, rows: connection.edit_physician(
+        rng.randint(1, rows), FirstName='Load{}'.format(rng.randint(0, 999)))),
+    ('add_contact_log_entry', lambda connection, rng, rows: connection.add_contact_log_entry(
+        rng.randint(1, rows), Subject='Load test', Notes='Generated by benchmarks.load',
+        ContactDate=time.strftime('%Y-%m-%dT%H:%M:%S'), FollowUpCompleted='false')),
+])
+DEFAULT_MIX = 'show_physician=4,show_office=2,show_physician_medical_licenses=1,show_physician_contact_log=1,' \
+              'edit_physician=1,add_contact_log_entry=1'
+
+
+def parse_mix(text):
+    """
+
+    :param text: (str) comma separated helper=weight pairs, ex: "show_physician=3,edit_physician=1"
+    :return: (OrderedDict) {helper: weight}
+    """
+    mix = OrderedDict()
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in OPERATIONS:
+            raise ValueError('unknown helper {name}, choose from {names}'.format(
+                name=name, names=', '.join(OPERATIONS)))
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """
+
+    :param sorted_values: (list of float) values in ascending order
+    :param fraction: (float) ex: 0.95
+    :return: (float) nearest-rank percentile, or 0.0 for an empty list
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+
+    :param latencies: (dict) {helper: [seconds, ...]}
+    :param errors: (dict) {helper: {error type: count}}
+    :param elapsed: (float) seconds the load ran for
+    :return: (OrderedDict) {helper or "all": {calls, errors, calls_per_second, mean, p50, p95, p99}}, times in ms
+    """
+    summary = OrderedDict()
+    everything = sorted(value for values in latencies.values() for value in values)
+    for name, values in list(sorted(latencies.items())) + [('all', everything)]:
+        values = sorted(values)
+        summary[name] = OrderedDict([
+            ('calls', len(values)),
+            ('errors', sum(errors.get(name, {}).values()) if name != 'all' else
+             sum(sum(counts.values()) for counts in errors.values())),
+            ('calls_per_second', len(values) / elapsed if elapsed else 0.0),
+            ('mean', sum(values) / len(values) * 1000 if values else 0.0),
+            ('p50', percentile(values, 0.50) * 1000),
+            ('p95', percentile(values, 0.95) * 1000),
+            ('p99', percentile(values, 0.99) * 1000),
+        ])
+    return summary
+
+
+def run_load(pool, mix, rows, concurrency, duration=None, calls=None, seed=0):
+    """
+    Calls helpers picked at random, by weight, from mix on concurrency threads until duration seconds have passed or
+    calls calls were made. Failed calls are timed as well and counted by exception type.
+
+    :param pool: (EchoConnectionPool) connections used by the threads
+    :param mix: (dict) {helper: weight}, helpers from OPERATIONS
+    :param rows: (int) rows per table on the server, ids are drawn from 1..rows
+    :param concurrency: (int) number of threads
+    :param duration: (float, optional) seconds to run for
+    :param calls: (int, optional) total number of calls to make
+    :param seed: (int) seed of the random choices; each thread derives its own generator from it
+    :return: (tuple) (latencies, errors, elapsed) as taken by summarize
+    """
+    names, weights = list(mix), list(mix.values())
+    latencies = {name: [] for name in names}
+    errors = {}
+    lock = threading.Lock()
+    remaining = [calls]
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def claim():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        if calls is None:
+            return True
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(number):
+        rng = random.Random(seed * 1000 + number)
+        while claim():
+            name = rng.choices(names, weights)[0]
+            error = None
+            call_started = time.perf_counter()
+            try:
+                with pool.connection() as connection:
+                    OPERATIONS[name](connection, rng, rows)
+            except Exception as exception:
+                error = type(exception).__name__
+            elapsed = time.perf_counter() - call_started
+            with lock:
+                latencies[name].append(elapsed)
+                if error is not None:
+                    counts = errors.setdefault(name, {})
+                    counts[error] = counts.get(error, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(number,), name='load-{}'.format(number))
+               for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for(url, timeout=30):
+    give_up = time.monotonic() + timeout
+    while True:
+        try:
+            if requests.get(url, timeout=1).ok:
+                return
+        except requests.ConnectionError:
+            pass
+        if time.monotonic() > give_up:
+            raise RuntimeError('the fake server did not come up at {url}'.format(url=url))
+        time.sleep(0.1)
+
+
+def print_report(summary, out=sys.stdout):
+    out.write('{:<34} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}\n'.format(
+        'helper', 'calls', 'errors', 'calls/s', 'mean ms', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, row in summary.items():
+        out.write('{:<34} {:>8} {:>7} {:>9.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f}\n'.format(
+            name, row['calls'], row['errors'], row['calls_per_second'], row['mean'], row['p50'], row['p95'],
+            row['p99']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8, help='number of threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run for, unless --calls is given')
+    parser.add_argument('--calls', type=int, help='total number of calls to make')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='helper=weight pairs, from: ' + ', '.join(OPERATIONS))
+    parser.add_argument('--rows', type=int, default=1000, help='rows per table on the server')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the fake server adds to every call')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- seconds added to the latency')
+    parser.add_argument('--wsdl-location', help='WSDL of a server that is already running')
+    parser.add_argument('--in-process', action='store_true', help='run the fake server on a thread of this process')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as error:
+        parser.error(str(error))
+
+    server, process = None, None
+    wsdl_location = args.wsdl_location
+    if wsdl_location is None and args.in_process:
+        server = serve_in_thread(data=EchoData(args.rows), latency=args.latency, jitter=args.jitter)
+        wsdl_location = server.wsdl_url
+    elif wsdl_location is None:
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.fake_echo', '--port', str(port), '--rows', str(args.rows),
+             '--latency', str(args.latency), '--jitter', str(args.jitter)],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), stdout=subprocess.DEVNULL)
+        wsdl_location = 'http://127.0.0.1:{port}/OneAppWebService.svc?singleWsdl'.format(port=port)
+    try:
+        _wait_for(wsdl_location)
+        pool = EchoConnectionPool(settings(wsdl_location), min_size=args.concurrency, max_size=args.concurrency)
+        try:
+            latencies, errors, elapsed = run_load(pool, mix, args.rows, args.concurrency,
+                                                  None if args.calls else args.duration, args.calls, args.seed)
+        finally:
+            pool.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    summary = summarize(latencies, errors, elapsed)
+    if args.json:
+        json.dump({'concurrency': args.concurrency, 'latency': args.latency, 'elapsed': elapsed, 'helpers': summary,
+                   'errors': errors}, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        sys.stdout.write('{calls} calls in {elapsed:.1f}s at concurrency {concurrency}, injected latency {latency}s\n\n'
+                         .format(calls=summary['all']['calls'], elapsed=elapsed, concurrency=args.concurrency,
+                                 latency=args.latency))
+        print_report(summary)
+        for name, counts in sorted(errors.items()):
+            sys.stdout.write('errors in {name}: {counts}\n'.format(name=name, counts=counts))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
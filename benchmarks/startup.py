@@ -0,0 +1,94 @@
+"""
+Startup benchmark: how long importing echo_api and creating a connection take in a fresh interpreter, which is what
+command line tools and serverless handlers pay on every invocation.
+
+usage:
+- python -m benchmarks.startup
+- python -m benchmarks.startup --repeat 20
+
+Each scenario runs --repeat times in a new process and reports the median and best time of the measured statement,
+plus the heavy dependencies it loaded. Importing echo_api or echo_api.api must not load any of them, they are only
+needed once a connection is used; the exit status is 1 if one does.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict
+
+HEAVY_MODULES = ('zeep', 'requests', 'xmlmanip', 'lxml', 'asyncio')
+
+# name: (setup, measured statement, whether heavy modules are allowed)
+SCENARIOS = OrderedDict([
+    ('import echo_api', ('', 'import echo_api', False)),
+    ('import echo_api.api', ('', 'import echo_api.api', False)),
+    ('from echo_api import EchoConnection', ('', 'from echo_api import EchoConnection', False)),
+    ('EchoConnection() (import and construct)', (
+        '', 'from echo_api.api import EchoConnection, Settings; EchoConnection(Settings({conf!r}))', False)),
+    ('import zeep, requests, xmlmanip (for reference)', ('', 'import zeep, requests, xmlmanip', True)),
+])
+
+CHILD = """
+import json, sys, time
+{setup}
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'modules': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(setup, statement, repeat):
+    """
+
+    :param setup: (str) code run before the timer starts
+    :param statement: (str) code that is timed
+    :param repeat: (int) number of fresh interpreters to run it in
+    :return: (dict) median and best seconds, and the heavy modules loaded; None if the statement failed
+    """
+    code = CHILD.format(setup=setup, statement=statement, heavy=HEAVY_MODULES)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(repeat):
+        child = subprocess.run([sys.executable, '-c', code], cwd=root, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, universal_newlines=True)
+        if child.returncode != 0:
+            return None
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    times = sorted(result['seconds'] for result in results)
+    return {'median': times[len(times) // 2], 'best': times[0], 'modules': results[-1]['modules']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='fresh interpreters per scenario')
+    args = parser.parse_args(argv)
+
+    # a configuration that points nowhere: creating a connection must not touch the network
+    with tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False) as conf_file:
+        conf_file.write('[echo]\nusername = u\npassword = p\nwsdl_location = http://127.0.0.1:9/missing.wsdl\n'
+                        'endpoint = http://127.0.0.1:9/OneAppWebService\n')
+    status = 0
+    try:
+        sys.stdout.write('{:<48} {:>10} {:>10}  {}\n'.format('scenario', 'median ms', 'best ms', 'heavy modules loaded'))
+        for name, (setup, statement, heavy_allowed) in SCENARIOS.items():
+            result = measure(setup, statement.format(conf=conf_file.name), args.repeat)
+            if result is None:
+                sys.stdout.write('{:<48} {:>10}\n'.format(name, 'failed'))
+                status = 1
+                continue
+            flagged = result['modules'] and not heavy_allowed
+            sys.stdout.write('{:<48} {:>10.1f} {:>10.1f}  {}{}\n'.format(
+                name, result['median'] * 1000, result['best'] * 1000, ', '.join(result['modules']) or '-',
+                '  <- should be lazy' if flagged else ''))
+            if flagged:
+                status = 1
+    finally:
+        os.remove(conf_file.name)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
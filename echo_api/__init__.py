@@ -1,2 +1,29 @@
 from . import *
-from .api import BaseConnection, EchoConnection, EchoDebug
\ No newline at end of file
+
+# the public classes are imported from their modules when first accessed, so that importing echo_api stays cheap
+_EXPORTS = {
+    'BaseConnection': 'api',
+    'EchoConnection': 'api',
+    'EchoDebug': 'api',
+    'AsyncBaseConnection': 'async_api',
+    'AsyncEchoConnection': 'async_api',
+    'Metrics': 'metrics',
+    'EchoConnectionPool': 'pool',
+    'WriteBehindBuffer': 'write_behind',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {module!r} has no attribute {name!r}".format(module=__name__, name=name))
+    from importlib import import_module
+
+    value = getattr(import_module('.' + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,15 +1,17 @@
 import configparser
-import os, sys, inspect
+import logging
+import os, sys, inspect, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from requests import Session
 from functools import wraps
+from operator import attrgetter
 
-from zeep import Client
-from zeep.transports import Transport
-
-from xmlmanip import XMLSchema, print_xml
-from . wrappers import wrap_methods
+from . wrappers import bind_wrappers, wrap_methods
+from . cache import LRUCache, ResponseCache, SingleFlight, SCREEN_CACHE, WSDL_CACHE
+from . metrics import observe_parse
+from . query import ResultTable, parse_datetime, row_decoder
 
 import xml.etree.ElementTree as ET
 
@@ -26,6 +28,11 @@ class APICallError(BaseException):
     pass
 
 
+MSDATA_NS = 'urn:schemas-microsoft-com:xml-msdata'
+DIFFGRAM_NS = 'urn:schemas-microsoft-com:xml-diffgram-v1'
+ET.register_namespace('msdata', MSDATA_NS)
+ET.register_namespace('diffgr', DIFFGRAM_NS)
+
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRETS_LOCATION = os.environ.get('INTERFACE_CONF_FILE')
 SECRETS_LOCATION = os.path.abspath(SECRETS_LOCATION) if SECRETS_LOCATION else os.path.join(PROJECT_DIR, 'echo.conf')
@@ -42,15 +49,98 @@ def handle_response(method):
     return _impl
 
 
+def session_expired(response):
+    """
+    :param response: (str) response returned by one of the API_* service calls
+    :return: (bool) True if the response indicates that the session id is no longer valid
+    """
+    if not isinstance(response, str):
+        return False
+    response = response.strip()
+    return response.startswith("Denied|") or (response.startswith("Error|") and "session" in response.lower())
+
+
 def keep_warm(method):
+    # the session established on first use is reused for every call; we only log in again when the service tells us
+    # the session has expired, and then replay the call exactly once.
     @wraps(method)
     def _impl(self, *method_args, **method_kwargs):
-        self.__init__(self.settings)
+        session_id = self.session_id
         response = method(self, *method_args, **method_kwargs)
+        if session_expired(response):
+            self.login(expired_session_id=session_id)
+            response = method(self, *method_args, **method_kwargs)
         return response
     return _impl
 
 
+def cached_read(method):
+    # serves API_GetData from self.response_cache when caching is enabled; failed responses are never cached.
+    @wraps(method)
+    def _impl(self, screen_name, name_space, parameters):
+        if self.response_cache is None:
+            return method(self, screen_name, name_space, parameters)
+        key = (screen_name, name_space, parameters)
+        response = self.response_cache.get(key)
+        if response is None:
+            generation = self.response_cache.generation
+            response = method(self, screen_name, name_space, parameters)
+            if not (session_expired(response) or "Error|" in response):
+                self.response_cache.set(key, response, generation=generation)
+        return response
+    return _impl
+
+
+def single_flight(method):
+    # identical reads made while one is already in flight wait for it and share its response instead of making their
+    # own round trip; see echo_api.cache.SingleFlight.
+    @wraps(method)
+    def _impl(self, *method_args, **method_kwargs):
+        if self.single_flight is None:
+            return method(self, *method_args, **method_kwargs)
+        key = (method.__name__, method_args, tuple(sorted(method_kwargs.items())))
+        return self.single_flight.do(key, method, self, *method_args, **method_kwargs)
+    return _impl
+
+
+def metered(method):
+    # records each round trip in self.metrics (see echo_api.metrics.Metrics) when metrics are enabled
+    @wraps(method)
+    def _impl(self, *method_args, **method_kwargs):
+        if self.metrics is None:
+            return method(self, *method_args, **method_kwargs)
+        return self.metrics.call(method.__name__, method, self, *method_args, **method_kwargs)
+    return _impl
+
+
+def metered_helpers(cls):
+    # measures every public helper of cls end to end, the way metered measures round trips. helpers that only build
+    # a generator are left alone, their work happens after they return.
+    def wrap(method):
+        if inspect.iscoroutinefunction(method):
+            @wraps(method)
+            async def _async_impl(self, *method_args, **method_kwargs):
+                if self.metrics is None:
+                    return await method(self, *method_args, **method_kwargs)
+                return await self.metrics.call_async(method.__name__, method, self, *method_args, helper=True,
+                                                     **method_kwargs)
+            return _async_impl
+
+        @wraps(method)
+        def _impl(self, *method_args, **method_kwargs):
+            if self.metrics is None:
+                return method(self, *method_args, **method_kwargs)
+            return self.metrics.call(method.__name__, method, self, *method_args, helper=True, **method_kwargs)
+        return _impl
+
+    for name, method in list(vars(cls).items()):
+        if name.startswith(('_', 'API_', 'iter_')) or not inspect.isfunction(method) or \
+                inspect.isgeneratorfunction(method) or inspect.isasyncgenfunction(method):
+            continue
+        setattr(cls, name, wrap(method))
+    return cls
+
+
 class Settings:
     """
     This class only exists to collect settings for the BaseConnection object.
@@ -64,6 +154,12 @@ class Settings:
             self.PASSWORD = config.get('echo', 'password')
             self.WSDL_LOCATION = config.get('echo', 'wsdl_location')
             self.ENDPOINT = config.get('echo', 'endpoint')
+            self.WSDL_CACHE_DIR = config.get('echo', 'wsdl_cache_dir', fallback='')
+            self.SCREEN_CACHE_FILE = config.get('echo', 'screen_cache_file', fallback='')
+            self.CASSETTE_FILE = config.get('echo', 'cassette_file', fallback='')
+            self.CASSETTE_MODE = config.get('echo', 'cassette_mode', fallback='replay')
+            self.REPLAY_SPEED = config.getfloat('echo', 'replay_speed', fallback=0.0)
+            self.REPLAY_PACE = config.getboolean('echo', 'replay_pace', fallback=False)
 
         except configparser.NoSectionError:
             sys.stdout.write("""Region [echo] was not found in the configuration file. 
@@ -74,12 +170,21 @@ for an example layout of this file.""")
             self.PASSWORD = ''
             self.WSDL_LOCATION = ''
             self.ENDPOINT = ''
+            self.WSDL_CACHE_DIR = ''
+            self.SCREEN_CACHE_FILE = ''
+            self.CASSETTE_FILE = ''
+            self.CASSETTE_MODE = 'replay'
+            self.REPLAY_SPEED = 0.0
+            self.REPLAY_PACE = False
 
 
 class BaseConnection:
     """
     BaseConnection has the core functionality required to interact with Echo's SOAP API.
     """
+    wsdl_cache = WSDL_CACHE
+    screen_cache = SCREEN_CACHE
+
     @staticmethod
     def get_operations(key=None):
         """
@@ -98,7 +203,9 @@ class BaseConnection:
             return
         return operations[key]
 
+    @single_flight
     @keep_warm
+    @metered
     def API_SelectParameters(self, screen_name, name_space='Symed'):
         """
 
@@ -108,7 +215,9 @@ class BaseConnection:
         """
         return self.client.service.API_SelectParameters(self.session_id, screen_name, name_space)
 
+    @single_flight
     @keep_warm
+    @metered
     def API_GeneralQuery(self, query, parameters=""):
         """
 
@@ -118,7 +227,10 @@ class BaseConnection:
         """
         return self.client.service.API_GeneralQuery(self.session_id, query, parameters)
 
+    @cached_read
+    @single_flight
     @keep_warm
+    @metered
     def API_GetData(self, screen_name, name_space, parameters):
         """
 
@@ -130,6 +242,7 @@ class BaseConnection:
         return self.client.service.API_GetData(self.session_id, screen_name, name_space, parameters)
 
     @keep_warm
+    @metered
     def API_UpdateData(self, tree_name, level_name, screen_name, name_space, parameters, dsXML):
         """
 
@@ -141,10 +254,13 @@ class BaseConnection:
         :param dsXML: the XML data containing the updates.
         :return: usually the XML data. If there was an error, a string in the format ?XXX|YYY? where XXX is a general description (Error, Denied, etc) and YYY is the specific description.
         """
-        return self.client.service.API_UpdateData(self.session_id, tree_name, level_name, screen_name, name_space,
-                                                  parameters, dsXML)
+        response = self.client.service.API_UpdateData(self.session_id, tree_name, level_name, screen_name, name_space,
+                                                      parameters, dsXML)
+        self._invalidate_reads(parameters, screen_name)
+        return response
 
     @keep_warm
+    @metered
     def API_TreeDataCommand(self, tree_name, level_name, stored_proc, operation, param):
         """
 
@@ -155,9 +271,13 @@ class BaseConnection:
 
         :return: usually a string in the format of name|value|type where the name is the parameter name, value is the parameter value and type is the parameter type. If this format is returned, the parameter can be used directly with API_GetData to retrieve the newly added item. If there was an error, a string in the format ?XXX|YYY? where XXX is a general description (Error, Denied, etc) and YYY is the specific description.
         """
-        return self.client.service.API_TreeDataCommand(self.session_id, tree_name, level_name, stored_proc, operation, param)
+        response = self.client.service.API_TreeDataCommand(self.session_id, tree_name, level_name, stored_proc, operation,
+                                                           param)
+        self._invalidate_reads(param)
+        return response
 
     @keep_warm
+    @metered
     def API_CreateNoPenUser(self, email, body, subject, return_email, password, parameters, security_groups, send_mail):
         """
 
@@ -177,7 +297,7 @@ class BaseConnection:
         return self.client.service.API_CreateNoPenUser(self.session_id, email, body, subject, return_email, password,
                                                        parameters, security_groups, send_mail)
 
-    @keep_warm
+    @metered
     def API_Login(self, username, password):
         """
 
@@ -187,6 +307,7 @@ class BaseConnection:
         """
         return self.client.service.API_Login(username, password)
 
+    @metered
     def API_Logout(self):
         """
 
@@ -194,6 +315,7 @@ class BaseConnection:
         """
         return self.client.service.API_Logout(self.session_id)
 
+    @metered
     def API_Test(self):
         """
 
@@ -201,22 +323,138 @@ class BaseConnection:
         """
         return self.client.service.API_Test()
 
-    def __init__(self, settings=Settings(), *args, **kwargs):
-        self.settings=settings
-        self.endpoint = settings.ENDPOINT
-        self.session = Session()
-        self.client = Client(settings.WSDL_LOCATION, transport=Transport(session=self.session))
-        if "Success" in self.client.service.API_Test():
-            response = self.client.service.API_Login(settings.USERNAME, settings.PASSWORD)
+    def _invalidate_reads(self, parameters, screen_name=None):
+        if self.single_flight is not None:
+            self.single_flight.forget()
+        if self.response_cache is not None:
+            self.response_cache.invalidate_write(parameters, screen_name)
+
+    def _transport(self, settings):
+        """
+        With a cassette_file in the settings, calls are recorded to it (cassette_mode = record) or answered from it
+        (cassette_mode = replay, at replay_speed and replay_pace, see echo_api.replay.ReplayTransport).
+
+        :param settings: (Settings)
+        :return: (zeep.transports.Transport) transport for the client of this connection
+        """
+        from zeep.transports import Transport
+        from .replay import RecordingTransport, ReplayTransport, open_cassette
+
+        cache = self.wsdl_cache.disk_cache(settings.WSDL_CACHE_DIR)
+        if not settings.CASSETTE_FILE:
+            return Transport(session=self.session, cache=cache)
+        cassette = open_cassette(settings.CASSETTE_FILE, settings.CASSETTE_MODE)
+        if settings.CASSETTE_MODE == 'record':
+            return RecordingTransport(cassette, session=self.session, cache=cache)
+        return ReplayTransport(cassette, speed=settings.REPLAY_SPEED, pace=settings.REPLAY_PACE, session=self.session)
+
+    def _connect(self):
+        from requests import Session
+
+        with self._connect_lock:
+            if self._client is not None:
+                return
+            self.session = Session()
+            client = self.wsdl_cache.client(self.settings.WSDL_LOCATION, self.settings.ENDPOINT,
+                                            self._transport(self.settings), self.settings.WSDL_CACHE_DIR)
+            if self.settings.SCREEN_CACHE_FILE:
+                self.screen_cache.load(self.settings.SCREEN_CACHE_FILE)
+            if "Success" not in client.service.API_Test():
+                raise APITestFailError("Test connection failed.")
+            self._client = client
+
+    @property
+    def client(self):
+        """
+        The zeep client, built on first use: the WSDL is parsed (or taken from self.wsdl_cache), the screen cache file
+        is loaded and the connection is checked with API_Test.
+        """
+        if self._client is None:
+            self._connect()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    @property
+    def session_id(self):
+        """
+        The id of the current session, logging in first if this connection has not yet.
+        """
+        if self._session_id is None:
+            self.login()
+        return self._session_id
+
+    @session_id.setter
+    def session_id(self, session_id):
+        self._session_id = session_id
+
+    def connect(self):
+        """
+        Builds the client and logs in now instead of on first use, so that configuration and credential problems
+        surface immediately.
+
+        :return: self
+        """
+        self.login()
+        return self
+
+    def login(self, expired_session_id=None):
+        """
+        Logs in with the credentials from self.settings and stores the resulting session id. Called on first use and
+        again by keep_warm whenever the service reports that the session has expired. Threads that share a connection
+        and find the same session expired log in only once.
+
+        :param expired_session_id: (str, optional) session id that the service reported as expired
+        :return: (str) the current session id
+        """
+        with self._login_lock:
+            if self._session_id is not None and self._session_id != expired_session_id:
+                return self._session_id
+            response = self.client.service.API_Login(self.settings.USERNAME, self.settings.PASSWORD)
             if "Error" in response:
                 raise APICallError(response)
             if "SessionID" in response:
-                self.session_id = self.client.service.API_Login(settings.USERNAME, settings.PASSWORD).split("|")[1]
+                self._session_id = response.split("|")[1]
             else:
                 raise NotImplementedError("An unhandled exception occurred during authentication: " + response)
+            if self.metrics is not None:
+                self.metrics.count_login(relogin=expired_session_id is not None)
+            return self._session_id
+
+    def __init__(self, settings=None, *args, response_cache_size=0, response_cache_ttl=300, coalesce_reads=True,
+                 metrics=None, single_flight=None, **kwargs):
+        """
+
+        :param settings: (Settings, optional) credentials, WSDL location and endpoint; read from the configuration
+            file when the connection is created if not given. Nothing is downloaded, parsed or logged into until the
+            connection is first used, see connect()
+        :param response_cache_size: (int) number of API_GetData responses to cache; 0 disables the cache
+        :param response_cache_ttl: (float) seconds a cached API_GetData response stays valid
+        :param coalesce_reads: (bool) let identical concurrent API_GetData, API_GeneralQuery and API_SelectParameters
+            calls share one round trip; self.single_flight.stats() counts the calls that were coalesced
+        :param single_flight: (echo_api.cache.SingleFlight, optional) coalesce reads with every connection that is given
+            the same one, ex: those of an echo_api.pool.EchoConnectionPool; a new one is made for the connection if not
+            given. Ignored without coalesce_reads
+        :param metrics: (echo_api.metrics.Metrics, optional) records calls, latency, payload sizes, parse time, errors
+            and logins; may be shared between connections
+        """
+        self.settings = settings = settings if settings is not None else Settings()
+        self.endpoint = settings.ENDPOINT
+        self.response_cache = ResponseCache(response_cache_size, response_cache_ttl) if response_cache_size else None
+        self.single_flight = None
+        if coalesce_reads:
+            self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.metrics = metrics
+        self.session = None
+        self._client = None
+        self._session_id = None
+        self._connect_lock = threading.Lock()
+        self._login_lock = threading.Lock()
 
-        else:
-            raise APITestFailError("Test connection failed.")
+
+_TAG, _TEXT = attrgetter('tag'), attrgetter('text')
 
 
 class Helpers:
@@ -227,26 +465,345 @@ class Helpers:
     class Meta:
         abstract = True
 
+    # decode the rows returned by the show_*, iter_* and query helpers to typed values, see echo_api.query.RowDecoder
+    typed_rows = False
+    # return those rows as echo_api.query.Record instances instead of xmlmanip.SchemaInnerDict
+    compact_rows = False
+
+    # parameter identifying a record of each screen, and its type
+    SCREENS = {
+        'PhysicianDetail': ('PhysicianID', 'int'),
+        'Office': ('OfficeID', 'int'),
+        'MedicalLicenses': ('PhysicianID', 'int'),
+        'CallLog': ('EntityGuid', 'guid'),
+    }
+    # primary key of each table, used for keyset pagination by iter_pages
+    PRIMARY_KEYS = {
+        'PhysicianDetail': 'PhysicianID',
+        'Offices': 'OfficeID',
+        'MedicalLicenses': 'AutoID',
+        'ContactLog': 'CallID',
+    }
+    # column holding the last modification time of each table, used by changes_since
+    CHANGE_COLUMNS = {
+        'PhysicianDetail': 'DateUpdated',
+        'MedicalLicenses': 'DateUpdated',
+        'Offices': 'DateUpdated',
+        'ContactLog': 'TimeEdited',
+    }
+
     @staticmethod
-    def _search_schema(schema_str, show_all=True, **kwarg):
+    def _empty_parameters(screen_name):
+        """
+
+        :param screen_name: (str) one of Helpers.SCREENS
+        :return: (str) parameters that select a record of the screen that cannot exist
+        """
+        parameter_name, parameter_type = Helpers.SCREENS[screen_name]
+        empty_value = '00000000-0000-0000-0000-000000000000' if parameter_type == 'guid' else '-1'
+        return '@{name}|{value}|{type}'.format(name=parameter_name, value=empty_value, type=parameter_type)
+
+    @staticmethod
+    def _search_schema(schema_str, show_all=True, typed=False, compact=False, **kwarg):
         """
 
         :param schema_str: (xml string) valid xml string
         :param show_all: (boolean) indicate whether we want all items returned in the search. setting to False returns last item only (sorted by the pass kwarg)
         :param kwarg: (kwarg) kwarg indicating search parameters. for example, if you have a bunch of items with a <name/>, you can search using:
             * Helpers()._search_schema(schema_str, name__eq="Billy") or Helpers()._search_schema(schema_str, name__contains="B")
+            * see echo_api.query.ResultTable.filter for the supported lookups
+        :param typed: (bool) decode the values of the rows to the types of their columns
+        :param compact: (bool) return the rows as echo_api.query.Record instances
         :return:
         """
-        schema = XMLSchema(schema_str)
-        paths = schema.locate(**kwarg)
-        items = [schema.retrieve('__'.join(path.split('__')[:-1])) for path in paths]
+        table = Helpers._result_table(schema_str, typed, compact).filter(**kwarg)
         kwarg_key = list(kwarg.keys())[0].split('__')[0]
-        try:
-            sorted_list = sorted(items, key=lambda x: int(x[kwarg_key])) if show_all else \
-                sorted(items, key=lambda x: int(x[kwarg_key]))[-1]
-        except IndexError:  # happens when there are no results in the search
-            sorted_list = None
-        return sorted_list
+        return table.order_by(kwarg_key).rows if show_all else table.last(kwarg_key)
+
+    @staticmethod
+    def _result_table(schema_str, typed=False, compact=False):
+        """
+
+        :param schema_str: (xml string) dataset returned by API_GeneralQuery or API_GetData
+        :param typed: (bool) decode the values of the rows to the types of their columns
+        :param compact: (bool) return the rows as echo_api.query.Record instances
+        :return: (echo_api.query.ResultTable) the rows of the dataset, parsed once
+        """
+        started = time.perf_counter()
+        rows = Helpers._parse_rows(schema_str, typed=typed, compact=compact)
+        table = ResultTable(rows, columns=OrderedDict(row_decoder(schema_str).columns))
+        observe_parse(started)
+        return table
+
+    @staticmethod
+    def _parse_rows(schema_str, typed=False, compact=False):
+        """
+        Parses a whole dataset at once, for callers that keep every row anyway. The C parser builds the tree in a
+        single call, which costs about half of what handing every start and end event of _iter_rows back to Python
+        does, at the price of holding the tree until its rows have been read.
+
+        :param schema_str: (xml string) dataset returned by API_GeneralQuery or API_GetData
+        :param typed: (bool) decode the values to the types of their columns with the RowDecoder of the schema
+        :param compact: (bool) return echo_api.query.Record instances
+        :return: (list) the rows that _iter_rows yields for the same arguments
+        """
+        from xmlmanip import SchemaInnerDict
+
+        if isinstance(schema_str, str) and "Error|" in schema_str[:256]:
+            raise APICallError(schema_str)
+        root = ET.fromstring(schema_str)
+        # rows carry no namespace in the datasets of the service; the wildcard search is only a fallback
+        elements = list(root.iter('Table')) or list(root.iterfind('.//{*}Table'))
+        if compact:
+            decoder = row_decoder(schema_str)
+            return [decoder.record(elem, typed) for elem in elements]
+        if typed:
+            decoder = row_decoder(schema_str)
+            return [decoder.decode(elem, SchemaInnerDict) for elem in elements]
+        return [SchemaInnerDict(zip(map(_TAG, elem), map(_TEXT, elem))) for elem in elements]
+
+    @staticmethod
+    def _iter_rows(schema_str, feed_size=65536, typed=False, compact=False):
+        """
+        Incrementally parses a dataset returned by API_GeneralQuery or API_GetData and yields its <Table/> rows one at a
+        time. Rows (and the inline schema) are dropped from the parse tree as soon as they have been read, so memory use
+        does not grow with the number of rows.
+
+        :param schema_str: (xml string) dataset to parse
+        :param feed_size: (int) number of characters handed to the parser at a time
+        :param typed: (bool) decode the values to the types of their columns with the RowDecoder of the schema
+        :param compact: (bool) yield echo_api.query.Record instances, which hold a row in a fraction of the memory
+        :return: generator of xmlmanip.SchemaInnerDict (or Record), in the order the service returned them
+        """
+        from xmlmanip import SchemaInnerDict
+
+        if isinstance(schema_str, str) and "Error|" in schema_str[:256]:
+            raise APICallError(schema_str)
+        decoder = row_decoder(schema_str) if typed or compact else None
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        stack, schema_depth = [], 0
+        for offset in range(0, len(schema_str), feed_size):
+            parser.feed(schema_str[offset:offset + feed_size])
+            for event, elem in parser.read_events():
+                local_name = elem.tag.rsplit('}', 1)[-1]
+                if event == 'start':
+                    stack.append(elem)
+                    if local_name == 'schema':
+                        schema_depth += 1
+                    continue
+                stack.pop()
+                if local_name == 'schema':
+                    schema_depth -= 1
+                elif local_name == 'Table' and not schema_depth:
+                    if compact:
+                        yield decoder.record(elem, typed)
+                    elif typed:
+                        yield decoder.decode(elem, SchemaInnerDict)
+                    else:
+                        yield SchemaInnerDict((child.tag, child.text) for child in elem)
+                else:
+                    continue
+                if stack:
+                    stack[-1].remove(elem)
+        parser.close()
+
+    @staticmethod
+    def _in_chunk_queries(table, column, ids, chunk_size=500, columns="*"):
+        """
+
+        :return: (list of str) the queries _query_in_chunks runs for the same arguments
+        """
+        # ints only; they are formatted straight into the query
+        ids = list(dict.fromkeys(int(i) for i in ids))
+        return ["SELECT {columns} FROM {table} WHERE {column} IN ({ids})".format(
+            columns=columns, table=table, column=column, ids=', '.join(str(i) for i in ids[start:start + chunk_size]))
+            for start in range(0, len(ids), chunk_size)]
+
+    @staticmethod
+    def _table_query(table, where=""):
+        """
+
+        :param table: (str) name of the table
+        :param where: (str, optional) SQL condition
+        :return: (str) query for every row of table that matches where
+        """
+        return "SELECT * FROM {table}{where}".format(table=table, where=' WHERE ' + where if where else '')
+
+    @staticmethod
+    def _page_query(table, page_size, primary_key, where="", last_key=None):
+        """
+
+        :param last_key: (int, optional) key the page starts after; the first page if None
+        :return: (str) query for one page of iter_pages
+        """
+        conditions = [condition for condition in (
+            '({where})'.format(where=where) if where else '',
+            '' if last_key is None else '{key} > {last_key}'.format(key=primary_key, last_key=last_key),
+        ) if condition]
+        return "SELECT TOP {page_size} * FROM {table}{where} ORDER BY {key}".format(
+            page_size=int(page_size), table=table, key=primary_key,
+            where=' WHERE ' + ' AND '.join(conditions) if conditions else '')
+
+    @staticmethod
+    def _page_cursor(page, table, primary_key):
+        """
+
+        :param page: (ResultTable) a full page of iter_pages
+        :return: (int) the key the next page starts after: that of the last row that has an integer key
+        """
+        for row in reversed(page.rows):
+            try:
+                return int(row.get(primary_key))
+            except (TypeError, ValueError):
+                continue
+        raise APICallError('Cannot page through {table}: no row of the page has an integer {key}.'.format(
+            table=table, key=primary_key))
+
+    @classmethod
+    def _placeholder_filter(cls, table):
+        """
+        -1 rows are placeholders, and rows without the key are left out as well
+
+        :param table: (str) one of cls.PRIMARY_KEYS
+        :return: (dict) ResultTable.filter lookup that keeps the records of table
+        """
+        return {'{key}__ne'.format(key=cls.PRIMARY_KEYS[table]): -1}
+
+    def _show_rows(self, schema_str, table, show_all=True):
+        """
+        The rows of schema_str as the show_* helpers return them, see _search_schema.
+
+        :param table: (str) table the rows belong to, one of self.PRIMARY_KEYS
+        :param show_all: (boolean) if True all rows, if False the last created
+        """
+        return self._search_schema(schema_str, typed=self.typed_rows, compact=self.compact_rows, show_all=show_all,
+                                   **self._placeholder_filter(table))
+
+    def _changes_query(self, table, watermark=None, checkpoint=None, column=None):
+        """
+
+        :return: (tuple) (query, modification time column) for changes_since, which has the details of the arguments
+        """
+        column = column or self.CHANGE_COLUMNS.get(table)
+        if not (column and table.isidentifier() and column.isidentifier()):
+            raise APICallError('No modification time column known for table {table}.'.format(table=table))
+        if watermark is None and checkpoint is not None:
+            watermark = checkpoint.get(table)
+        qs = "SELECT * FROM {table}".format(table=table)
+        if watermark is not None:
+            if not isinstance(watermark, datetime):
+                watermark = parse_datetime(str(watermark))
+            qs += " WHERE {column} > '{watermark}'".format(column=column,
+                                                           watermark=watermark.strftime("%Y-%m-%dT%H:%M:%S"))
+        qs += " ORDER BY {column}".format(column=column)
+        return qs, column
+
+    @staticmethod
+    def _newest_change(newest, row, column):
+        """
+
+        :param newest: (str) newest modification time seen so far, None before the first
+        :return: (str) the later of newest and the modification time of row, in the format of the watermarks
+        """
+        if not row.get(column):
+            return newest
+        changed = parse_datetime(row[column]).strftime("%Y-%m-%dT%H:%M:%S")
+        return changed if newest is None or changed > newest else newest
+
+    def _cached_guids(self, physician_ids):
+        """
+
+        :param physician_ids: (iterable of int)
+        :return: (tuple) ({physician_id: EntityGuid} of the ids found in self.guid_cache, [physician_id] of the rest)
+        """
+        guids, missing = {}, []
+        for physician_id in (int(i) for i in physician_ids):
+            guid = self.guid_cache.get(physician_id)
+            if guid is None:
+                missing.append(physician_id)
+            else:
+                guids[physician_id] = guid
+        return guids, missing
+
+    def _remember_guids(self, guids, rows):
+        """
+
+        :param guids: (dict) {physician_id: EntityGuid} to add the guids of rows to
+        :param rows: PhysicianDetail rows with PhysicianID and EntityGuid
+        :return: (dict) guids
+        """
+        for row in rows:
+            guids[int(row['PhysicianID'])] = row['EntityGuid']
+            self.guid_cache.set(int(row['PhysicianID']), row['EntityGuid'])
+        return guids
+
+    @staticmethod
+    def _physician_guid(guids, physician_id):
+        guid = guids.get(int(physician_id))
+        if guid:
+            return guid
+        else:
+            raise APICallError('No Physicians matching id {physician_id}'.format(physician_id=physician_id))
+
+    @staticmethod
+    def _rows_by_id(rows, column):
+        """
+
+        :return: (dict) {id (int): row} of rows, keyed by their value of column
+        """
+        return {int(row[column]): row for row in rows}
+
+    @staticmethod
+    def _licenses_by_physician(rows):
+        """
+
+        :param rows: MedicalLicenses rows
+        :return: (dict) {physician_id (int): list of rows sorted by AutoID}
+        """
+        licenses = {}
+        for row in sorted(rows, key=lambda x: int(x['AutoID'])):
+            licenses.setdefault(int(row['PhysicianID']), []).append(row)
+        return licenses
+
+    def _query_in_chunks(self, table, column, ids, chunk_size=500, workers=1, columns="*", typed=False,
+                         compact=False):
+        """
+        Runs SELECT columns FROM table WHERE column IN (...) through API_GeneralQuery, chunk_size ids at a time.
+
+        :param table: (str) table to query
+        :param column: (str) integer column the ids belong to
+        :param ids: (iterable of int) ids to look up; duplicates are only requested once
+        :param chunk_size: (int) maximum number of ids in a single IN clause
+        :param workers: (int) number of chunks to request concurrently
+        :param columns: (str) projection of the query
+        :param typed: (bool) decode the values of the rows to the types of their columns
+        :param compact: (bool) return the rows as echo_api.query.Record instances
+        :return: (list) matching rows
+        """
+        def fetch(qs):
+            return list(self._iter_rows(self.API_GeneralQuery(qs, ""), typed=typed, compact=compact))
+
+        queries = self._in_chunk_queries(table, column, ids, chunk_size, columns)
+        if workers > 1 and len(queries) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(fetch, queries))
+        else:
+            results = [fetch(qs) for qs in queries]
+        return [row for rows in results for row in rows]
+
+    def resolve_guids(self, physician_ids, chunk_size=500):
+        """
+        Looks up the EntityGuid of each physician. GUIDs are served from self.guid_cache when possible; the rest are
+        fetched chunk_size at a time with a query that only selects PhysicianID and EntityGuid.
+
+        :param physician_ids: (iterable of int) ids of the physicians whose guids we desire
+        :param chunk_size: (int) number of physicians requested per round trip
+        :return: (dict) {physician_id (int): EntityGuid (str)}; ids that do not exist are left out
+        """
+        guids, missing = self._cached_guids(physician_ids)
+        rows = self._query_in_chunks("PhysicianDetail", "PhysicianID", missing, chunk_size,
+                                     columns="PhysicianID, EntityGuid")
+        return self._remember_guids(guids, rows)
 
     @handle_response
     def _get_physician_guid(self, physician_id):
@@ -254,13 +811,291 @@ class Helpers:
         :param physician_id: (int) id of desired physician
         :return:
         """
-        qs = "SELECT * FROM PhysicianDetail WHERE PhysicianID={physician_id}".format(physician_id=physician_id)
-        schema_str = self.API_GeneralQuery(qs, "")
-        physician = self._search_schema(schema_str, show_all=False, PhysicianID__ne=-1)
-        if physician:
-            return physician['EntityGuid']
+        return self._physician_guid(self.resolve_guids([physician_id]), physician_id)
+
+    @staticmethod
+    def _add_table_row(schema_str, **fields):
+        """
+
+        :param schema_str: (xml string) dataset returned by API_GetData
+        :param fields: (kwargs) values of the new <Table/> row
+        :return: (xml bytes) the dataset with the new row appended, ready to be passed as dsXML
+        """
+        schema_and_data = ET.fromstring(schema_str)
+        for i, (key, value) in enumerate(fields.items()):
+            if i == 0:
+                new_table = ET.SubElement(schema_and_data[1], 'Table')
+            new_attr = ET.SubElement(new_table, key)
+            new_attr.text = str(value)
+        return ET.tostring(schema_and_data)
+
+    @staticmethod
+    def _set_table_values(schema_str, **fields):
+        """
+
+        :param schema_str: (xml string) dataset returned by API_GetData
+        :param fields: (kwargs) values to set on the first <Table/> row
+        :return: (xml bytes) the modified dataset, ready to be passed as dsXML
+        """
+        schema_and_data = ET.fromstring(schema_str)
+        for key, value in fields.items():
+            if schema_and_data[1][0].find(key) is None:
+                new_attr = ET.SubElement(schema_and_data[1][0], key)
+                new_attr.text = value
+            else:
+                schema_and_data[1][0].find(key).text = str(value)
+        return ET.tostring(schema_and_data)
+
+    @staticmethod
+    def _diffgram(schema_str, inserted=(), deleted=()):
+        """
+        Builds a DataSet diffgram holding only changed rows, so that API_UpdateData does not have to be sent every row
+        of the dataset.
+
+        :param schema_str: (xml string) any dataset of the screen; only its root, inline schema and data element names
+            are used
+        :param inserted: (iterable of dict) rows to add
+        :param deleted: (iterable of dict) existing rows (with all of their values) to delete
+        :return: (xml bytes) ready to be passed as dsXML
+        """
+        dataset = ET.fromstring(schema_str)
+        schema, data_name = dataset[0], dataset[1].tag
+        root = ET.Element(dataset.tag, dataset.attrib)
+        root.append(schema)
+        diffgram = ET.SubElement(root, '{%s}diffgram' % DIFFGRAM_NS)
+        current = ET.SubElement(diffgram, data_name)
+        before = ET.SubElement(diffgram, '{%s}before' % DIFFGRAM_NS)
+
+        def add_row(parent, number, fields, **attrib):
+            row = ET.SubElement(parent, 'Table', attrib)
+            row.set('{%s}id' % DIFFGRAM_NS, 'Table{number}'.format(number=number + 1))
+            row.set('{%s}rowOrder' % MSDATA_NS, str(number))
+            for key, value in fields.items():
+                if value is not None:
+                    ET.SubElement(row, key).text = str(value)
+
+        number = 0
+        for number, fields in enumerate(deleted):
+            add_row(before, number, fields)
+        for offset, fields in enumerate(inserted, start=number + 1 if deleted else 0):
+            add_row(current, offset, fields, **{'{%s}hasChanges' % DIFFGRAM_NS: 'inserted'})
+        if not len(before):
+            diffgram.remove(before)
+        return ET.tostring(root)
+
+    @staticmethod
+    def _changed_fields(row, fields):
+        """
+
+        :param row: (dict) current values of the record
+        :param fields: (dict) values the caller wants the record to have
+        :return: (dict) the subset of fields whose value differs from the current one
+        """
+        changes = {}
+        for key, value in fields.items():
+            current = row.get(key)
+            new = '' if value is None else (str(value).lower() if isinstance(value, bool) else str(value))
+            if (current or '') != new:
+                changes[key] = value
+        return changes
+
+    @staticmethod
+    def _check_contact_log_fields(fields):
+        required = {'Notes', 'Subject'}
+        if required.intersection(fields.keys()) != required:
+            raise APICallError('You must add "Notes" and "Subject" to contact log entries.')
+
+    @staticmethod
+    def _contact_log_fields(guid, fields):
+        """
+
+        :param guid: (str) EntityGuid of the physician the entry belongs to
+        :param fields: (dict) fields supplied by the caller
+        :return: (dict) fields of the new CallLog row including the values the API user is expected to fill in
+        """
+        fields = dict(fields)
+        fields['EntityGuid'] = guid
+        fields['TrackingGuid'] = '00000000-0000-0000-0000-000000000000'
+        # fields['TrackingGuid'] = str(uuid.uuid4())
+        fields['TimeEdited'] = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+        fields['UserDisplayName'] = 'Back-end API User'
+        return fields
+
+    def _remember_screen(self, screen_name, kind, response):
+        """
+
+        :param response: (xml string) response of the screen, kept in self.screen_cache as kind
+        :return: (xml string) response
+        """
+        if "Error|" in response:
+            raise APICallError(response)
+        self.screen_cache.set(self.endpoint, screen_name, kind, response)
+        return response
+
+    @staticmethod
+    def _nopen_account_request(physician_id, physician, send_email=0, **kwargs):
+        """
+
+        :param physician: (xml string) PhysicianDetail screen of the physician
+        :return: (list) arguments of the API_CreateNoPenUser call of add_nopen_account, which has the details of the
+            other arguments
+        """
+        from xmlmanip import XMLSchema
+
+        physician_record = XMLSchema(physician).search(EMail__ne='-1')
+        if not physician_record:
+            raise APICallError('No physician with ID {0}'.format(physician_id))
+        physician_record = physician_record[0]
+        email = kwargs.get('email', physician_record['EMail'])
+        last_name = physician_record.get('LastName')
+        first_name = physician_record.get('FirstName')
+        password = kwargs['password']
+        subject = kwargs.get('subject', 'No Pen Account Creation')
+        account_info = "\n{} {}\n\nUsername: {}\nPassword: {}\n\n".format(first_name, last_name, email, password)
+        body = kwargs.get('body', '')
+        if '{}' in body:
+            body.format(account_info)
         else:
-            raise APICallError('No Physicians matching id {physician_id}'.format(physician_id=physician_id))
+            body += account_info
+        parameters = 'PhysicianID|{}|int'.format(physician_id)
+        security_groups = kwargs['security_groups']
+        return_email = kwargs['return_email'] if send_email else None
+        return [email, body, subject, return_email, password, parameters, security_groups, send_email]
+
+    @staticmethod
+    def _medical_license_request(physician_id, dataset, fields, append_only=False):
+        """
+
+        :param dataset: (xml string) the physician's medical licenses, or with append_only the empty MedicalLicenses
+            dataset (see _empty_dataset)
+        :param fields: (dict) values of the new license
+        :return: (list) arguments of the API_UpdateData call of add_medical_license
+        """
+        if append_only:
+            fields = dict(fields)
+            fields.setdefault('PhysicianID', physician_id)
+            updated_schema = Helpers._diffgram(dataset, inserted=[fields])
+        else:
+            updated_schema = Helpers._add_table_row(dataset, **fields)
+        return ["Locations", "Provider", "MedicalLicenses", "Symed",
+                '@PhysicianID|{physician_id}|int'.format(physician_id=physician_id), updated_schema]
+
+    @staticmethod
+    def _contact_log_request(guid, entries, dataset, append_only=False):
+        """
+
+        :param guid: (str) EntityGuid of the physician
+        :param entries: (list of dict) fields of each entry, see add_contact_log_entry
+        :param dataset: (xml string) the physician's contact log, or with append_only the empty CallLog dataset
+        :return: (list) arguments of the API_UpdateData call of add_contact_log_entries
+        """
+        rows = [Helpers._contact_log_fields(guid, fields) for fields in entries]
+        if append_only:
+            updated_schema = Helpers._diffgram(dataset, inserted=rows)
+        else:
+            updated_schema = dataset
+            for fields in rows:
+                updated_schema = Helpers._add_table_row(updated_schema, **fields)
+        return ["Locations", "Provider", "CallLog", "Symed",
+                '@EntityGuid|{guid}|guid'.format(guid=guid), updated_schema]
+
+    @staticmethod
+    def _added_contact_logs(response):
+        """
+
+        :param response: (xml string) response of the API_UpdateData call of add_contact_log_entries
+        :return: (xmlmanip.SearchableList) the contact log entries of the physician
+        """
+        from xmlmanip import XMLSchema
+
+        return XMLSchema(response).search(CallID__ne='-1')
+
+    @staticmethod
+    def _contact_log_deletion_request(contact_log, guid, limit=2, append_only=False, **kwarg):
+        """
+
+        :param contact_log: (xml string) the physician's contact log
+        :param guid: (str) EntityGuid of the physician
+        :return: (list) arguments of the API_UpdateData call of delete_contact_log_entry, which has the details of the
+            other arguments
+        """
+        if append_only:
+            deleted = Helpers._result_table(contact_log).filter(**kwarg).rows
+            num_delete = len(deleted)
+        else:
+            from xmlmanip import XMLSchema
+
+            schema_and_data = XMLSchema(contact_log)
+            num_delete = len(schema_and_data.search(**kwarg))
+        if num_delete <= limit and num_delete != 0:
+            if append_only:
+                updated_schema_str = Helpers._diffgram(contact_log, deleted=deleted)
+            else:
+                schema_and_data.delete_elements_where(**kwarg)
+                updated_schema_str = ET.tostring(schema_and_data.schema)
+            return ["Locations", "Provider", "CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid),
+                    updated_schema_str]
+
+        elif num_delete == 0:
+            raise APICallError('Could not find CallLog matching {kwarg}.'.format(kwarg=kwarg))
+
+        else:
+            raise APICallError('Attempted to delete {num_delete} items, which exceeds the limit of {limit}.'
+                               ' If you wish to delete all {num_delete} items, you may set limit={num_delete} '
+                               'when calling this method.'.format(num_delete=num_delete, limit=limit))
+
+    @staticmethod
+    def _physician_request(physician_id, physician, fields):
+        """
+
+        :param physician: (xml string) PhysicianDetail screen of the physician
+        :param fields: (dict) values to set
+        :return: (list) arguments of the API_UpdateData call of edit_physician
+        """
+        updated_schema = Helpers._set_table_values(physician, **fields)
+        return ["Locations", "Provider", "PhysicianDetail",
+                "Symed", "@PhysicianID|{physician_id}|int".format(physician_id=physician_id), updated_schema]
+
+    @staticmethod
+    def _plan_edits(edits, rows):
+        """
+        Compares the values requested from edit_physicians to the current records.
+
+        :param edits: (dict) {physician_id (int): {field: value}}
+        :param rows: current PhysicianDetail rows of the physicians, as the text the service holds
+        :return: (tuple) (report of the physicians that need no update, {physician_id: (fields, changes)} of the rest)
+        """
+        current = Helpers._rows_by_id(rows, 'PhysicianID')
+        report, pending = {}, {}
+        for physician_id, fields in edits.items():
+            if physician_id not in current:
+                report[physician_id] = {'status': 'missing'}
+                continue
+            changes = Helpers._changed_fields(current[physician_id], fields)
+            if changes:
+                pending[physician_id] = (fields, changes)
+            else:
+                report[physician_id] = {'status': 'unchanged'}
+        return report, pending
+
+    @staticmethod
+    def _edit_report(physician_id, physician, fields):
+        """
+        The screen is the document API_UpdateData expects, so edit_physicians redoes the comparison against its values
+        and builds the update from it rather than reading it a second time through edit_physician.
+
+        :param physician: (xml string) PhysicianDetail screen of the physician
+        :param fields: (dict) values requested for the physician
+        :return: (tuple) (report, request): the report of the physician, and the arguments of the API_UpdateData call
+            that sends its changes, or None if there is nothing to send
+        """
+        rows = list(Helpers._iter_rows(physician))
+        if not rows:
+            return {'status': 'missing'}, None
+        changes = Helpers._changed_fields(rows[0], fields)
+        if not changes:
+            return {'status': 'unchanged'}, None
+        return {'status': 'updated', 'changes': changes}, Helpers._physician_request(physician_id, physician, changes)
 
     @staticmethod
     def _indent(elem, level=0):
@@ -279,20 +1114,43 @@ class Helpers:
                 elem.tail = i
 
     @staticmethod
-    def _pretty_print(schema_str, *keys):
+    def _pretty_xml(schema_str, *keys):
         root = ET.fromstring(schema_str)
-        tree = ET.ElementTree(root)
         Helpers._indent(root)
         item = root
         for key in keys:
             item = item[key]
-        print(str(ET.tostring(item), 'utf-8'))
+        return str(ET.tostring(item), 'utf-8')
+
+    @staticmethod
+    def _pretty_print(schema_str, *keys):
+        print(Helpers._pretty_xml(schema_str, *keys))
 
 
+@metered_helpers
 class EchoConnection(Helpers, BaseConnection):
     """
     EchoConnection has numerous methods to facilitate the usage of the BaseConnection class.
     """
+    def __init__(self, settings=None, *args, guid_cache_size=10000, guid_cache_ttl=3600, typed_rows=False,
+                 compact_rows=False, **kwargs):
+        """
+
+        :param settings: (Settings, optional) see BaseConnection
+        :param guid_cache_size: (int) number of PhysicianID -> EntityGuid lookups to remember
+        :param guid_cache_ttl: (float) seconds a remembered EntityGuid stays valid
+        :param typed_rows: (bool) have the show_*, iter_*, iter_pages, query and iter_query helpers return int, Decimal,
+            bool, datetime and UUID values according to the schema of each column, instead of strings. This is a
+            convenience rather than a speedup: decoding costs about as much as it saves on the filter and ordering of a
+            single helper call, and only pays off when the same rows are compared or sorted again afterwards.
+        :param compact_rows: (bool) have the same helpers return echo_api.query.Record instances, which keep the values
+            of a row in __slots__ and share repeated strings, instead of a dict per row. Use it to hold large result
+            sets in memory; records support the mapping operations of SchemaInnerDict, and dict(row) converts one back.
+        """
+        self.guid_cache = LRUCache(maxsize=guid_cache_size, ttl=guid_cache_ttl)
+        self.typed_rows = typed_rows
+        self.compact_rows = compact_rows
+        super(EchoConnection, self).__init__(settings, *args, **kwargs)
 
     @handle_response
     def add_physician(self, office_id, **kwargs):
@@ -384,25 +1242,8 @@ class EchoConnection(Helpers, BaseConnection):
         :return: (str) description of changes made
         """
         physician = self.get_physician(physician_id)
-        physician_record = XMLSchema(physician).search(EMail__ne='-1')
-        if not physician_record:
-            raise APICallError('No physician with ID {0}'.format(physician_id))
-        physician_record = physician_record[0]
-        email = kwargs.get('email', physician_record['EMail'])
-        last_name = physician_record.get('LastName')
-        first_name = physician_record.get('FirstName')
-        password = kwargs['password']
-        subject = kwargs.get('subject', 'No Pen Account Creation')
-        account_info = "\n{} {}\n\nUsername: {}\nPassword: {}\n\n".format(first_name, last_name, email, password)
-        body = kwargs.get('body', '')
-        if '{}' in body:
-            body.format(account_info)
-        else:
-            body += account_info
-        parameters = 'PhysicianID|{}|int'.format(physician_id)
-        security_groups = kwargs['security_groups']
-        return_email = kwargs['return_email'] if send_email else None
-        nopen_result = self.API_CreateNoPenUser(email, body, subject, return_email, password, parameters, security_groups, send_email)
+        nopen_result = self.API_CreateNoPenUser(*self._nopen_account_request(physician_id, physician, send_email,
+                                                                             **kwargs))
         if "Success|" not in nopen_result:
             raise APICallError(nopen_result)
         status_result = self.edit_physician(physician_id, EnrollmentStatusID="2")
@@ -411,10 +1252,14 @@ class EchoConnection(Helpers, BaseConnection):
         return nopen_result
 
     @handle_response
-    def add_medical_license(self, physician_id, **kwargs):
+    def add_medical_license(self, physician_id, append_only=False, **kwargs):
         """
 
         :param physician_id: (int) physician to whom to medical license belongs
+        :param append_only: (bool) send only the new row as a DataSet diffgram, built on the cached schema of the
+            MedicalLicenses screen (see _empty_dataset), so the physician's existing licenses are not downloaded first.
+            The diffgram upload has not yet been verified against a live tenant. If False the physician's licenses are
+            downloaded and uploaded again with the new row appended.
         :param kwargs:  (kwargs) values that you want the new physician to have (ex:
 
             * LicenseStateOfIssue
@@ -433,17 +1278,8 @@ class EchoConnection(Helpers, BaseConnection):
             * LicenseCountry
         :return:
         """
-        license_data = self.get_medical_licenses(physician_id)
-        schema_and_data = ET.fromstring(license_data)
-        for i, (key, value) in enumerate(kwargs.items()):
-            if i == 0:
-                new_table = ET.SubElement(schema_and_data[1], 'Table')
-            new_attr = ET.SubElement(new_table, key)
-            new_attr.text = str(value)
-        updated_schema = ET.tostring(schema_and_data)
-        args = ["Locations", "Provider", "MedicalLicenses", "Symed",
-                '@PhysicianID|{physician_id}|int'.format(physician_id=physician_id), updated_schema]
-        return self.API_UpdateData(*args)
+        dataset = self._empty_dataset("MedicalLicenses") if append_only else self.get_medical_licenses(physician_id)
+        return self.API_UpdateData(*self._medical_license_request(physician_id, dataset, kwargs, append_only))
 
     @handle_response
     def add_contact_log_entry(self, physician_id, **kwargs):
@@ -460,26 +1296,27 @@ class EchoConnection(Helpers, BaseConnection):
             * ContactDate (isoformat datetime string YYYY-MM-DDTHH:mm:ss)
         :return:
         """
-        required = {'Notes', 'Subject'}
-        if required.intersection(kwargs.keys()) != required:
-            raise APICallError('You must add "Notes" and "Subject" to contact log entries.')
+        return self.add_contact_log_entries(physician_id, [kwargs])
+
+    @handle_response
+    def add_contact_log_entries(self, physician_id, entries, append_only=False):
+        """
+        Adds several contact log entries to one physician with a single upload.
+
+        :param physician_id: id of the physician to whom the notes will be attached
+        :param entries: (list of dict) fields of each entry, see add_contact_log_entry
+        :param append_only: (bool) send only the new rows as a DataSet diffgram, built on the cached schema of the
+            CallLog screen (see _empty_dataset), so the contact log is not downloaded first. The diffgram upload has not
+            yet been verified against a live tenant. If False the physician's whole contact log is downloaded and
+            uploaded again with the new rows appended.
+        :return:
+        """
+        for fields in entries:
+            self._check_contact_log_fields(fields)
         guid = self._get_physician_guid(physician_id)
-        log_data = self.get_contact_log(physician_id)
-        schema_and_data = ET.fromstring(log_data)
-        kwargs['EntityGuid'] = guid
-        kwargs['TrackingGuid'] = '00000000-0000-0000-0000-000000000000'
-        # kwargs['TrackingGuid'] = str(uuid.uuid4())
-        kwargs['TimeEdited'] = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-        kwargs['UserDisplayName'] = 'Back-end API User'
-        for i, (key, value) in enumerate(kwargs.items()):
-            if i == 0:
-                new_table = ET.SubElement(schema_and_data[1], 'Table')
-            new_attr = ET.SubElement(new_table, key)
-            new_attr.text = str(value)
-        updated_schema = ET.tostring(schema_and_data)
-        args = ["Locations", "Provider", "CallLog", "Symed",
-                '@EntityGuid|{guid}|guid'.format(guid=guid), updated_schema]
-        return XMLSchema(self.API_UpdateData(*args)).search(CallID__ne='-1')
+        dataset = self._empty_dataset("CallLog") if append_only else self.get_contact_log(physician_id)
+        return self._added_contact_logs(self.API_UpdateData(*self._contact_log_request(guid, entries, dataset,
+                                                                                       append_only)))
 
     @handle_response
     def add_office(self, practice_id=""):
@@ -506,18 +1343,45 @@ class EchoConnection(Helpers, BaseConnection):
         :return:
         """
         physician = self.get_physician(physician_id)
-        schema_and_data = ET.fromstring(physician)
-        for key, value in kwargs.items():
-            if schema_and_data[1][0].find(key) is None:
-                new_attr = ET.SubElement(schema_and_data[1][0], key)
-                new_attr.text = value
-            else:
-                schema_and_data[1][0].find(key).text = str(value)
-        updated_schema = ET.tostring(schema_and_data)
-        # print_xml(updated_schema)
-        args = ["Locations", "Provider", "PhysicianDetail",
-                "Symed", "@PhysicianID|{physician_id}|int".format(physician_id=physician_id), updated_schema]
-        return self.API_UpdateData(*args)
+        return self.API_UpdateData(*self._physician_request(physician_id, physician, kwargs))
+
+    def edit_physicians(self, edits, chunk_size=500, workers=4):
+        """
+        bulk equivalent of self.edit_physician. The current records are fetched chunk_size at a time with
+        API_GeneralQuery and compared to the requested values, so physicians whose values all match cost no further
+        call. Each remaining physician costs one read of its PhysicianDetail screen, which is compared to the requested
+        values again and, if any still differ, edited and sent back with API_UpdateData, workers at a time.
+
+        :param edits: (dict) {physician_id: {field: value}}, see add_physician for the list of fields
+        :param chunk_size: (int) number of physicians fetched per round trip
+        :param workers: (int) maximum number of physicians read and updated at once
+        :return: (dict) {physician_id (int): report} where report is a dict with a "status" of
+            * "unchanged": every value already matched, nothing was sent
+            * "updated": "changes" holds the fields that were sent and "result" the API_UpdateData response
+            * "missing": there is no physician with this id
+            * "error": "changes" holds the fields that were to be sent and "error" the reason they were not
+        """
+        edits = {int(physician_id): fields for physician_id, fields in edits.items()}
+        # compared as the text the service holds, whatever typed_rows and compact_rows are set to
+        rows = self._query_in_chunks("PhysicianDetail", "PhysicianID", edits.keys(), chunk_size, workers)
+        report, pending = self._plan_edits(edits, rows)
+
+        def update(physician_id):
+            fields, changes = pending[physician_id]
+            try:
+                item, request = self._edit_report(physician_id, self.get_physician(physician_id), fields)
+                if request is None:
+                    return physician_id, item
+                changes = item['changes']
+                item['result'] = self.API_UpdateData(*request)
+            except APICallError as e:
+                return physician_id, {'status': 'error', 'changes': changes, 'error': str(e)}
+            return physician_id, item
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                report.update(executor.map(update, pending))
+        return report
 
     @handle_response
     def delete_physician(self, physician_id="", office_id=""):
@@ -547,7 +1411,7 @@ class EchoConnection(Helpers, BaseConnection):
         return self.API_TreeDataCommand(*args)
 
     @handle_response
-    def delete_contact_log_entry(self, physician_id, call_id="", limit=2, **kwarg):
+    def delete_contact_log_entry(self, physician_id, call_id="", limit=2, append_only=False, **kwarg):
         """
 
         :param physician_id: (int) id of physician that the log entry belongs to
@@ -561,6 +1425,9 @@ class EchoConnection(Helpers, BaseConnection):
             * connection.delete_contact_log_entry(1, limit=20, CallID__ne='-1') will delete up to 20 call log entries where the CallID is not -1 (so it deletes all of them)
             * connection.delete_contact_log_entry(1, TimeEdited__lt=<insert isoformat timestampe>) will fail to delete the call log with edited before the date unless there is only one that matches the query
             * note that only CallID and TimeEdited searches will ever work due to a combination of factors.
+        :param append_only: (bool) upload only the deleted rows as a DataSet diffgram instead of the remaining contact
+            log. The matching rows are found with echo_api.query.ResultTable lookups, which also make searches on other
+            columns work.
 
         :return:
         """
@@ -568,22 +1435,37 @@ class EchoConnection(Helpers, BaseConnection):
             kwarg['CallID'] = str(call_id)
         contact_log = self.get_contact_log(physician_id)
         guid = self._get_physician_guid(physician_id)
-        schema_and_data = XMLSchema(contact_log)
-        num_delete = len(schema_and_data.search(**kwarg))
-        if num_delete <= limit and num_delete != 0:
-            schema_and_data.delete_elements_where(**kwarg)
-            updated_schema_str = ET.tostring(schema_and_data.schema)
-            args = ["Locations", "Provider", "CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid),
-                    updated_schema_str]
-            return self.API_UpdateData(*args)
+        return self.API_UpdateData(*self._contact_log_deletion_request(contact_log, guid, limit, append_only, **kwarg))
 
-        elif num_delete == 0:
-            raise APICallError('Could not find CallLog matching {kwarg}.'.format(kwarg=kwarg))
+    def _empty_dataset(self, screen_name):
+        """
+        A dataset of the screen that has the inline schema but no rows, fetched by asking for a record that cannot
+        exist: this assumes that no record has the id -1 or the all-zero guid (see _empty_parameters). It is kept in
+        self.screen_cache, so it is fetched once per process (or never, when the cache is
+        persisted to a file).
 
-        else:
-            raise APICallError('Attempted to delete {num_delete} items, which exceeds the limit of {limit}.'
-                               ' If you wish to delete all {num_delete} items, you may set limit={num_delete} '
-                               'when calling this method.'.format(num_delete=num_delete, limit=limit))
+        :param screen_name: (str) one of self.SCREENS
+        :return: (xml string)
+        """
+        dataset = self.screen_cache.get(self.endpoint, screen_name, 'dataset')
+        if dataset is None:
+            dataset = self._remember_screen(screen_name, 'dataset',
+                                            self.API_GetData(screen_name, "Symed", self._empty_parameters(screen_name)))
+        return dataset
+
+    def screen_parameters(self, screen_name, name_space='Symed'):
+        """
+        self.API_SelectParameters(screen_name, name_space), remembered in self.screen_cache
+
+        :param screen_name: (str) name of the screen
+        :param name_space: (str) name space of the screen
+        :return: (xml string) whatever self.API_SelectParameters returns
+        """
+        kind = 'parameters:{name_space}'.format(name_space=name_space)
+        parameters = self.screen_cache.get(self.endpoint, screen_name, kind)
+        if parameters is None:
+            parameters = self._remember_screen(screen_name, kind, self.API_SelectParameters(screen_name, name_space))
+        return parameters
 
     @handle_response
     def get_physician(self, physician_id):
@@ -630,6 +1512,204 @@ class EchoConnection(Helpers, BaseConnection):
         args = ["CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid)]
         return self.API_GetData(*args)
 
+    def get_physicians(self, physician_ids, chunk_size=500, workers=1):
+        """
+        bulk equivalent of self.show_physician; fetches chunk_size physicians per API_GeneralQuery round trip
+
+        :param physician_ids: (iterable of int) ids of the physicians we desire
+        :param chunk_size: (int) number of physicians requested per round trip
+        :param workers: (int) number of round trips to run concurrently
+        :return: (dict) {physician_id (int): xmlmanip.InnerSchemaDict}; ids that do not exist are left out
+        """
+        rows = self._query_in_chunks("PhysicianDetail", "PhysicianID", physician_ids, chunk_size, workers,
+                                     typed=self.typed_rows, compact=self.compact_rows)
+        return self._rows_by_id(rows, 'PhysicianID')
+
+    def get_offices(self, office_ids, chunk_size=500, workers=1):
+        """
+        bulk equivalent of self.show_office; fetches chunk_size offices per API_GeneralQuery round trip
+
+        :param office_ids: (iterable of int) ids of the offices we desire
+        :param chunk_size: (int) number of offices requested per round trip
+        :param workers: (int) number of round trips to run concurrently
+        :return: (dict) {office_id (int): xmlmanip.InnerSchemaDict}; ids that do not exist are left out
+        """
+        rows = self._query_in_chunks("Offices", "OfficeID", office_ids, chunk_size, workers,
+                                     typed=self.typed_rows, compact=self.compact_rows)
+        return self._rows_by_id(rows, 'OfficeID')
+
+    def get_physicians_medical_licenses(self, physician_ids, chunk_size=500, workers=1):
+        """
+        bulk equivalent of self.show_physician_medical_licenses; fetches the licenses of chunk_size physicians per
+        API_GeneralQuery round trip
+
+        :param physician_ids: (iterable of int) ids of the physicians whose licenses we desire
+        :param chunk_size: (int) number of physicians requested per round trip
+        :param workers: (int) number of round trips to run concurrently
+        :return: (dict) {physician_id (int): list of xmlmanip.InnerSchemaDict sorted by AutoID}; physicians without
+            licenses are left out
+        """
+        rows = self._query_in_chunks("MedicalLicenses", "PhysicianID", physician_ids, chunk_size, workers,
+                                     typed=self.typed_rows, compact=self.compact_rows)
+        return self._licenses_by_physician(rows)
+
+    def show_physicians_by_id(self, physician_ids, chunk_size=500, workers=1):
+        """
+
+        :param physician_ids: (iterable of int) ids of the physicians we desire
+        :param chunk_size: (int) number of physicians requested per round trip
+        :param workers: (int) number of round trips to run concurrently
+        :return: (list) xmlmanip.InnerSchemaDict of each physician found, sorted by PhysicianID
+        """
+        physicians = self.get_physicians(physician_ids, chunk_size, workers)
+        return [physicians[physician_id] for physician_id in sorted(physicians)]
+
+    def show_offices_by_id(self, office_ids, chunk_size=500, workers=1):
+        """
+
+        :param office_ids: (iterable of int) ids of the offices we desire
+        :param chunk_size: (int) number of offices requested per round trip
+        :param workers: (int) number of round trips to run concurrently
+        :return: (list) xmlmanip.InnerSchemaDict of each office found, sorted by OfficeID
+        """
+        offices = self.get_offices(office_ids, chunk_size, workers)
+        return [offices[office_id] for office_id in sorted(offices)]
+
+    def query(self, qs, parameters=""):
+        """
+        Runs qs through self.API_GeneralQuery and returns the rows as a ResultTable that can be filtered, ordered and
+        limited client side without parsing the response again.
+
+        :param qs: the SQL-style query to be run
+        :param parameters: optional set of parameters in form of @name|value|type
+        :return: (echo_api.query.ResultTable)
+        """
+        return self._result_table(self.API_GeneralQuery(qs, parameters), self.typed_rows, self.compact_rows)
+
+    def iter_query(self, qs, parameters=""):
+        """
+        Streaming counterpart of self.API_GeneralQuery. The rows are yielded one at a time as they are parsed instead
+        of being loaded into an xmlmanip.XMLSchema first.
+
+        :param qs: the SQL-style query to be run
+        :param parameters: optional set of parameters in form of @name|value|type
+        :return: generator of xmlmanip.SchemaInnerDict, one per row, in the order the service returned them
+        """
+        return self._iter_rows(self.API_GeneralQuery(qs, parameters), typed=self.typed_rows, compact=self.compact_rows)
+
+    def iter_pages(self, table, page_size=1000, where="", prefetch=True, primary_key=None, typed=None, compact=None):
+        """
+        Keyset pagination over table: every page is a SELECT TOP page_size ... WHERE primary_key > (last key of the
+        previous page) ORDER BY primary_key, so each round trip is bounded no matter how large the table is. With
+        prefetch the next page is requested in the background while the caller works on the current one.
+
+        :param table: (str) name of the table
+        :param page_size: (int) maximum number of rows per page
+        :param where: (str, optional) additional SQL condition, ex: "OfficeID = PracticeID"
+        :param prefetch: (bool) request the next page while the current one is being consumed
+        :param primary_key: (str, optional) integer key column; defaults to self.PRIMARY_KEYS[table]
+        :param typed: (bool, optional) decode the values of the rows to the types of their columns; defaults to
+            self.typed_rows
+        :param compact: (bool, optional) return the rows as echo_api.query.Record instances; defaults to
+            self.compact_rows
+        :return: generator of echo_api.query.ResultTable in primary key order. The first page is always yielded, even
+            if it is empty, so that its columns are available.
+        """
+        primary_key = primary_key or self.PRIMARY_KEYS[table]
+        typed = self.typed_rows if typed is None else typed
+        compact = self.compact_rows if compact is None else compact
+
+        def fetch(last_key):
+            return self.API_GeneralQuery(self._page_query(table, page_size, primary_key, where, last_key), "")
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            schema_str = fetch(None)
+            while True:
+                page = self._result_table(schema_str, typed, compact)
+                if len(page) < page_size:
+                    yield page
+                    return
+                last_key = self._page_cursor(page, table, primary_key)
+                pending = executor.submit(fetch, last_key) if executor else None
+                yield page
+                schema_str = pending.result() if pending else fetch(last_key)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def _iter_table(self, table, where="", page_size=None):
+        if page_size:
+            return (row for page in self.iter_pages(table, page_size, where) for row in page)
+        return self.iter_query(self._table_query(table, where))
+
+    def _show_pages(self, table, page_size, where=""):
+        # rows come back in primary key order, as _search_schema would sort them, and are filtered as it filters them
+        return ResultTable(self._iter_table(table, where, page_size)).filter(**self._placeholder_filter(table)).rows
+
+    def iter_physicians(self, page_size=None):
+        """
+
+        :param page_size: (int, optional) fetch the rows in keyset pages of this size (see iter_pages)
+        :return: generator of xmlmanip.SchemaInnerDict, one per physician (unsorted unless paged, see show_physicians)
+        """
+        return self._iter_table("PhysicianDetail", page_size=page_size)
+
+    def iter_offices(self, page_size=None):
+        """
+
+        :param page_size: (int, optional) fetch the rows in keyset pages of this size (see iter_pages)
+        :return: generator of xmlmanip.SchemaInnerDict, one per office (unsorted unless paged, see show_offices)
+        """
+        return self._iter_table("Offices", page_size=page_size)
+
+    def iter_practices(self, page_size=None):
+        """
+
+        :param page_size: (int, optional) fetch the rows in keyset pages of this size (see iter_pages)
+        :return: generator of xmlmanip.SchemaInnerDict, one per practice (unsorted unless paged, see show_practices)
+        """
+        return self._iter_table("Offices", where="OfficeID = PracticeID", page_size=page_size)
+
+    def iter_contact_logs(self, page_size=None):
+        """
+
+        :param page_size: (int, optional) fetch the rows in keyset pages of this size (see iter_pages)
+        :return: generator of xmlmanip.SchemaInnerDict, one per contact log entry (unsorted unless paged, see
+            show_contact_logs)
+        """
+        return self._iter_table("ContactLog", page_size=page_size)
+
+    def iter_medical_licenses(self, page_size=None):
+        """
+
+        :param page_size: (int, optional) fetch the rows in keyset pages of this size (see iter_pages)
+        :return: generator of xmlmanip.SchemaInnerDict, one per medical license (unsorted unless paged, see
+            show_medical_licenses)
+        """
+        return self._iter_table("MedicalLicenses", page_size=page_size)
+
+    def changes_since(self, table, watermark=None, checkpoint=None, column=None):
+        """
+        Streams the rows of table that were modified after watermark, oldest change first. When a checkpoint is given
+        its watermark for the table is used by default, and it is advanced to the newest change only once every row has
+        been consumed; a sync that stops part way through sees the same rows again on its next poll.
+
+        :param table: (str) name of the table, ex: PhysicianDetail, MedicalLicenses, Offices, ContactLog
+        :param watermark: (str or datetime, optional) only rows modified after this are returned; all rows when neither
+            watermark nor a stored checkpoint watermark is available
+        :param checkpoint: (echo_api.checkpoint.Checkpoint, optional) persisted watermarks
+        :param column: (str, optional) modification time column; defaults to self.CHANGE_COLUMNS[table]
+        :return: generator of xmlmanip.SchemaInnerDict
+        """
+        qs, column = self._changes_query(table, watermark, checkpoint, column)
+        newest = None
+        for row in self.iter_query(qs):
+            newest = self._newest_change(newest, row, column)
+            yield row
+        if checkpoint is not None and newest is not None:
+            checkpoint.advance(table, newest)
+
     @handle_response
     def show_physician(self, physician_id):
         """
@@ -638,7 +1718,7 @@ class EchoConnection(Helpers, BaseConnection):
         :return: xmlmanip.InnerSchemaDict (can be used as dict) of info
         """
         schema_str = self.get_physician(physician_id)
-        return self._search_schema(schema_str, PhysicianID__ne=-1)
+        return self._show_rows(schema_str, "PhysicianDetail")
 
     @handle_response
     def show_physician_medical_licenses(self, physician_id, show_all=True):
@@ -649,7 +1729,7 @@ class EchoConnection(Helpers, BaseConnection):
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
         schema_str = self.get_medical_licenses(physician_id)
-        return self._search_schema(schema_str, show_all=show_all, AutoID__ne=-1)
+        return self._show_rows(schema_str, "MedicalLicenses", show_all)
 
     @handle_response
     def show_office(self, office_id):
@@ -659,7 +1739,7 @@ class EchoConnection(Helpers, BaseConnection):
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
         schema_str = self.get_office(office_id)
-        return self._search_schema(schema_str, show_all=False, OfficeID__ne=-1)
+        return self._show_rows(schema_str, "Offices", False)
 
     @handle_response
     def show_physician_contact_log(self, physician_id, show_all=True):
@@ -672,63 +1752,102 @@ class EchoConnection(Helpers, BaseConnection):
         guid = self._get_physician_guid(physician_id)
         args = ["CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid)]
         schema_str = self.API_GetData(*args)
-        return self._search_schema(schema_str, show_all=show_all, CallID__ne=-1)
+        return self._show_rows(schema_str, "ContactLog", show_all)
 
     @handle_response
-    def show_offices(self, show_all=True):
+    def show_offices(self, show_all=True, page_size=None):
         """
 
         :param show_all: (boolean) if True shows all, if False shows last created
+        :param page_size: (int, optional) with show_all, fetch the rows in keyset pages of this size (see
+            iter_pages) instead of one unbounded query
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
-        qs = "SELECT * FROM Offices"
-        schema_str = self.API_GeneralQuery(qs, "")
-        return self._search_schema(schema_str, show_all=show_all, OfficeID__ne=-1)
+        if show_all and page_size:
+            return self._show_pages("Offices", page_size)
+        schema_str = self.API_GeneralQuery(self._table_query("Offices"), "")
+        return self._show_rows(schema_str, "Offices", show_all)
 
     @handle_response
-    def show_practices(self, show_all=True):
+    def show_practices(self, show_all=True, page_size=None):
         """
 
         :param show_all: (boolean) if True shows all, if False shows last created
+        :param page_size: (int, optional) with show_all, fetch the rows in keyset pages of this size (see
+            iter_pages) instead of one unbounded query
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
-        qs = "SELECT * FROM Offices WHERE OfficeID = PracticeID"
-        schema_str = self.API_GeneralQuery(qs, "")
-        return self._search_schema(schema_str, show_all=show_all, OfficeID__ne=-1)
+        if show_all and page_size:
+            return self._show_pages("Offices", page_size, where="OfficeID = PracticeID")
+        schema_str = self.API_GeneralQuery(self._table_query("Offices", "OfficeID = PracticeID"), "")
+        return self._show_rows(schema_str, "Offices", show_all)
 
     @handle_response
-    def show_physicians(self, show_all=True):
+    def show_physicians(self, show_all=True, page_size=None):
         """
 
         :param show_all: (boolean) if True shows all, if False shows last created
+        :param page_size: (int, optional) with show_all, fetch the rows in keyset pages of this size (see
+            iter_pages) instead of one unbounded query
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
-
-        qs = "SELECT * FROM PhysicianDetail"
-        schema_str = self.API_GeneralQuery(qs, "")
-        return self._search_schema(schema_str, show_all=show_all, PhysicianID__ne=-1)
+        if show_all and page_size:
+            return self._show_pages("PhysicianDetail", page_size)
+        schema_str = self.API_GeneralQuery(self._table_query("PhysicianDetail"), "")
+        return self._show_rows(schema_str, "PhysicianDetail", show_all)
 
     @handle_response
-    def show_contact_logs(self, show_all=True):
+    def show_contact_logs(self, show_all=True, page_size=None):
         """
 
         :param show_all: (boolean) if True shows all, if False shows last created
+        :param page_size: (int, optional) with show_all, fetch the rows in keyset pages of this size (see
+            iter_pages) instead of one unbounded query
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
-        qs = "SELECT * FROM ContactLog"
-        schema_str = self.API_GeneralQuery(qs, "")
-        return self._search_schema(schema_str, show_all=show_all, CallID__ne=-1)
+        if show_all and page_size:
+            return self._show_pages("ContactLog", page_size)
+        schema_str = self.API_GeneralQuery(self._table_query("ContactLog"), "")
+        return self._show_rows(schema_str, "ContactLog", show_all)
 
     @handle_response
-    def show_medical_licenses(self, show_all=True):
+    def show_medical_licenses(self, show_all=True, page_size=None):
         """
 
         :param show_all: (boolean) if True shows all, if False shows last created
+        :param page_size: (int, optional) with show_all, fetch the rows in keyset pages of this size (see
+            iter_pages) instead of one unbounded query
         :return: xmlmanip.InnerSchemaDict or xmlmanip.SearchableList (can be used as dict) of info
         """
-        qs = "SELECT * FROM MedicalLicenses"
-        schema_str = self.API_GeneralQuery(qs, "")
-        return self._search_schema(schema_str, show_all=show_all, AutoID__ne=-1)
+        if show_all and page_size:
+            return self._show_pages("MedicalLicenses", page_size)
+        schema_str = self.API_GeneralQuery(self._table_query("MedicalLicenses"), "")
+        return self._show_rows(schema_str, "MedicalLicenses", show_all)
+
+
+class LazyLogText:
+    """
+    Log message argument that is only rendered, and cut to max_size characters, if the record is actually emitted.
+    """
+
+    def __init__(self, render, max_size=None):
+        """
+
+        :param render: (function) returns the text
+        :param max_size: (int, optional) maximum number of characters logged
+        """
+        self.render = render
+        self.max_size = max_size
+
+    def __str__(self):
+        text = self.render()
+        if self.max_size and len(text) > self.max_size:
+            text = '{text}... ({more} more characters)'.format(text=text[:self.max_size], more=len(text) - self.max_size)
+        return text
+
+
+# the library leaves logging configuration to the application; see EchoDebug for enabling its output
+logging.getLogger('echo_api.debug').addHandler(logging.NullHandler())
 
 
 @wrap_methods
@@ -736,50 +1855,89 @@ class EchoDebug(EchoConnection):
     """
     This class adds some quality-of-life improvements to the BaseConnection class.
 
-    - WRAPPED_METHODS are wrapped by WRAPPER_METHOD_NAMES
-    - wrappers can be toggled on and off during PaycomConnection instanciation.
+    - WRAPPED_METHODS are wrapped by WRAPPER_METHOD_NAMES, which log the calls to the "echo_api.debug" logger at DEBUG
+      level. Signatures are resolved once, when the class is created, and XML is only pretty-printed if the record is
+      emitted.
+    - wrappers can be toggled on and off during instanciation or with set_debug(); with everything off the wrapped
+      methods are called directly.
+    - nothing is printed until the application enables the records of the logger, ex:
+      logging.basicConfig(); logging.getLogger('echo_api.debug').setLevel(logging.DEBUG)
 
     example:
-    - paycom = PaycomConnection(show_messages=True, log_errors=False, keep_authenticated=False, serialize=False)
+    - echo = EchoDebug(show_xml=False, max_log_size=2000)
+    - echo.set_debug(show_args=False)
 
     default:
-    - paycom = PaycomConnection(show_messages=False, log_errors=True, keep_authenticated=True, serialize=True)
+    - echo = EchoDebug(show_xml=True, show_signature=True, show_args=True, max_log_size=10000)
     """
     WRAPPER_METHOD_NAMES = ['show_signature']
     WRAPPED_METHODS = ['API_SelectParameters', 'API_GeneralQuery', 'API_GetData', 'API_UpdateData', 'API_TreeDataCommand', 'API_CreateNoPenUser', 'API_Login', 'API_Logout']
     MESSAGE_OVERRIDE_MAP = {}
 
-    def show_xml(self, method, *args, **kwargs):
-        if self._show_xml:
+    def _xml_text(self, value):
+        def render():
             try:
-                print_xml(args[-1])
-            except:
-                print("Final {} argument not XML".format(method.__name__))
-        response = method(*args, **kwargs)
-        return response
-
-    def show_signature(self, method, *args, **kwargs):
-        if self._show_signature:
-            print(str(method.__name__) + str(inspect.signature(method)))
-        if self._show_args:
-            if 'dsXML' in str(inspect.signature(method)):
-                arg_string = ', '.join(['"{}"'.format(arg) for arg in args[:-1]])
-                arg_string += ', *dsXML'
-            else:
-                arg_string = ', '.join(['"{}"'.format(arg) for arg in args])
-            print('{name}({arg_string})'.format(name=method.__name__, arg_string=arg_string))
-        if self._show_xml and 'dsXML' in str(inspect.signature(method)):
-            print_xml(args[-1])
+                return self._pretty_xml(value)
+            except (ET.ParseError, TypeError):
+                return str(value)
+        return LazyLogText(render, self.max_log_size)
 
-        response = method(*args, **kwargs)
-        return response
+    def show_xml(self, method, *args, **kwargs):
+        if self._show_xml and args and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s final argument:\n%s', method.__name__, self._xml_text(args[-1]))
+        return method(*args, **kwargs)
 
-    def __init__(self, settings=Settings(), show_xml=True, show_signature=True, show_args=True, *args, **kwargs):
+    def show_signature(self, method, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            name = method.__name__
+            signature = self.WRAPPED_SIGNATURES[name]
+            has_xml = 'dsXML' in signature.parameters
+            if self._show_signature:
+                self.logger.debug('%s%s', name, signature)
+            if self._show_args:
+                shown = args[:-1] if has_xml else args
+                self.logger.debug('%s(%s)', name, LazyLogText(
+                    lambda: ', '.join('"{}"'.format(arg) for arg in shown) + (', *dsXML' if has_xml else ''),
+                    self.max_log_size))
+            if self._show_xml and has_xml and args:
+                self.logger.debug('%s dsXML:\n%s', name, self._xml_text(args[-1]))
+        return method(*args, **kwargs)
+
+    def set_debug(self, show_xml=None, show_signature=None, show_args=None):
+        """
+        Turns parts of the debug output on or off; arguments left as None keep their current value.
+
+        :param show_xml: (bool) log the dsXML of API_UpdateData
+        :param show_signature: (bool) log the signature of each call
+        :param show_args: (bool) log the arguments of each call
+        :return:
+        """
+        if show_xml is not None:
+            self._show_xml = show_xml
+        if show_signature is not None:
+            self._show_signature = show_signature
+        if show_args is not None:
+            self._show_args = show_args
+        enabled = self._show_xml or self._show_signature or self._show_args
+        bind_wrappers(self, self.WRAPPER_METHOD_NAMES if enabled else [])
+
+    def __init__(self, settings=None, show_xml=True, show_signature=True, show_args=True, *args, logger=None,
+                 max_log_size=10000, **kwargs):
+        """
+
+        :param settings: (Settings, optional) see BaseConnection
+        :param show_xml: (bool) log the dsXML of API_UpdateData
+        :param show_signature: (bool) log the signature of each call
+        :param show_args: (bool) log the arguments of each call
+        :param logger: (logging.Logger, optional) defaults to the "echo_api.debug" logger
+        :param max_log_size: (int) maximum number of characters of arguments or XML per record; None for no limit
+        """
+        self.logger = logger or logging.getLogger('echo_api.debug')
+        self.max_log_size = max_log_size
+        self._show_xml = self._show_signature = self._show_args = False
+        self.set_debug(show_xml, show_signature, show_args)
         super(EchoDebug, self).__init__(settings, *args, **kwargs)
-        self._show_xml = show_xml
-        self._show_signature = show_signature
-        self._show_args = show_args
-        # the docstring is more useful if it the BaseConnection docstring is shown first,
-        EchoDebug.__doc__ = EchoConnection.__doc__ + self.__doc__
-        self.__doc__ = EchoDebug.__doc__
 
+
+# the docstring is more useful if the EchoConnection docstring is shown first
+EchoDebug.__doc__ = EchoConnection.__doc__ + EchoDebug.__doc__
@@ -0,0 +1,687 @@
+"""
+asyncio counterparts of BaseConnection and EchoConnection. Requires the optional aiohttp (3.x) dependency, installed
+with the "async" extra.
+
+example:
+- connection = AsyncEchoConnection().prepare()
+- async with connection:
+-     physicians = await asyncio.gather(*[connection.show_physician(i) for i in range(1, 101)])
+"""
+import asyncio
+from functools import wraps
+
+from zeep.transports import Transport
+
+from .api import (APICallError, APITestFailError, BaseConnection, ImproperlyConfigured, Helpers, Settings,
+                  metered_helpers, session_expired)
+from .cache import AsyncSingleFlight, LRUCache, ResponseCache, SCREEN_CACHE, WSDL_CACHE
+from .query import ResultTable
+
+
+class AsyncTransport(Transport):
+    """
+    zeep transport for AsyncBaseConnection. zeep 2.3's own AsyncTransport relies on aiohttp.Timeout, which aiohttp 3
+    removed, and downloads the WSDL with loop.run_until_complete, which fails inside a running loop. This transport
+    downloads WSDL and XSD documents synchronously with requests, as zeep.transports.Transport does, and makes the SOAP
+    calls with an aiohttp ClientSession opened on the running loop at the first call.
+    """
+    supports_async = True
+
+    def __init__(self, cache=None, timeout=300, operation_timeout=None, session=None):
+        """
+
+        :param cache: (zeep.cache.Base, optional) cache for downloaded WSDL and XSD documents
+        :param timeout: (float) seconds allowed for each document download
+        :param operation_timeout: (float, optional) seconds allowed for each SOAP call
+        :param session: (aiohttp.ClientSession, optional) session for the SOAP calls; closed by close() only when it
+            was opened by this transport
+        """
+        super(AsyncTransport, self).__init__(cache=cache, timeout=timeout, operation_timeout=operation_timeout)
+        self.aiohttp_session = session
+        self._close_session = session is None
+
+    def _aiohttp_session(self):
+        import aiohttp
+
+        if self.aiohttp_session is None:
+            self.aiohttp_session = aiohttp.ClientSession(headers={'User-Agent': self.session.headers['User-Agent']})
+        return self.aiohttp_session
+
+    def _timeout(self):
+        import aiohttp
+
+        return aiohttp.ClientTimeout(total=self.operation_timeout)
+
+    async def post(self, address, message, headers):
+        self.logger.debug("HTTP Post to %s:\n%s", address, message)
+        async with self._aiohttp_session().post(address, data=message, headers=headers,
+                                                timeout=self._timeout()) as response:
+            return await self.new_response(response)
+
+    async def post_xml(self, address, envelope, headers):
+        from zeep.wsdl.utils import etree_to_string
+
+        return await self.post(address, etree_to_string(envelope), headers)
+
+    async def get(self, address, params, headers):
+        async with self._aiohttp_session().get(address, params=params, headers=headers,
+                                               timeout=self._timeout()) as response:
+            return await self.new_response(response)
+
+    @staticmethod
+    async def new_response(response):
+        """
+
+        :param response: (aiohttp.ClientResponse)
+        :return: (requests.Response) with the content read, which is what zeep processes replies from
+        """
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+
+        new = Response()
+        new._content = await response.read()
+        new.status_code = response.status
+        new.headers = CaseInsensitiveDict(response.headers)
+        new.encoding = response.charset
+        new.url = str(response.url)
+        return new
+
+    async def close(self):
+        """
+        Closes the aiohttp session (if this transport opened it) and the requests session used for downloads.
+
+        :return:
+        """
+        if self.aiohttp_session is not None and self._close_session:
+            await self.aiohttp_session.close()
+            self.aiohttp_session = None
+        self.session.close()
+
+
+def async_handle_response(method):
+    @wraps(method)
+    async def _impl(self, *method_args, **method_kwargs):
+        response = await method(self, *method_args, **method_kwargs)
+        if "Error|" in response:
+            raise APICallError(response)
+        else:
+            return response
+    return _impl
+
+
+def async_keep_warm(method):
+    # same contract as api.keep_warm; concurrent calls that find the session expired share a single re-login.
+    @wraps(method)
+    async def _impl(self, *method_args, **method_kwargs):
+        if self.session_id is None:
+            await self.login()
+        session_id = self.session_id
+        response = await method(self, *method_args, **method_kwargs)
+        if session_expired(response):
+            await self.login(expired_session_id=session_id)
+            response = await method(self, *method_args, **method_kwargs)
+        return response
+    return _impl
+
+
+def async_cached_read(method):
+    # same contract as api.cached_read
+    @wraps(method)
+    async def _impl(self, screen_name, name_space, parameters):
+        if self.response_cache is None:
+            return await method(self, screen_name, name_space, parameters)
+        key = (screen_name, name_space, parameters)
+        response = self.response_cache.get(key)
+        if response is None:
+            generation = self.response_cache.generation
+            response = await method(self, screen_name, name_space, parameters)
+            if not (session_expired(response) or "Error|" in response):
+                self.response_cache.set(key, response, generation=generation)
+        return response
+    return _impl
+
+
+def async_metered(method):
+    # same contract as api.metered
+    @wraps(method)
+    async def _impl(self, *method_args, **method_kwargs):
+        if self.metrics is None:
+            return await method(self, *method_args, **method_kwargs)
+        return await self.metrics.call_async(method.__name__, method, self, *method_args, **method_kwargs)
+    return _impl
+
+
+def async_single_flight(method):
+    # same contract as api.single_flight
+    @wraps(method)
+    async def _impl(self, *method_args, **method_kwargs):
+        if self.single_flight is None:
+            return await method(self, *method_args, **method_kwargs)
+        key = (method.__name__, method_args, tuple(sorted(method_kwargs.items())))
+        return await self.single_flight.do(key, method, self, *method_args, **method_kwargs)
+    return _impl
+
+
+class AsyncBaseConnection:
+    """
+    AsyncBaseConnection mirrors BaseConnection with coroutines running on an aiohttp based AsyncTransport, so a single
+    event loop can keep many SOAP calls in flight. Parsing the WSDL blocks, so call prepare() before starting the event
+    loop; otherwise it happens on first use and holds up the loop once. Logging in happens on the first call (or in
+    __aenter__) and every login and re-login is serialized behind one lock.
+    """
+    wsdl_cache = WSDL_CACHE
+    screen_cache = SCREEN_CACHE
+    get_operations = staticmethod(BaseConnection.get_operations)
+
+    @async_single_flight
+    @async_keep_warm
+    @async_metered
+    async def API_SelectParameters(self, screen_name, name_space='Symed'):
+        """
+        see BaseConnection.API_SelectParameters
+        """
+        return await self.client.service.API_SelectParameters(self.session_id, screen_name, name_space)
+
+    @async_single_flight
+    @async_keep_warm
+    @async_metered
+    async def API_GeneralQuery(self, query, parameters=""):
+        """
+        see BaseConnection.API_GeneralQuery
+        """
+        return await self.client.service.API_GeneralQuery(self.session_id, query, parameters)
+
+    @async_cached_read
+    @async_single_flight
+    @async_keep_warm
+    @async_metered
+    async def API_GetData(self, screen_name, name_space, parameters):
+        """
+        see BaseConnection.API_GetData
+        """
+        return await self.client.service.API_GetData(self.session_id, screen_name, name_space, parameters)
+
+    @async_keep_warm
+    @async_metered
+    async def API_UpdateData(self, tree_name, level_name, screen_name, name_space, parameters, dsXML):
+        """
+        see BaseConnection.API_UpdateData
+        """
+        response = await self.client.service.API_UpdateData(self.session_id, tree_name, level_name, screen_name,
+                                                            name_space, parameters, dsXML)
+        self._invalidate_reads(parameters, screen_name)
+        return response
+
+    @async_keep_warm
+    @async_metered
+    async def API_TreeDataCommand(self, tree_name, level_name, stored_proc, operation, param):
+        """
+        see BaseConnection.API_TreeDataCommand
+        """
+        response = await self.client.service.API_TreeDataCommand(self.session_id, tree_name, level_name, stored_proc,
+                                                                 operation, param)
+        self._invalidate_reads(param)
+        return response
+
+    @async_keep_warm
+    @async_metered
+    async def API_CreateNoPenUser(self, email, body, subject, return_email, password, parameters, security_groups,
+                                  send_mail):
+        """
+        see BaseConnection.API_CreateNoPenUser
+        """
+        if issubclass(security_groups.__class__, list):
+            security_groups = '|'.join(security_groups)
+
+        return await self.client.service.API_CreateNoPenUser(self.session_id, email, body, subject, return_email,
+                                                             password, parameters, security_groups, send_mail)
+
+    @async_metered
+    async def API_Login(self, username, password):
+        """
+        see BaseConnection.API_Login
+        """
+        return await self.client.service.API_Login(username, password)
+
+    @async_metered
+    async def API_Logout(self):
+        """
+        see BaseConnection.API_Logout
+        """
+        return await self.client.service.API_Logout(self.session_id)
+
+    @async_metered
+    async def API_Test(self):
+        """
+        see BaseConnection.API_Test
+        """
+        return await self.client.service.API_Test()
+
+    _invalidate_reads = BaseConnection._invalidate_reads
+
+    async def login(self, expired_session_id=None):
+        """
+        Logs in with the credentials from self.settings. Callers waiting on the lock while another coroutine logs in
+        reuse the session that coroutine obtained instead of logging in again.
+
+        :param expired_session_id: (str, optional) session id that the service reported as expired
+        :return: (str) the current session id
+        """
+        if self._login_lock is None:
+            self._login_lock = asyncio.Lock()
+        async with self._login_lock:
+            if self.session_id is not None and self.session_id != expired_session_id:
+                return self.session_id
+            response = await self.API_Login(self.settings.USERNAME, self.settings.PASSWORD)
+            if "Error" in response:
+                raise APICallError(response)
+            if "SessionID" in response:
+                self.session_id = response.split("|")[1]
+            else:
+                raise NotImplementedError("An unhandled exception occurred during authentication: " + response)
+            if self.metrics is not None:
+                self.metrics.count_login(relogin=expired_session_id is not None)
+            return self.session_id
+
+    async def close(self):
+        """
+        Logs out (if logged in) and closes the sessions of the transport.
+
+        :return:
+        """
+        if self.session_id is not None:
+            await self.API_Logout()
+            self.session_id = None
+        if self.transport is not None:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        if "Success" not in await self.API_Test():
+            raise APITestFailError("Test connection failed.")
+        await self.login()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def prepare(self):
+        """
+        Parses the WSDL (or takes it from self.wsdl_cache) and loads the screen cache file now. Both block, so call
+        this before starting the event loop.
+
+        :return: self
+        """
+        if self._client is None:
+            self.transport = AsyncTransport(cache=self.wsdl_cache.disk_cache(self.settings.WSDL_CACHE_DIR))
+            self._client = self.wsdl_cache.client(self.settings.WSDL_LOCATION, self.settings.ENDPOINT, self.transport,
+                                                  self.settings.WSDL_CACHE_DIR)
+            if self.settings.SCREEN_CACHE_FILE:
+                self.screen_cache.load(self.settings.SCREEN_CACHE_FILE)
+        return self
+
+    @property
+    def client(self):
+        """
+        The zeep client, built by prepare() if it has not been called yet.
+        """
+        if self._client is None:
+            self.prepare()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def __init__(self, settings=None, loop=None, *args, response_cache_size=0, response_cache_ttl=300,
+                 coalesce_reads=True, metrics=None, **kwargs):
+        """
+
+        :param settings: (Settings, optional) see BaseConnection. Cassettes are recorded and replayed by the requests
+            based transports of echo_api.replay, so a cassette_file in the settings is refused here
+        :param loop: kept for backwards compatibility; the aiohttp session is opened on the loop that makes the first
+            call
+        :param response_cache_size: (int) see BaseConnection
+        :param response_cache_ttl: (float) see BaseConnection
+        :param coalesce_reads: (bool) see BaseConnection; the coalescing is done per connection
+        :param metrics: (echo_api.metrics.Metrics, optional) see BaseConnection
+        """
+        settings = settings if settings is not None else Settings()
+        if settings.CASSETTE_FILE:
+            raise ImproperlyConfigured("Cassettes can only be recorded and replayed by synchronous connections.")
+        self.settings = settings
+        self.endpoint = settings.ENDPOINT
+        self.loop = loop
+        self.response_cache = ResponseCache(response_cache_size, response_cache_ttl) if response_cache_size else None
+        self.single_flight = AsyncSingleFlight() if coalesce_reads else None
+        self.metrics = metrics
+        self.session_id = None
+        self.transport = None
+        self._client = None
+        self._login_lock = None
+
+
+@metered_helpers
+class AsyncEchoConnection(Helpers, AsyncBaseConnection):
+    """
+    AsyncEchoConnection has coroutine versions of the EchoConnection helper methods; iter_pages, iter_query, the iter_*
+    helpers and changes_since are asynchronous generators. See the EchoConnection method of the same name for details
+    on each of them. Both classes build their requests and parse the responses with the methods of Helpers, and the
+    workers argument of the bulk helpers is the number of calls in flight at once.
+    """
+
+    def __init__(self, settings=None, loop=None, *args, guid_cache_size=10000, guid_cache_ttl=3600, typed_rows=False,
+                 compact_rows=False, **kwargs):
+        self.guid_cache = LRUCache(maxsize=guid_cache_size, ttl=guid_cache_ttl)
+        self.typed_rows = typed_rows
+        self.compact_rows = compact_rows
+        super(AsyncEchoConnection, self).__init__(settings, loop, *args, **kwargs)
+
+    async def _query_in_chunks(self, table, column, ids, chunk_size=500, workers=1, columns="*", typed=False,
+                               compact=False):
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def fetch(qs):
+            async with semaphore:
+                schema_str = await self.API_GeneralQuery(qs, "")
+            return list(self._iter_rows(schema_str, typed=typed, compact=compact))
+
+        results = await asyncio.gather(*[fetch(qs) for qs in self._in_chunk_queries(table, column, ids, chunk_size,
+                                                                                    columns)])
+        return [row for rows in results for row in rows]
+
+    async def resolve_guids(self, physician_ids, chunk_size=500):
+        guids, missing = self._cached_guids(physician_ids)
+        rows = await self._query_in_chunks("PhysicianDetail", "PhysicianID", missing, chunk_size,
+                                           columns="PhysicianID, EntityGuid")
+        return self._remember_guids(guids, rows)
+
+    @async_handle_response
+    async def _get_physician_guid(self, physician_id):
+        return self._physician_guid(await self.resolve_guids([physician_id]), physician_id)
+
+    async def _empty_dataset(self, screen_name):
+        dataset = self.screen_cache.get(self.endpoint, screen_name, 'dataset')
+        if dataset is None:
+            dataset = self._remember_screen(screen_name, 'dataset', await self.API_GetData(
+                screen_name, "Symed", self._empty_parameters(screen_name)))
+        return dataset
+
+    async def screen_parameters(self, screen_name, name_space='Symed'):
+        kind = 'parameters:{name_space}'.format(name_space=name_space)
+        parameters = self.screen_cache.get(self.endpoint, screen_name, kind)
+        if parameters is None:
+            parameters = self._remember_screen(screen_name, kind, await self.API_SelectParameters(screen_name,
+                                                                                                  name_space))
+        return parameters
+
+    @async_handle_response
+    async def add_physician(self, office_id, **kwargs):
+        args = ["Locations", "Provider", "PhysicianDetail_Create", 5, "@OfficeID|{office_id}|int".format(office_id=office_id)]
+        result = await self.API_TreeDataCommand(*args)
+        if "Error|" in result:
+            raise APICallError(result)
+        else:
+            if len(kwargs) != 0:
+                physician_id = result.split("|")[1]
+                return await self.edit_physician(physician_id, **kwargs)
+            else:
+                return result
+
+    @async_handle_response
+    async def add_nopen_account(self, physician_id, send_email=0, **kwargs):
+        physician = await self.get_physician(physician_id)
+        nopen_result = await self.API_CreateNoPenUser(*self._nopen_account_request(physician_id, physician, send_email,
+                                                                                   **kwargs))
+        if "Success|" not in nopen_result:
+            raise APICallError(nopen_result)
+        status_result = await self.edit_physician(physician_id, EnrollmentStatusID="2")
+        if "Error|" in status_result:
+            raise APICallError(status_result)
+        return nopen_result
+
+    @async_handle_response
+    async def add_medical_license(self, physician_id, append_only=False, **kwargs):
+        if append_only:
+            dataset = await self._empty_dataset("MedicalLicenses")
+        else:
+            dataset = await self.get_medical_licenses(physician_id)
+        return await self.API_UpdateData(*self._medical_license_request(physician_id, dataset, kwargs, append_only))
+
+    @async_handle_response
+    async def add_contact_log_entry(self, physician_id, **kwargs):
+        return await self.add_contact_log_entries(physician_id, [kwargs])
+
+    @async_handle_response
+    async def add_contact_log_entries(self, physician_id, entries, append_only=False):
+        for fields in entries:
+            self._check_contact_log_fields(fields)
+        guid = await self._get_physician_guid(physician_id)
+        dataset = await (self._empty_dataset("CallLog") if append_only else self.get_contact_log(physician_id))
+        return self._added_contact_logs(await self.API_UpdateData(*self._contact_log_request(guid, entries, dataset,
+                                                                                             append_only)))
+
+    @async_handle_response
+    async def add_office(self, practice_id=""):
+        if not practice_id:
+            raise APICallError("You must provide a practice_id with which to associate this office.")
+        args = ["Locations", "Office", "Offices_Create", 5, "@PracticeID|{practice_id}|int".format(practice_id=practice_id)]
+        return await self.API_TreeDataCommand(*args)
+
+    @async_handle_response
+    async def edit_physician(self, physician_id, **kwargs):
+        physician = await self.get_physician(physician_id)
+        return await self.API_UpdateData(*self._physician_request(physician_id, physician, kwargs))
+
+    async def edit_physicians(self, edits, chunk_size=500, workers=4):
+        edits = {int(physician_id): fields for physician_id, fields in edits.items()}
+        rows = await self._query_in_chunks("PhysicianDetail", "PhysicianID", edits.keys(), chunk_size, workers)
+        report, pending = self._plan_edits(edits, rows)
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def update(physician_id):
+            fields, changes = pending[physician_id]
+            try:
+                async with semaphore:
+                    item, request = self._edit_report(physician_id, await self.get_physician(physician_id), fields)
+                    if request is None:
+                        return physician_id, item
+                    changes = item['changes']
+                    item['result'] = await self.API_UpdateData(*request)
+            except APICallError as e:
+                return physician_id, {'status': 'error', 'changes': changes, 'error': str(e)}
+            return physician_id, item
+
+        report.update(await asyncio.gather(*[update(physician_id) for physician_id in pending]))
+        return report
+
+    @async_handle_response
+    async def delete_physician(self, physician_id="", office_id=""):
+        if not (physician_id and office_id):
+            raise APICallError("You must specify both the physician_id and office_id.")
+        args = ["Locations", "Provider", "PhysicianDetail_Delete", 6,
+                "@PhysicianID|{physician_id}|int@OfficeID|{office_id}|int".format(physician_id=physician_id, office_id=office_id)]
+        return await self.API_TreeDataCommand(*args)
+
+    @async_handle_response
+    async def delete_office(self, office_id=""):
+        if not office_id:
+            raise APICallError("You must specify the office_id.")
+        args = ["Locations", "Office", "Offices_Delete", 6,
+                "@OfficeID|{office_id}|int".format(office_id=office_id)]
+        return await self.API_TreeDataCommand(*args)
+
+    @async_handle_response
+    async def delete_contact_log_entry(self, physician_id, call_id="", limit=2, append_only=False, **kwarg):
+        if call_id:
+            kwarg['CallID'] = str(call_id)
+        contact_log = await self.get_contact_log(physician_id)
+        guid = await self._get_physician_guid(physician_id)
+        return await self.API_UpdateData(*self._contact_log_deletion_request(contact_log, guid, limit, append_only,
+                                                                             **kwarg))
+
+    @async_handle_response
+    async def get_physician(self, physician_id):
+        args = ["PhysicianDetail", "Symed", "@PhysicianID|{physician_id}|int".format(physician_id=physician_id)]
+        return await self.API_GetData(*args)
+
+    @async_handle_response
+    async def get_office(self, office_id):
+        args = ["Office", "Symed", "@OfficeID|{office_id}|int".format(office_id=office_id)]
+        return await self.API_GetData(*args)
+
+    @async_handle_response
+    async def get_medical_licenses(self, physician_id):
+        args = ["MedicalLicenses", "Symed", "@PhysicianID|{physician_id}|int".format(physician_id=physician_id)]
+        return await self.API_GetData(*args)
+
+    @async_handle_response
+    async def get_contact_log(self, physician_id):
+        guid = await self._get_physician_guid(physician_id)
+        args = ["CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid)]
+        return await self.API_GetData(*args)
+
+    async def get_physicians(self, physician_ids, chunk_size=500, workers=1):
+        rows = await self._query_in_chunks("PhysicianDetail", "PhysicianID", physician_ids, chunk_size, workers,
+                                           typed=self.typed_rows, compact=self.compact_rows)
+        return self._rows_by_id(rows, 'PhysicianID')
+
+    async def get_offices(self, office_ids, chunk_size=500, workers=1):
+        rows = await self._query_in_chunks("Offices", "OfficeID", office_ids, chunk_size, workers,
+                                           typed=self.typed_rows, compact=self.compact_rows)
+        return self._rows_by_id(rows, 'OfficeID')
+
+    async def get_physicians_medical_licenses(self, physician_ids, chunk_size=500, workers=1):
+        rows = await self._query_in_chunks("MedicalLicenses", "PhysicianID", physician_ids, chunk_size, workers,
+                                           typed=self.typed_rows, compact=self.compact_rows)
+        return self._licenses_by_physician(rows)
+
+    async def show_physicians_by_id(self, physician_ids, chunk_size=500, workers=1):
+        physicians = await self.get_physicians(physician_ids, chunk_size, workers)
+        return [physicians[physician_id] for physician_id in sorted(physicians)]
+
+    async def show_offices_by_id(self, office_ids, chunk_size=500, workers=1):
+        offices = await self.get_offices(office_ids, chunk_size, workers)
+        return [offices[office_id] for office_id in sorted(offices)]
+
+    async def query(self, qs, parameters=""):
+        return self._result_table(await self.API_GeneralQuery(qs, parameters), self.typed_rows, self.compact_rows)
+
+    async def iter_query(self, qs, parameters=""):
+        schema_str = await self.API_GeneralQuery(qs, parameters)
+        for row in self._iter_rows(schema_str, typed=self.typed_rows, compact=self.compact_rows):
+            yield row
+
+    async def iter_pages(self, table, page_size=1000, where="", prefetch=True, primary_key=None, typed=None,
+                         compact=None):
+        primary_key = primary_key or self.PRIMARY_KEYS[table]
+        typed = self.typed_rows if typed is None else typed
+        compact = self.compact_rows if compact is None else compact
+
+        def fetch(last_key):
+            return self.API_GeneralQuery(self._page_query(table, page_size, primary_key, where, last_key), "")
+
+        pending = None
+        try:
+            schema_str = await fetch(None)
+            while True:
+                page = self._result_table(schema_str, typed, compact)
+                if len(page) < page_size:
+                    yield page
+                    return
+                last_key = self._page_cursor(page, table, primary_key)
+                pending = asyncio.ensure_future(fetch(last_key)) if prefetch else None
+                yield page
+                schema_str = await pending if pending else await fetch(last_key)
+                pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _iter_table(self, table, where="", page_size=None):
+        if page_size:
+            async for page in self.iter_pages(table, page_size, where):
+                for row in page:
+                    yield row
+        else:
+            async for row in self.iter_query(self._table_query(table, where)):
+                yield row
+
+    async def _show_pages(self, table, page_size, where=""):
+        rows = ResultTable([row async for row in self._iter_table(table, where, page_size)])
+        return rows.filter(**self._placeholder_filter(table)).rows
+
+    def iter_physicians(self, page_size=None):
+        return self._iter_table("PhysicianDetail", page_size=page_size)
+
+    def iter_offices(self, page_size=None):
+        return self._iter_table("Offices", page_size=page_size)
+
+    def iter_practices(self, page_size=None):
+        return self._iter_table("Offices", where="OfficeID = PracticeID", page_size=page_size)
+
+    def iter_contact_logs(self, page_size=None):
+        return self._iter_table("ContactLog", page_size=page_size)
+
+    def iter_medical_licenses(self, page_size=None):
+        return self._iter_table("MedicalLicenses", page_size=page_size)
+
+    async def changes_since(self, table, watermark=None, checkpoint=None, column=None):
+        qs, column = self._changes_query(table, watermark, checkpoint, column)
+        newest = None
+        async for row in self.iter_query(qs):
+            newest = self._newest_change(newest, row, column)
+            yield row
+        if checkpoint is not None and newest is not None:
+            checkpoint.advance(table, newest)
+
+    @async_handle_response
+    async def show_physician(self, physician_id):
+        return self._show_rows(await self.get_physician(physician_id), "PhysicianDetail")
+
+    @async_handle_response
+    async def show_physician_medical_licenses(self, physician_id, show_all=True):
+        return self._show_rows(await self.get_medical_licenses(physician_id), "MedicalLicenses", show_all)
+
+    @async_handle_response
+    async def show_office(self, office_id):
+        return self._show_rows(await self.get_office(office_id), "Offices", False)
+
+    @async_handle_response
+    async def show_physician_contact_log(self, physician_id, show_all=True):
+        guid = await self._get_physician_guid(physician_id)
+        args = ["CallLog", "Symed", '@EntityGuid|{guid}|guid'.format(guid=guid)]
+        return self._show_rows(await self.API_GetData(*args), "ContactLog", show_all)
+
+    @async_handle_response
+    async def show_offices(self, show_all=True, page_size=None):
+        if show_all and page_size:
+            return await self._show_pages("Offices", page_size)
+        return self._show_rows(await self.API_GeneralQuery(self._table_query("Offices"), ""), "Offices", show_all)
+
+    @async_handle_response
+    async def show_practices(self, show_all=True, page_size=None):
+        if show_all and page_size:
+            return await self._show_pages("Offices", page_size, where="OfficeID = PracticeID")
+        schema_str = await self.API_GeneralQuery(self._table_query("Offices", "OfficeID = PracticeID"), "")
+        return self._show_rows(schema_str, "Offices", show_all)
+
+    @async_handle_response
+    async def show_physicians(self, show_all=True, page_size=None):
+        if show_all and page_size:
+            return await self._show_pages("PhysicianDetail", page_size)
+        schema_str = await self.API_GeneralQuery(self._table_query("PhysicianDetail"), "")
+        return self._show_rows(schema_str, "PhysicianDetail", show_all)
+
+    @async_handle_response
+    async def show_contact_logs(self, show_all=True, page_size=None):
+        if show_all and page_size:
+            return await self._show_pages("ContactLog", page_size)
+        schema_str = await self.API_GeneralQuery(self._table_query("ContactLog"), "")
+        return self._show_rows(schema_str, "ContactLog", show_all)
+
+    @async_handle_response
+    async def show_medical_licenses(self, show_all=True, page_size=None):
+        if show_all and page_size:
+            return await self._show_pages("MedicalLicenses", page_size)
+        schema_str = await self.API_GeneralQuery(self._table_query("MedicalLicenses"), "")
+        return self._show_rows(schema_str, "MedicalLicenses", show_all)
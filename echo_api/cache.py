@@ -0,0 +1,549 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _DefinitionPickler(pickle.Pickler):
+    """
+    Pickles a parsed zeep definition. zeep builds a class for every type of the WSDL at parse time, which pickle
+    cannot import by name, so those classes are rebuilt from their name, bases and attributes. lxml QNames and
+    elements are rebuilt from their text, and transports are left out: the client is given one when it is loaded.
+    This relies on reducer_override, new in Python 3.8: classes are pickled by name before copyreg or a dispatch_table
+    is consulted.
+    """
+    DYNAMIC_MODULES = ('zeep.xsd.dynamic_types', 'zeep.objects')
+
+    def reducer_override(self, obj):
+        from lxml import etree
+        from zeep.transports import Transport
+
+        if isinstance(obj, type) and obj.__module__ in self.DYNAMIC_MODULES:
+            namespace = {key: value for key, value in vars(obj).items()
+                         if key not in ('__dict__', '__weakref__', '__doc__')}
+            return type, (obj.__name__, obj.__bases__, namespace)
+        if isinstance(obj, etree.QName):
+            return etree.QName, (obj.text,)
+        if isinstance(obj, etree._Element):
+            return etree.fromstring, (etree.tostring(obj),)
+        if isinstance(obj, Transport):
+            return type(None), ()
+        return NotImplemented
+
+
+class WSDLCache:
+    """
+    Store of parsed WSDL definitions. Parsing the OneAppWebService WSDL is by far the most expensive part of building a
+    zeep Client, so each distinct WSDL is parsed once per process and every later connection receives a shallow copy
+    of the parsed client bound to its own transport.
+
+    Entries are keyed by a hash of the WSDL file contents and the endpoint, so editing the WSDL file or pointing the
+    settings at another endpoint results in a fresh parse. A WSDL given as a url is keyed by the url instead, so call
+    invalidate() when the service definition changes.
+
+    Given a cache_dir, parsed definitions are also pickled there, so that new processes load them instead of parsing
+    the WSDL again. Only point cache_dir at a directory that nobody else can write to, since the files are unpickled.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(wsdl_location, endpoint, asynchronous=False):
+        """
+
+        :param wsdl_location: (str) path or url of the WSDL
+        :param endpoint: (str) endpoint that the WSDL is used against
+        :param asynchronous: (bool) zeep picks coroutine based bindings when the WSDL is parsed with an async
+            transport, so those definitions are cached separately
+        :return: (str) hex digest identifying the WSDL contents and endpoint
+        """
+        digest = hashlib.sha1(b'async' if asynchronous else b'sync')
+        if os.path.isfile(wsdl_location):
+            with open(wsdl_location, 'rb') as wsdl_file:
+                digest.update(wsdl_file.read())
+        else:
+            digest.update(wsdl_location.encode('utf-8'))
+        digest.update(endpoint.encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def disk_cache(cache_dir):
+        """
+        Downloaded WSDL and XSD documents are kept in the same directory as the parsed definitions, so a definition
+        that has to be parsed again (after invalidate() or a zeep upgrade) does not have to be fetched again either.
+
+        :param cache_dir: (str) directory in which to keep the sqlite file, empty for no disk cache
+        :return: zeep.cache.SqliteCache or None
+        """
+        from zeep.cache import SqliteCache
+
+        if not cache_dir:
+            return None
+        os.makedirs(cache_dir, exist_ok=True)
+        return SqliteCache(path=os.path.join(cache_dir, 'echo_api_wsdl.db'), timeout=None)
+
+    @staticmethod
+    def _definition_path(cache_dir, key):
+        """
+
+        :param cache_dir: (str) directory of the pickled definitions
+        :param key: (str) from self.key()
+        :return: (str) file of the definition; the zeep version is part of the name since the pickle holds its objects
+        """
+        from zeep import __version__
+
+        return os.path.join(cache_dir, 'echo_api_wsdl_{key}_zeep{version}.pickle'.format(key=key, version=__version__))
+
+    def _load_definition(self, cache_dir, key):
+        """
+
+        :return: (zeep.Client) the pickled client, or None if there is none or it cannot be read
+        """
+        path = self._definition_path(cache_dir, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as definition_file:
+                return pickle.load(definition_file)
+        except Exception:  # a stale or damaged file is parsed again and overwritten
+            return None
+
+    def _save_definition(self, cache_dir, key, client):
+        path = self._definition_path(cache_dir, key)
+        temporary_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(temporary_path, 'wb') as definition_file:
+                _DefinitionPickler(definition_file, pickle.HIGHEST_PROTOCOL).dump(client)
+            os.replace(temporary_path, path)
+        except Exception:  # the definition is still cached in memory, only later processes will parse it again
+            logger.warning('Could not save the parsed WSDL definition to %s', path, exc_info=True)
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def client(self, wsdl_location, endpoint, transport, cache_dir=''):
+        """
+
+        :param wsdl_location: (str) path or url of the WSDL
+        :param endpoint: (str) endpoint that the WSDL is used against
+        :param transport: (zeep.transports.Transport) transport the returned client will use for its calls
+        :param cache_dir: (str, optional) directory in which parsed definitions are pickled between processes
+        :return: (zeep.Client) client sharing the cached WSDL definition
+        """
+        from zeep import Client
+
+        key = self.key(wsdl_location, endpoint, getattr(transport, 'supports_async', False))
+        with self._lock:
+            template = self._clients.get(key)
+            if template is not None:
+                self.hits += 1
+            elif cache_dir:
+                template = self._load_definition(cache_dir, key)
+                if template is not None:
+                    self.disk_hits += 1
+                    self._clients[key] = template
+            if template is None:
+                self.misses += 1
+                template = Client(wsdl_location, transport=transport)
+                self._clients[key] = template
+                if cache_dir:
+                    self._save_definition(cache_dir, key, template)
+        client = copy.copy(template)
+        client.transport = transport
+        # the service proxy is bound to the client it was created from, let the copy build its own
+        client._default_service = None
+        return client
+
+    def invalidate(self, wsdl_location=None, endpoint=None, cache_dir=''):
+        """
+        Drops cached definitions. With no arguments everything is dropped.
+
+        :param wsdl_location: (str, optional) path or url of the WSDL to drop
+        :param endpoint: (str, optional) endpoint of the WSDL to drop
+        :param cache_dir: (str, optional) directory whose pickled definitions are removed as well
+        :return:
+        """
+        with self._lock:
+            if wsdl_location is None:
+                keys = list(self._clients)
+                self._clients.clear()
+            else:
+                keys = [self.key(wsdl_location, endpoint or '', asynchronous) for asynchronous in (False, True)]
+                for key in keys:
+                    self._clients.pop(key, None)
+            if cache_dir and os.path.isdir(cache_dir):
+                paths = [self._definition_path(cache_dir, key) for key in keys] if wsdl_location is not None else \
+                    [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                     if name.startswith('echo_api_wsdl_') and name.endswith('.pickle')]
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def stats(self):
+        """
+
+        :return: (dict) hit (in memory and on disk) and miss counters and the number of cached definitions
+        """
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'size': len(self._clients)}
+
+
+class LRUCache:
+    """
+    A thread-safe, size bounded mapping that evicts the least recently used entry once it is full, and treats entries
+    older than ttl seconds as missing.
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        """
+
+        :param maxsize: (int) maximum number of entries
+        :param ttl: (float, optional) seconds an entry stays valid; None to keep entries until they are evicted
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+
+        :param key: (hashable) key of the entry
+        :param default: (object) returned (and counted as a miss) when there is no valid entry for key
+        :return: the cached value or default
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+
+        :param key: (hashable) key of the entry
+        :param value: (object) value to cache
+        :return:
+        """
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """
+
+        :param key: (hashable, optional) key of the entry to drop; drops every entry when not given
+        :return:
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """
+
+        :return: (dict) hit and miss counters and the number of cached entries
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResponseCache(LRUCache):
+    """
+    Read-through cache of API_GetData responses keyed by (screen_name, name_space, parameters). Writes made through
+    API_UpdateData and API_TreeDataCommand drop every cached response that shares one of their @name|value|type
+    parameters, and responses fetched while such a write was happening are not stored.
+    """
+
+    def __init__(self, maxsize=1000, ttl=300):
+        super(ResponseCache, self).__init__(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+
+    @staticmethod
+    def parameter_value(value):
+        """
+        The service compares values the way SQL Server does: ids as numbers, guids and text regardless of case, and
+        guids with or without braces.
+
+        :param value: (str) value of a parameter
+        :return: (str) value normalized so that values the service considers equal are equal
+        """
+        value = value.strip().strip('{}').lower()
+        try:
+            return str(int(value))
+        except ValueError:
+            return value
+
+    @classmethod
+    def parameter_pairs(cls, parameters):
+        """
+
+        :param parameters: (str) parameters in the form @name|value|type@name|value|type
+        :return: (set) (name, value) tuples, normalized with parameter_value
+        """
+        pairs = set()
+        for parameter in (parameters or '').split('@'):
+            name_value = parameter.split('|')
+            if len(name_value) >= 2 and name_value[0]:
+                pairs.add((name_value[0].lower(), cls.parameter_value(name_value[1])))
+        return pairs
+
+    def set(self, key, value, generation=None):
+        """
+
+        :param key: (tuple) (screen_name, name_space, parameters)
+        :param value: (str) response to cache
+        :param generation: (int, optional) value of self.generation from before the response was requested; the
+            response is only cached if nothing was invalidated since
+        :return:
+        """
+        if generation is not None and generation != self.generation:
+            return
+        super(ResponseCache, self).set(key, value)
+
+    def invalidate_write(self, parameters, screen_name=None):
+        """
+
+        :param parameters: (str) parameters of the write
+        :param screen_name: (str, optional) screen that was written to; None for writes that may touch any screen
+        :return:
+        """
+        pairs = self.parameter_pairs(parameters)
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                if (screen_name is None or key[0] == screen_name) and pairs & self.parameter_pairs(key[2]):
+                    del self._entries[key]
+
+
+class ScreenCache:
+    """
+    Process-wide store of screen metadata that does not change between calls: the output of API_SelectParameters and
+    an empty dataset carrying the inline schema of each screen. Entries are kept per endpoint, so connections to
+    different tenants never share them. Once a path is loaded, the entries are also kept in that JSON file, rewritten
+    atomically on every change, so that later processes start with them.
+    """
+
+    def __init__(self, path=None):
+        """
+
+        :param path: (str, optional) JSON file holding the entries
+        """
+        self.path = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path:
+            self.load(path)
+
+    def load(self, path):
+        """
+        Merges the entries stored in path, if it exists, and persists every later change to it.
+
+        :param path: (str) JSON file holding the entries
+        :return:
+        """
+        with self._lock:
+            if path == self.path:
+                return
+            self.path = path
+            if os.path.exists(path):
+                with open(path) as cache_file:
+                    stored = json.load(cache_file)
+                for endpoint, screens in self._entries.items():
+                    for screen_name, values in screens.items():
+                        stored.setdefault(endpoint, {}).setdefault(screen_name, {}).update(values)
+                self._entries = stored
+
+    def _save(self):
+        # must be called while holding self._lock
+        if self.path:
+            temporary_path = '{path}.tmp'.format(path=self.path)
+            with open(temporary_path, 'w') as cache_file:
+                json.dump(self._entries, cache_file, sort_keys=True)
+            os.replace(temporary_path, self.path)
+
+    def get(self, endpoint, screen_name, kind):
+        """
+
+        :param endpoint: (str) endpoint of the connection
+        :param screen_name: (str) name of the screen
+        :param kind: (str) what is cached, ex: "dataset" or "parameters:Symed"
+        :return: (str) cached value, or None
+        """
+        with self._lock:
+            value = self._entries.get(endpoint, {}).get(screen_name, {}).get(kind)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, endpoint, screen_name, kind, value):
+        """
+
+        :param endpoint: (str) endpoint of the connection
+        :param screen_name: (str) name of the screen
+        :param kind: (str) what is cached, ex: "dataset" or "parameters:Symed"
+        :param value: (str) value to cache
+        :return:
+        """
+        with self._lock:
+            self._entries.setdefault(endpoint, {}).setdefault(screen_name, {})[kind] = value
+            self._save()
+
+    def invalidate(self, endpoint=None, screen_name=None):
+        """
+
+        :param endpoint: (str, optional) only drop the entries of this endpoint
+        :param screen_name: (str, optional) only drop the entries of this screen
+        :return:
+        """
+        with self._lock:
+            for endpoint_ in list(self._entries):
+                if endpoint is not None and endpoint_ != endpoint:
+                    continue
+                if screen_name is None:
+                    del self._entries[endpoint_]
+                else:
+                    self._entries[endpoint_].pop(screen_name, None)
+            self._save()
+
+    def stats(self):
+        """
+
+        :return: (dict) hit and miss counts, and the number of cached screens
+        """
+        with self._lock:
+            screens = sum(len(screens) for screens in self._entries.values())
+        return {'hits': self.hits, 'misses': self.misses, 'screens': screens}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Lets identical concurrent calls share one execution: the first caller of a key runs the function and callers that
+    ask for the same key while it is running wait for it and receive the same result (or exception). Nothing is kept
+    once the call returns, so this never serves stale data the way a cache can.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+
+        :param key: (hashable) identifies the call
+        :param function: (callable) run as function(*args, **kwargs) unless a call with the same key is in flight
+        :return: whatever function returns
+        """
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = function(*args, **kwargs)
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.done.set()
+
+    def forget(self):
+        """
+        Calls made after forget() never join a call that was already in flight, ex: reads issued after a write.
+
+        :return:
+        """
+        with self._lock:
+            self._in_flight.clear()
+
+    def stats(self):
+        """
+
+        :return: (dict) number of executed calls, number of calls that shared another call's result, and number of
+            calls in flight
+        """
+        with self._lock:
+            return {'calls': self.calls, 'coalesced': self.coalesced, 'in_flight': len(self._in_flight)}
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    SingleFlight for coroutines of a single event loop.
+    """
+
+    async def do(self, key, function, *args, **kwargs):
+        """
+
+        :param key: (hashable) identifies the call
+        :param function: (coroutine function) awaited as function(*args, **kwargs) unless a call with the same key is
+            in flight
+        :return: whatever function returns
+        """
+        import asyncio
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        self.calls += 1
+        future = self._in_flight[key] = asyncio.ensure_future(function(*args, **kwargs))
+        try:
+            # shielded so that cancelling this caller does not cancel the call for the callers that joined it
+            return await asyncio.shield(future)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+
+WSDL_CACHE = WSDLCache()
+SCREEN_CACHE = ScreenCache()
@@ -0,0 +1,55 @@
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    """
+    Per-table watermarks used by EchoConnection.changes_since. Watermarks are kept in memory, and also in a JSON file
+    when a path is given, which is rewritten atomically every time a watermark advances.
+
+    example:
+    - checkpoint = Checkpoint('/var/lib/echo_sync/checkpoint.json')
+    - for physician in connection.changes_since('PhysicianDetail', checkpoint=checkpoint):
+    -     sync(physician)
+    """
+
+    def __init__(self, path=None):
+        """
+
+        :param path: (str, optional) JSON file holding the watermarks
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._watermarks = {}
+        if path and os.path.exists(path):
+            with open(path) as checkpoint_file:
+                self._watermarks = json.load(checkpoint_file)
+
+    def get(self, table, default=None):
+        """
+
+        :param table: (str) name of the table
+        :param default: returned when the table has no watermark yet
+        :return: (str) isoformat timestamp of the newest change consumed so far
+        """
+        return self._watermarks.get(table, default)
+
+    def advance(self, table, watermark):
+        """
+        Stores watermark for table unless the stored watermark is already newer.
+
+        :param table: (str) name of the table
+        :param watermark: (str) isoformat timestamp (YYYY-MM-DDTHH:mm:ss)
+        :return:
+        """
+        with self._lock:
+            current = self._watermarks.get(table)
+            if current is not None and current >= watermark:
+                return
+            self._watermarks[table] = watermark
+            if self.path:
+                temporary_path = '{path}.tmp'.format(path=self.path)
+                with open(temporary_path, 'w') as checkpoint_file:
+                    json.dump(self._watermarks, checkpoint_file, indent=2, sort_keys=True)
+                os.replace(temporary_path, self.path)
@@ -0,0 +1,286 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextvars import ContextVar
+
+# seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metrics, helper) of the outermost helper measured on this thread, or in this asyncio task
+_active = ContextVar('echo_api_active_helper', default=None)
+
+
+def error_category(text):
+    """
+    Reduces an Echo "Error|..." or "Denied|..." message to a short label: the first clause of the message with digits
+    masked, so that errors naming different records fall in the same category.
+
+    :param text: (str) response or exception message
+    :return: (str) ex: "Error: Invalid column name '#'", or None if text is not an error
+    """
+    if not isinstance(text, str):
+        return None
+    head = text[:512]
+    for kind in ('Error', 'Denied'):
+        start = head.find(kind + '|')
+        if start != -1:
+            message = head[start + len(kind) + 1:].split('|', 1)[0]
+            message = re.split(r'[.:\r\n]', message, 1)[0]
+            return '{kind}: {message}'.format(kind=kind, message=re.sub(r'\d+', '#', message).strip()[:60])
+    return None
+
+
+def payload_size(value):
+    """
+
+    :param value: argument or response of a SOAP call
+    :return: (int) length of str and bytes values, which is their size in bytes for ASCII payloads; 0 otherwise
+    """
+    return len(value) if isinstance(value, (str, bytes)) else 0
+
+
+class Histogram:
+    """
+    Bucketed distribution of observed values, in the layout of a Prometheus histogram.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """
+
+        :return: (dict) count, sum and the cumulative count of each bucket keyed by its upper bound
+        """
+        cumulative, total = OrderedDict(), 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative[bound] = total
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+
+class OperationStats:
+    def __init__(self, buckets, helper=False):
+        self.helper = helper
+        self.calls = 0
+        self.latency = Histogram(buckets)
+        self.parse = Histogram(buckets)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.errors = {}
+
+    def snapshot(self):
+        return {
+            'helper': self.helper,
+            'calls': self.calls,
+            'latency': self.latency.snapshot(),
+            'parse': self.parse.snapshot(),
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'errors': dict(self.errors),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of per-operation call counts, latency and parse time histograms, payload sizes and error
+    counts, plus login and re-login counts. Give one to a connection (EchoConnection(metrics=Metrics())), or the same
+    one to every connection of a pool, and read it with snapshot() or prometheus().
+
+    API_* operations are measured per round trip, helpers (show_physician, add_medical_license, ...) end to end.
+    Parse time is the time spent turning responses into ResultTables, attributed to the outermost helper running on
+    the thread or asyncio task.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+
+        :param buckets: (tuple of float) upper bounds, in seconds, of the latency and parse time histogram buckets
+        """
+        self.buckets = tuple(buckets)
+        self.logins = 0
+        self.relogins = 0
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, operation, helper=False):
+        # must be called while holding self._lock
+        stats = self._operations.get(operation)
+        if stats is None:
+            stats = self._operations[operation] = OperationStats(self.buckets, helper)
+        return stats
+
+    def call(self, operation, function, *args, helper=False, **kwargs):
+        """
+        Runs function(*args, **kwargs) and records it under operation.
+
+        :param operation: (str) name the call is recorded under
+        :param function: (callable) the call to measure
+        :param helper: (bool) measure a helper rather than a round trip: payload sizes are not recorded and parse
+            time observed while it runs is attributed to it
+        :return: whatever function returns
+        """
+        token = _active.set((self, operation)) if helper and _active.get() is None else None
+        response, category = None, None
+        started = time.perf_counter()
+        try:
+            response = function(*args, **kwargs)
+            category = error_category(response)
+            return response
+        except BaseException as error:
+            category = error_category(str(error)) or type(error).__name__
+            raise
+        finally:
+            self._record(operation, helper, token, started, args, kwargs, response, category)
+
+    async def call_async(self, operation, function, *args, helper=False, **kwargs):
+        """
+        Awaits function(*args, **kwargs) and records it under operation, see call.
+
+        :param operation: (str) name the call is recorded under
+        :param function: (coroutine function) the call to measure
+        :param helper: (bool) see call
+        :return: whatever function returns
+        """
+        token = _active.set((self, operation)) if helper and _active.get() is None else None
+        response, category = None, None
+        started = time.perf_counter()
+        try:
+            response = await function(*args, **kwargs)
+            category = error_category(response)
+            return response
+        except BaseException as error:
+            category = error_category(str(error)) or type(error).__name__
+            raise
+        finally:
+            self._record(operation, helper, token, started, args, kwargs, response, category)
+
+    def _record(self, operation, helper, token, started, args, kwargs, response, category):
+        elapsed = time.perf_counter() - started
+        if token is not None:
+            _active.reset(token)
+        with self._lock:
+            stats = self._stats(operation, helper)
+            stats.calls += 1
+            stats.latency.observe(elapsed)
+            if not helper:
+                stats.request_bytes += sum(payload_size(arg) for arg in args) + \
+                    sum(payload_size(arg) for arg in kwargs.values())
+                stats.response_bytes += payload_size(response)
+            if category is not None:
+                stats.errors[category] = stats.errors.get(category, 0) + 1
+
+    def observe_parse(self, operation, seconds):
+        with self._lock:
+            self._stats(operation, helper=True).parse.observe(seconds)
+
+    def count_login(self, relogin=False):
+        """
+
+        :param relogin: (bool) the login replaced a session that had expired
+        :return:
+        """
+        with self._lock:
+            self.logins += 1
+            if relogin:
+                self.relogins += 1
+
+    def reset(self):
+        with self._lock:
+            self.logins = 0
+            self.relogins = 0
+            self._operations.clear()
+
+    def snapshot(self):
+        """
+
+        :return: (dict) {'logins': int, 'relogins': int, 'operations': {operation: {'helper', 'calls', 'latency',
+            'parse', 'request_bytes', 'response_bytes', 'errors'}}}
+        """
+        with self._lock:
+            return {
+                'logins': self.logins,
+                'relogins': self.relogins,
+                'operations': {operation: stats.snapshot() for operation, stats in sorted(self._operations.items())},
+            }
+
+    def prometheus(self, prefix='echo_api'):
+        """
+
+        :param prefix: (str) prefix of every metric name
+        :return: (str) the metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        operations = snapshot['operations']
+        lines = []
+
+        def header(name, kind, description):
+            lines.append('# HELP {prefix}_{name} {description}'.format(prefix=prefix, name=name, description=description))
+            lines.append('# TYPE {prefix}_{name} {kind}'.format(prefix=prefix, name=name, kind=kind))
+
+        def sample(name, value, **labels):
+            label_str = ','.join('{key}="{value}"'.format(key=key, value=_escape(label)) for key, label in labels.items())
+            lines.append('{prefix}_{name}{labels} {value}'.format(
+                prefix=prefix, name=name, labels='{' + label_str + '}' if label_str else '', value=_number(value)))
+
+        header('logins_total', 'counter', 'Logins, including re-logins.')
+        sample('logins_total', snapshot['logins'])
+        header('relogins_total', 'counter', 'Logins made because the session had expired.')
+        sample('relogins_total', snapshot['relogins'])
+        header('calls_total', 'counter', 'Calls per API operation or helper.')
+        for operation, stats in operations.items():
+            sample('calls_total', stats['calls'], operation=operation)
+        for name, key, description in (('call_duration_seconds', 'latency', 'Duration of each call.'),
+                                       ('parse_duration_seconds', 'parse', 'Time spent parsing responses.')):
+            header(name, 'histogram', description)
+            for operation, stats in operations.items():
+                histogram = stats[key]
+                if not histogram['count']:
+                    continue
+                for bound, count in histogram['buckets'].items():
+                    sample(name + '_bucket', count, operation=operation, le='+Inf' if bound == float('inf') else bound)
+                sample(name + '_sum', histogram['sum'], operation=operation)
+                sample(name + '_count', histogram['count'], operation=operation)
+        for name, key, description in (('request_bytes_total', 'request_bytes', 'Size of the request payloads.'),
+                                       ('response_bytes_total', 'response_bytes', 'Size of the responses.')):
+            header(name, 'counter', description)
+            for operation, stats in operations.items():
+                if not stats['helper']:
+                    sample(name, stats[key], operation=operation)
+        header('errors_total', 'counter', 'Failed calls by error category.')
+        for operation, stats in operations.items():
+            for category, count in sorted(stats['errors'].items()):
+                sample('errors_total', count, operation=operation, category=category)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def observe_parse(started):
+    """
+    Records the time since started as parse time of the helper running on this thread or asyncio task, if it is being
+    measured.
+
+    :param started: (float) time.perf_counter() from before parsing began
+    :return:
+    """
+    active = _active.get()
+    if active is not None:
+        metrics, helper = active
+        metrics.observe_parse(helper, time.perf_counter() - started)
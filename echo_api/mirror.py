@@ -0,0 +1,199 @@
+import sqlite3
+from collections import OrderedDict
+
+from xmlmanip import SchemaInnerDict
+
+from .api import APICallError
+
+SQLITE_TYPES = {
+    'int': 'INTEGER',
+    'long': 'INTEGER',
+    'short': 'INTEGER',
+    'byte': 'INTEGER',
+    'unsignedByte': 'INTEGER',
+    'unsignedShort': 'INTEGER',
+    'unsignedInt': 'INTEGER',
+    'unsignedLong': 'INTEGER',
+    'boolean': 'INTEGER',
+    'decimal': 'NUMERIC',
+    'double': 'REAL',
+    'float': 'REAL',
+}
+
+
+class EchoMirror:
+    """
+    A local SQLite copy of the main Echo tables. snapshot() pulls each table from the SOAP service in primary key
+    order with EchoConnection.iter_pages, chunk_size rows per API_GeneralQuery, into columns typed after the inline
+    XSD of the response; the show_* methods then answer from the indexed local copy instead of the service.
+
+    example:
+    - mirror = EchoMirror('echo.sqlite3', connection=EchoConnection())
+    - mirror.snapshot()
+    - mirror.show_physician(1)
+    - mirror.query("SELECT LastName, COUNT(*) AS n FROM PhysicianDetail GROUP BY LastName")
+    """
+    # table: (primary key, additional indexed columns)
+    TABLES = OrderedDict([
+        ('PhysicianDetail', ('PhysicianID', ['EntityGuid'])),
+        ('Offices', ('OfficeID', ['PracticeID'])),
+        ('MedicalLicenses', ('AutoID', ['PhysicianID'])),
+        ('ContactLog', ('CallID', ['EntityGuid'])),
+    ])
+
+    def __init__(self, path, connection=None):
+        """
+
+        :param path: (str) SQLite database file, created if it does not exist
+        :param connection: (EchoConnection, optional) connection used by snapshot(); not needed to read the mirror
+        """
+        self.path = path
+        self.connection = connection
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def _quote(name):
+        return '"{name}"'.format(name=name.replace('"', '""'))
+
+    def _create_table(self, name, columns, primary_key):
+        definitions = ', '.join(
+            '{column} {sqlite_type}{primary_key}'.format(
+                column=self._quote(column), sqlite_type=SQLITE_TYPES.get(column_type, 'TEXT'),
+                primary_key=' PRIMARY KEY' if column == primary_key else '')
+            for column, column_type in columns.items())
+        self.db.execute('CREATE TABLE {table} ({definitions})'.format(table=self._quote(name), definitions=definitions))
+
+    @staticmethod
+    def _converters(columns):
+        # sqlite's column affinity takes care of numbers sent as text, only booleans need converting
+        return [(lambda value: None if value is None else int(value.strip().lower() in ('true', '1')))
+                if column_type == 'boolean' else (lambda value: value)
+                for column_type in columns.values()]
+
+    def snapshot(self, tables=None, chunk_size=5000):
+        """
+        Replaces the local copy of each table with a fresh one. Each table is loaded into a staging table first and
+        swapped in when complete, so readers never see a partially loaded table.
+
+        :param tables: (list of str, optional) tables to copy; defaults to every table in self.TABLES
+        :param chunk_size: (int) rows requested per API_GeneralQuery
+        :return: (dict) {table: number of rows copied}
+        """
+        if self.connection is None:
+            raise APICallError('EchoMirror needs a connection to take a snapshot.')
+        return OrderedDict((table, self._snapshot_table(table, chunk_size)) for table in (tables or self.TABLES))
+
+    def _snapshot_table(self, table, chunk_size):
+        primary_key, indexes = self.TABLES[table]
+        staging = '{table}__snapshot'.format(table=table)
+        with self.db:
+            self.db.execute('DROP TABLE IF EXISTS {staging}'.format(staging=self._quote(staging)))
+        columns, insert, converters, count = None, None, None, 0
+        for page in self.connection.iter_pages(table, page_size=chunk_size, primary_key=primary_key,
+                                                   typed=False):
+            if columns is None:
+                columns = page.columns
+                columns.setdefault(primary_key, 'int')
+                self._create_table(staging, columns, primary_key)
+                insert = 'INSERT INTO {staging} ({columns}) VALUES ({placeholders})'.format(
+                    staging=self._quote(staging), columns=', '.join(self._quote(column) for column in columns),
+                    placeholders=', '.join('?' for _ in columns))
+                converters = self._converters(columns)
+            with self.db:
+                self.db.executemany(insert, (
+                    [convert(row.get(column)) for column, convert in zip(columns, converters)] for row in page))
+            count += len(page)
+
+        with self.db:
+            self.db.execute('DROP TABLE IF EXISTS {table}'.format(table=self._quote(table)))
+            self.db.execute('ALTER TABLE {staging} RENAME TO {table}'.format(
+                staging=self._quote(staging), table=self._quote(table)))
+            for column in indexes:
+                if column in columns:
+                    self.db.execute('CREATE INDEX {index} ON {table} ({column})'.format(
+                        index=self._quote('ix_{table}_{column}'.format(table=table, column=column)),
+                        table=self._quote(table), column=self._quote(column)))
+        return count
+
+    def query(self, sql, parameters=()):
+        """
+
+        :param sql: (str) SQLite query against the mirrored tables
+        :param parameters: (tuple or dict) query parameters
+        :return: (list) xmlmanip.SchemaInnerDict per row; unlike the SOAP helpers, values have their column's type
+        """
+        return [SchemaInnerDict(zip(row.keys(), row)) for row in self.db.execute(sql, parameters)]
+
+    def _show(self, table, where='', parameters=(), show_all=True):
+        primary_key = self.TABLES[table][0]
+        sql = 'SELECT * FROM {table}{where} ORDER BY {primary_key}'.format(
+            table=self._quote(table), where=' WHERE ' + where if where else '', primary_key=self._quote(primary_key))
+        if show_all:
+            return self.query(sql, parameters)
+        rows = self.query(sql + ' DESC LIMIT 1', parameters)
+        return rows[0] if rows else None
+
+    def show_physician(self, physician_id):
+        """
+        mirror equivalent of EchoConnection.show_physician
+        """
+        return self._show('PhysicianDetail', 'PhysicianID = ?', (int(physician_id),))
+
+    def show_physicians(self, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_physicians
+        """
+        return self._show('PhysicianDetail', show_all=show_all)
+
+    def show_office(self, office_id):
+        """
+        mirror equivalent of EchoConnection.show_office
+        """
+        return self._show('Offices', 'OfficeID = ?', (int(office_id),), show_all=False)
+
+    def show_offices(self, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_offices
+        """
+        return self._show('Offices', show_all=show_all)
+
+    def show_practices(self, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_practices
+        """
+        return self._show('Offices', 'OfficeID = PracticeID', show_all=show_all)
+
+    def show_physician_medical_licenses(self, physician_id, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_physician_medical_licenses
+        """
+        return self._show('MedicalLicenses', 'PhysicianID = ?', (int(physician_id),), show_all=show_all)
+
+    def show_medical_licenses(self, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_medical_licenses
+        """
+        return self._show('MedicalLicenses', show_all=show_all)
+
+    def show_physician_contact_log(self, physician_id, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_physician_contact_log
+        """
+        return self._show('ContactLog', 'EntityGuid = (SELECT EntityGuid FROM PhysicianDetail WHERE PhysicianID = ?)',
+                          (int(physician_id),), show_all=show_all)
+
+    def show_contact_logs(self, show_all=True):
+        """
+        mirror equivalent of EchoConnection.show_contact_logs
+        """
+        return self._show('ContactLog', show_all=show_all)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .api import APICallError, EchoConnection, Settings
+from .cache import SingleFlight
+
+
+class PoolClosedError(BaseException):
+    pass
+
+
+class PoolExhaustedError(BaseException):
+    pass
+
+
+class EchoConnectionPool:
+    """
+    A thread-safe pool of logged in connections. A connection is only ever handed to one thread at a time, so the
+    session, client and session_id of each connection are never shared between concurrent calls.
+    The connections do share one echo_api.cache.SingleFlight, self.single_flight, so identical reads made at the same
+    time through different connections of the pool make one round trip between them.
+
+    example:
+    - pool = EchoConnectionPool(min_size=2, max_size=8)
+    - with pool.connection() as connection:
+    -     connection.show_physician(1)
+    - pool.close()
+    """
+
+    def __init__(self, settings=None, min_size=1, max_size=10, max_idle=300, health_check_interval=60,
+                 connection_class=EchoConnection, **connection_kwargs):
+        """
+
+        :param settings: (Settings, optional) settings used to build every connection in the pool; read from the
+            configuration file when the pool is created if not given
+        :param min_size: (int) number of connections created up front and never evicted for being idle
+        :param max_size: (int) maximum number of connections, idle and checked out, at any one time
+        :param max_idle: (int) seconds a connection may sit unused before it is logged out and evicted
+        :param health_check_interval: (int) connections idle longer than this many seconds are checked with API_Test
+            before being handed out
+        :param connection_class: (class) BaseConnection subclass to instantiate
+        :param connection_kwargs: (kwargs) passed on to connection_class, ex: response_cache_size=1000
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self.settings = settings if settings is not None else Settings()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.connection_class = connection_class
+        if connection_kwargs.get('coalesce_reads', True):
+            connection_kwargs.setdefault('single_flight', SingleFlight())
+        self.single_flight = connection_kwargs.get('single_flight')
+        self.connection_kwargs = connection_kwargs
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        # pooled connections are handed out logged in, connections log in on first use otherwise
+        return self.connection_class(self.settings, **self.connection_kwargs).connect()
+
+    @staticmethod
+    def _logout(connection):
+        try:
+            connection.API_Logout()
+        except Exception:  # the connection is being thrown away regardless
+            pass
+
+    @staticmethod
+    def _healthy(connection):
+        try:
+            return "Success" in connection.API_Test()
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        """
+        must be called while holding self._condition. removes connections that have been idle longer than max_idle,
+        oldest first, without going below min_size.
+
+        :return: (list) evicted connections; the caller logs them out after releasing the lock
+        """
+        evicted = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0][1] > self.max_idle:
+            evicted.append(self._idle.popleft()[0])
+            self._size -= 1
+        return evicted
+
+    def acquire(self, timeout=None):
+        """
+
+        :param timeout: (float, optional) seconds to wait for a connection when the pool is at max_size
+        :return: a logged in connection that must be given back with release()
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("The connection pool has been closed.")
+                evicted = self._evict_idle()
+                if self._idle:
+                    # most recently used first; it is the least likely to have an expired session
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolExhaustedError("No connection became available within {timeout} seconds."
+                                             .format(timeout=timeout))
+                self._condition.wait(remaining)
+        for stale in evicted:
+            self._logout(stale)
+
+        if connection is not None and time.monotonic() - last_used > self.health_check_interval \
+                and not self._healthy(connection):
+            self._logout(connection)
+            connection = None
+        if connection is None:
+            try:
+                connection = self._connect()
+            except BaseException:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+
+        :param connection: connection previously returned by acquire()
+        :param discard: (bool) log the connection out instead of returning it to the pool
+        :return:
+        """
+        with self._condition:
+            if not (discard or self._closed):
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+            self._size -= 1
+            self._condition.notify()
+        self._logout(connection)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager around acquire() and release(). Connections that raise anything other than an APICallError
+        (which is reported by the service and leaves the connection usable) are discarded rather than reused.
+
+        :param timeout: (float, optional) seconds to wait for a connection when the pool is at max_size
+        """
+        connection = self.acquire(timeout=timeout)
+        try:
+            yield connection
+        except APICallError:
+            self.release(connection)
+            raise
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def close(self):
+        """
+        Logs out every idle connection. Connections that are checked out are logged out when they are released.
+
+        :return:
+        """
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._logout(connection)
+
+    def stats(self):
+        """
+
+        :return: (dict) number of connections in the pool, and how many of them are idle
+        """
+        with self._condition:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
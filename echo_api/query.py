@@ -0,0 +1,546 @@
+import heapq
+import keyword
+import operator
+import re
+import sys
+import threading
+import uuid
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from .cache import LRUCache
+
+MSDATA_DATATYPE = '{urn:schemas-microsoft-com:xml-msdata}DataType'
+SCHEMA_END = re.compile(r'</(?:[\w.-]+:)?schema>')
+
+
+class QueryError(BaseException):
+    pass
+
+
+def parse_datetime(text):
+    """
+
+    :param text: (str) xs:dateTime or xs:date value; fractional seconds and utc offsets are ignored
+    :return: (datetime.datetime)
+    """
+    if isinstance(text, datetime):
+        return text
+    # datetime.fromisoformat is an order of magnitude faster than strptime, which is left to handle (and reject)
+    # anything that is not laid out as expected
+    if len(text) >= 10 and text[4] == text[7] == '-':
+        try:
+            if len(text) == 10:
+                return datetime.fromisoformat(text)
+            if len(text) >= 19 and text[10] == 'T' and text[13] == text[16] == ':':
+                return datetime.fromisoformat(text[:19])
+        except ValueError:
+            pass
+    if len(text) == 10:
+        return datetime.strptime(text, '%Y-%m-%d')
+    return datetime.strptime(text[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def schema_columns(schema_str, feed_size=65536):
+    """
+    Reads the column definitions from the inline XSD that API_GeneralQuery and API_GetData put in front of the rows.
+    Parsing stops as soon as the schema has been read.
+
+    :param schema_str: (xml string) dataset returned by API_GeneralQuery or API_GetData
+    :param feed_size: (int) number of characters handed to the parser at a time
+    :return: (OrderedDict) {column name: xsd type without prefix (int, string, dateTime, ...)}; columns that the
+        schema marks as System.Guid have the type "guid"
+    """
+    parser = ET.XMLPullParser(events=('end',))
+    columns = OrderedDict()
+    for offset in range(0, len(schema_str), feed_size):
+        parser.feed(schema_str[offset:offset + feed_size])
+        for _, elem in parser.read_events():
+            local_name = elem.tag.rsplit('}', 1)[-1]
+            if local_name == 'element' and elem.get('name') and elem.get('type'):
+                column_type = elem.get('type').rsplit(':', 1)[-1]
+                if 'System.Guid' in (elem.get(MSDATA_DATATYPE) or ''):
+                    column_type = 'guid'
+                columns[elem.get('name')] = column_type
+            elif local_name == 'schema':
+                return columns
+    return columns
+
+
+_BOOLEANS = {'true': True, 'false': False, '1': True, '0': False}
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    # the service writes "true" and "false", so the normalization is only needed for anything else
+    result = _BOOLEANS.get(value)
+    if result is None:
+        result = value.strip().lower() in ('true', '1')
+    return result
+
+
+def _to_date(value):
+    return parse_datetime(value).date()
+
+
+@lru_cache(maxsize=4096)
+def _to_uuid(value):
+    # guids repeat down the rows of child tables (every entry of a physician's contact log has its EntityGuid), and
+    # building a UUID costs several times more than finding the one already built
+    return uuid.UUID(value)
+
+
+# xsd type: conversion applied to the values of a column by typed row decoders; other types are kept as text
+CONVERTERS = {
+    'int': int,
+    'long': int,
+    'short': int,
+    'byte': int,
+    'integer': int,
+    'unsignedInt': int,
+    'unsignedLong': int,
+    'unsignedShort': int,
+    'unsignedByte': int,
+    'decimal': Decimal,
+    'double': Decimal,
+    'float': Decimal,
+    'boolean': _to_bool,
+    'dateTime': parse_datetime,
+    'date': _to_date,
+    'guid': _to_uuid,
+}
+
+
+class Record(MutableMapping):
+    """
+    Base of the compact row classes made by record_class. The values of a row are kept in __slots__, one per column of
+    its table, instead of in a dict per row, which takes a fraction of the memory of a SchemaInnerDict for wide tables.
+
+    Records are mutable mappings: row["LastName"], row.get("LastName"), "LastName" in row, dict(row) and the
+    ResultTable lookups behave as they do on a SchemaInnerDict, and columns that are valid identifiers can also be read
+    as attributes (row.LastName). As in a SchemaInnerDict, the columns a row has no value for are absent, and only the
+    columns of the schema can be set.
+    """
+
+    __slots__ = ()
+    # column names in schema order, the slot each of them is stored in, and {column: slot}
+    _columns = ()
+    _slot_names = ()
+    _slots = {}
+
+    def __getitem__(self, column):
+        try:
+            return getattr(self, self._slots[column])
+        except (KeyError, AttributeError):
+            raise KeyError(column)
+
+    def get(self, column, default=None):
+        slot = self._slots.get(column)
+        return default if slot is None else getattr(self, slot, default)
+
+    def __setitem__(self, column, value):
+        if column not in self._slots:
+            raise KeyError('{column!r} is not a column of this record; expected one of {columns}.'.format(
+                column=column, columns=', '.join(self._columns)))
+        setattr(self, self._slots[column], value)
+
+    def __delitem__(self, column):
+        try:
+            delattr(self, self._slots[column])
+        except (KeyError, AttributeError):
+            raise KeyError(column)
+
+    def __contains__(self, column):
+        slot = self._slots.get(column)
+        return slot is not None and hasattr(self, slot)
+
+    def __iter__(self):
+        for column, slot in zip(self._columns, self._slot_names):
+            if hasattr(self, slot):
+                yield column
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{name}({{{items}}})'.format(name=type(self).__name__, items=', '.join(
+            '{column!r}: {value!r}'.format(column=column, value=value) for column, value in self.items()))
+
+    def __reduce__(self):
+        # the classes are made at run time, so pickles refer to their columns instead
+        return _rebuild_record, (self._columns, list(self.items()))
+
+
+def _slot_name(column, position):
+    if column.isidentifier() and not keyword.iskeyword(column) and not column.startswith('_') \
+            and not hasattr(Record, column):
+        return column
+    return '_{position}'.format(position=position)
+
+
+_record_classes = {}
+_record_classes_lock = threading.Lock()
+
+
+def record_class(columns):
+    """
+    Makes the Record subclass for a set of columns the first time it is asked for and returns the same class
+    afterwards.
+
+    :param columns: (iterable of str) column names, in schema order
+    :return: (class) Record subclass with a slot per column
+    """
+    columns = tuple(columns)
+    cls = _record_classes.get(columns)
+    if cls is None:
+        with _record_classes_lock:
+            cls = _record_classes.get(columns)
+            if cls is None:
+                slot_names = tuple(_slot_name(column, position) for position, column in enumerate(columns))
+                cls = _record_classes[columns] = type('Record', (Record,), {
+                    '__module__': __name__,
+                    '__slots__': slot_names,
+                    '_columns': columns,
+                    '_slot_names': slot_names,
+                    '_slots': dict(zip(columns, slot_names)),
+                })
+    return cls
+
+
+def _rebuild_record(columns, items):
+    record = record_class(columns)()
+    for column, value in items:
+        record[column] = value
+    return record
+
+
+class RowDecoder:
+    """
+    Turns the <Table/> elements of datasets that share one inline schema into rows of typed values, looking up the
+    conversion of each column once (see CONVERTERS) instead of converting values again every time they are compared
+    or sorted. Values that are missing or cannot be converted are kept as they are.
+    """
+
+    def __init__(self, columns):
+        """
+
+        :param columns: (OrderedDict) column types as returned by schema_columns
+        """
+        self.columns = columns
+        self.converters = {column: CONVERTERS[column_type] for column, column_type in columns.items()
+                           if column_type in CONVERTERS}
+        # text columns need no conversion, so decode only visits the columns listed here
+        self._converter_items = tuple(self.converters.items())
+        self._record_class = None
+        self._setters = None
+
+    @property
+    def record_class(self):
+        """
+
+        :return: (class) the Record subclass the rows are decoded to by self.record
+        """
+        if self._record_class is None:
+            cls = record_class(self.columns)
+            self._setters = {column: getattr(cls, slot).__set__ for column, slot in cls._slots.items()}
+            self._record_class = cls
+        return self._record_class
+
+    def decode(self, elem, row_class=dict):
+        """
+
+        :param elem: (xml.etree.ElementTree.Element) a <Table/> row
+        :param row_class: (class) mapping built from the (column, value) pairs of the row
+        :return: row_class instance
+        """
+        row = row_class((child.tag, child.text) for child in elem)
+        get = row.get
+        for column, convert in self._converter_items:
+            value = get(column)
+            if value is not None:
+                try:
+                    row[column] = convert(value)
+                except (TypeError, ValueError, InvalidOperation):
+                    pass
+        return row
+
+    def record(self, elem, typed=False):
+        """
+        Compact counterpart of decode. Text values are interned, so that the values repeated down a column (states,
+        statuses, flags, empty strings) are stored once for the whole result. Elements that are not columns of the
+        schema are left out.
+
+        :param elem: (xml.etree.ElementTree.Element) a <Table/> row
+        :param typed: (bool) convert the values to the types of their columns, as decode does
+        :return: (Record) instance of self.record_class
+        """
+        record = self.record_class()
+        setter = self._setters.get
+        converter = self.converters.get if typed else {}.get
+        intern = sys.intern
+        for child in elem:
+            set_value = setter(child.tag)
+            if set_value is None:
+                continue
+            value = child.text
+            if value is not None:
+                convert = converter(child.tag)
+                if convert is None:
+                    value = intern(value)
+                else:
+                    try:
+                        value = convert(value)
+                    except (TypeError, ValueError, InvalidOperation):
+                        value = intern(value)
+            set_value(record, value)
+        return record
+
+
+# distinct schemas are few (one per table and projection), and keyed by their full text
+_decoders = LRUCache(maxsize=256)
+
+
+def row_decoder(schema_str):
+    """
+    Compiles a RowDecoder the first time a schema is seen and returns the cached one afterwards, so the inline XSD of
+    a dataset is only parsed once per distinct schema.
+
+    :param schema_str: (xml string) dataset returned by API_GeneralQuery or API_GetData
+    :return: (RowDecoder) decoder for the rows of the dataset
+    """
+    end = SCHEMA_END.search(schema_str) if isinstance(schema_str, str) else None
+    if end is None:
+        return RowDecoder(schema_columns(schema_str) if isinstance(schema_str, str) else OrderedDict())
+    key = schema_str[:end.end()]
+    decoder = _decoders.get(key)
+    if decoder is None:
+        decoder = RowDecoder(schema_columns(key))
+        _decoders.set(key, decoder)
+    return decoder
+
+
+def _to_upper(value):
+    return str(value).upper()
+
+
+def _coercer(search_value):
+    """
+    picks the conversion applied to row values so that they are compared with search_value as the same type
+
+    :param search_value: (object) value passed in a field__op=value lookup
+    :return: (function) converts a row value (str) to the type of search_value
+    """
+    if isinstance(search_value, bool):
+        return _to_bool
+    if isinstance(search_value, int):
+        return int
+    if isinstance(search_value, (float, Decimal)):
+        return Decimal
+    if isinstance(search_value, datetime):
+        return parse_datetime
+    if isinstance(search_value, date):
+        return _to_date
+    # strings are compared case-insensitively, as xmlmanip does
+    return _to_upper
+
+
+def _normalize(search_value):
+    if isinstance(search_value, float):
+        return Decimal(str(search_value))
+    if isinstance(search_value, str):
+        return search_value.upper()
+    return search_value
+
+
+OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'contains': lambda value, search_value: search_value in value,
+    'startswith': lambda value, search_value: value.startswith(search_value),
+    'endswith': lambda value, search_value: value.endswith(search_value),
+    'in': lambda value, search_value: value in search_value,
+}
+
+
+def sort_key(value):
+    """
+    orders integer-like values (and typed numbers) numerically and everything else as text; missing values sort first
+
+    :param value: (str) row value, or a typed value from a RowDecoder
+    :return: (tuple) sort key
+    """
+    if value is None:
+        return 0, 0, ''
+    if isinstance(value, str):
+        # checked before converting, since raising and catching a ValueError for every text value is slow
+        if value.isdecimal() or value[:1] in ('-', '+') and value[1:].isdecimal():
+            return 1, int(value), ''
+        if not (value[:1].isspace() or value[-1:].isspace()):
+            return 2, 0, value
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return 1, value, ''
+    try:
+        return 1, int(value), ''
+    except (TypeError, ValueError):
+        return 2, 0, str(value)
+
+
+class ResultTable:
+    """
+    Rows of a dataset held in a flat list, with lazily built per-column indexes for equality lookups. Rows are
+    parsed once and every filter, ordering or limit works on the same row objects.
+
+    example:
+    - table = ResultTable(Helpers._iter_rows(connection.API_GeneralQuery("SELECT * FROM PhysicianDetail")))
+    - table.filter(LastName__startswith="jo", PhysicianID__gt=100).order_by('-PhysicianID').limit(10)
+    - table.last('PhysicianID')
+    """
+
+    def __init__(self, rows, columns=None):
+        """
+
+        :param rows: (iterable of dict) rows of the dataset
+        :param columns: (OrderedDict, optional) column types as returned by schema_columns
+        """
+        self.rows = rows if isinstance(rows, list) else list(rows)
+        self.columns = columns
+        self._indexes = {}
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, item):
+        return self.rows[item]
+
+    def index(self, column, coerce=None):
+        """
+
+        :param column: (str) column to index
+        :param coerce: (function, optional) conversion applied to the values before they are indexed
+        :return: (dict) {converted value: [row, ...]}; rows without the column or whose value cannot be converted are
+            left out
+        """
+        key = (column, coerce)
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for row in self.rows:
+                value = row.get(column)
+                if value is None:
+                    continue
+                try:
+                    value = coerce(value) if coerce else value
+                except (TypeError, ValueError, InvalidOperation):
+                    continue
+                index.setdefault(value, []).append(row)
+            self._indexes[key] = index
+        return index
+
+    @staticmethod
+    def _parse_lookup(lookup):
+        column, _, op = lookup.partition('__')
+        op = op or 'eq'
+        if op not in OPERATORS:
+            raise QueryError('Unsupported lookup "{lookup}"; expected one of {operators}.'
+                             .format(lookup=lookup, operators=', '.join(sorted(OPERATORS))))
+        return column, op
+
+    def filter(self, **lookups):
+        """
+
+        :param lookups: (kwargs) field__op=value lookups, all of which must match. op is one of eq (the default), ne,
+            lt, le, gt, ge, contains, startswith, endswith or in. Row values are converted to the type of value (int,
+            float/Decimal, bool, date, datetime; strings compare case-insensitively) and rows whose value is missing or
+            cannot be converted never match.
+        :return: (ResultTable) matching rows, in their original order
+        """
+        rows = self.rows
+        for lookup, search_value in lookups.items():
+            column, op = self._parse_lookup(lookup)
+            if op == 'in':
+                search_values = list(search_value)
+                coerce = _coercer(search_values[0]) if search_values else _to_upper
+                search_values = [_normalize(value) for value in search_values]
+            else:
+                coerce = _coercer(search_value)
+                search_value = _normalize(search_value)
+
+            if op in ('eq', 'in') and rows is self.rows:
+                index = self.index(column, coerce)
+                matched = [index.get(value, []) for value in (search_values if op == 'in' else [search_value])]
+                if len(matched) == 1:
+                    rows = matched[0]
+                else:
+                    keep = set(id(row) for rows_ in matched for row in rows_)
+                    rows = [row for row in self.rows if id(row) in keep]
+                continue
+
+            compare = OPERATORS[op]
+            target = search_values if op == 'in' else search_value
+            matched = []
+            for row in rows:
+                value = row.get(column)
+                if value is None:
+                    continue
+                try:
+                    if compare(coerce(value), target):
+                        matched.append(row)
+                except (TypeError, ValueError, InvalidOperation):
+                    continue
+            rows = matched
+        return ResultTable(list(rows), self.columns)
+
+    def order_by(self, *columns):
+        """
+
+        :param columns: (str) columns to sort by, prefix with "-" for descending order. Integer-like values sort
+            numerically.
+        :return: (ResultTable) sorted rows
+        """
+        rows = list(self.rows)
+        for column in reversed(columns):
+            descending = column.startswith('-')
+            column = column.lstrip('-')
+            rows.sort(key=lambda row: sort_key(row.get(column)), reverse=descending)
+        return ResultTable(rows, self.columns)
+
+    def limit(self, count, offset=0):
+        """
+
+        :param count: (int) maximum number of rows
+        :param offset: (int) number of rows to skip first
+        :return: (ResultTable)
+        """
+        return ResultTable(self.rows[offset:offset + count], self.columns)
+
+    def top(self, column, count=1):
+        """
+        O(n log count) selection of the rows with the largest values in column, without sorting the whole table.
+
+        :param column: (str) column to compare
+        :param count: (int) number of rows
+        :return: (list) rows, largest first
+        """
+        return heapq.nlargest(count, self.rows, key=lambda row: sort_key(row.get(column)))
+
+    def last(self, column):
+        """
+
+        :param column: (str) column to compare
+        :return: the row with the largest value in column (the last created row for id columns), or None
+        """
+        if not self.rows:
+            return None
+        return max(self.rows, key=lambda row: sort_key(row.get(column)))
@@ -0,0 +1,293 @@
+import base64
+import hashlib
+import re
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from zeep.transports import Transport
+
+CASSETTE_HEADER = b'# echo_api cassette 1\n'
+SESSION_ID = re.compile(rb'SessionID\|([^<|\s]+)')
+SOAP_BODY = re.compile(rb'<([\w.-]+:)?Body[\s>].*</\1?Body>', re.DOTALL)
+
+
+class CassetteMissError(BaseException):
+    pass
+
+
+class Exchange:
+    """
+    One recorded response, read back from a cassette.
+    """
+
+    def __init__(self, offset, elapsed, status, content_type, body):
+        self.offset = offset
+        self.elapsed = elapsed
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    def response(self, url):
+        """
+
+        :param url: (str) url the response is for
+        :return: (requests.Response) as returned by zeep.transports.Transport.post
+        """
+        response = Response()
+        response.status_code = self.status
+        response.headers = CaseInsensitiveDict({'Content-Type': self.content_type})
+        response._content = self.body
+        response.encoding = 'utf-8'
+        response.url = url
+        return response
+
+
+class Cassette:
+    """
+    A file of recorded SOAP exchanges. After a header line, each exchange is one line of tab separated fields:
+    kind ("post" or "load"), key, seconds since the recording started, seconds the exchange took, HTTP status,
+    content type, and the base64 of the zlib compressed response body.
+
+    Requests are matched by a key hashed from the SOAPAction and the SOAP body of the request (the headers carry a
+    fresh WS-Addressing MessageID on every call), with session ids (learnt from the API_Login responses going
+    through the cassette) blanked out, so a replay matches whichever session each call is
+    made with. Opening a cassette for replay reads it once to index the file position of every exchange by key,
+    without decoding any body; a lookup is then a dict access and a single read. Identical requests are answered
+    with their recorded responses in order, and the last one is repeated once they run out.
+    """
+
+    def __init__(self, path, mode='replay'):
+        """
+
+        :param path: (str) cassette file
+        :param mode: (str) "record" to start a new cassette at path, "replay" to read one
+        """
+        if mode not in ('record', 'replay'):
+            raise ValueError('Cassette mode must be "record" or "replay", not {mode!r}.'.format(mode=mode))
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.repeats = 0
+        self._lock = threading.Lock()
+        self._sessions = set()
+        self._session_pattern = None
+        self._index = {}
+        self._started = time.perf_counter()
+        self.replay_started = None
+        if mode == 'record':
+            self._file = open(path, 'wb')
+            self._file.write(CASSETTE_HEADER)
+            self._file.flush()
+        else:
+            self._file = open(path, 'rb')
+            if self._file.readline() != CASSETTE_HEADER:
+                self._file.close()
+                raise ValueError('{path} is not an echo_api cassette.'.format(path=path))
+            self._build_index()
+
+    def _build_index(self):
+        position = self._file.tell()
+        for line in self._file:
+            kind, key, _ = line.split(b'\t', 2)
+            entry = self._index.get((kind.decode(), key.decode()))
+            if entry is None:
+                self._index[(kind.decode(), key.decode())] = [[(position, len(line))], 0]
+            else:
+                entry[0].append((position, len(line)))
+            position += len(line)
+
+    def _learn_sessions(self, body):
+        found = set(SESSION_ID.findall(body or b'')) - self._sessions
+        if found:
+            with self._lock:
+                self._sessions |= found
+                self._session_pattern = re.compile(b'|'.join(re.escape(session) for session in self._sessions))
+
+    def key(self, message, action=None):
+        """
+
+        :param message: (bytes) request body
+        :param action: (str, optional) SOAPAction header
+        :return: (str) key the request is recorded and looked up under
+        """
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        body = SOAP_BODY.search(message)
+        if body is not None:
+            message = body.group(0)
+        if self._session_pattern is not None:
+            message = self._session_pattern.sub(b'{session}', message)
+        digest = hashlib.sha1((action or '').strip('"').encode('utf-8'))
+        digest.update(message)
+        return digest.hexdigest()
+
+    def record(self, kind, key, started, elapsed, status, content_type, body):
+        """
+
+        :param kind: (str) "post" for SOAP calls, "load" for WSDL and XSD downloads
+        :param key: (str) from key(), or the url of a download
+        :param started: (float) time.perf_counter() when the request was sent
+        :param elapsed: (float) seconds until the response arrived
+        :param status: (int) HTTP status
+        :param content_type: (str) Content-Type of the response
+        :param body: (bytes) response body
+        :return:
+        """
+        self._learn_sessions(body)
+        line = '\t'.join((kind, key, '{:.6f}'.format(started - self._started), '{:.6f}'.format(elapsed), str(status),
+                          content_type or '', base64.b64encode(zlib.compress(body or b'')).decode('ascii')))
+        with self._lock:
+            self._file.write(line.encode('utf-8') + b'\n')
+            self._file.flush()
+
+    def play(self, kind, key):
+        """
+
+        :param kind: (str) "post" or "load"
+        :param key: (str) from key(), or the url of a download
+        :return: (Exchange) the next recorded response to the request
+        """
+        with self._lock:
+            if self.replay_started is None:
+                self.replay_started = time.perf_counter()
+            entry = self._index.get((kind, key))
+            if entry is None:
+                self.misses += 1
+                raise CassetteMissError('No recorded {kind} matches key {key} in {path}.'.format(
+                    kind=kind, key=key, path=self.path))
+            positions, played = entry
+            if played < len(positions):
+                entry[1] += 1
+            else:
+                self.repeats += 1
+            self.hits += 1
+            position, length = positions[min(played, len(positions) - 1)]
+            self._file.seek(position)
+            line = self._file.read(length)
+        _, _, offset, elapsed, status, content_type, body = line.rstrip(b'\n').split(b'\t')
+        body = zlib.decompress(base64.b64decode(body))
+        self._learn_sessions(body)
+        return Exchange(float(offset), float(elapsed), int(status), content_type.decode('utf-8'), body)
+
+    def rewind(self):
+        """
+        Starts the replay over, so identical requests get their first recorded response again.
+        """
+        with self._lock:
+            self.replay_started = None
+            for entry in self._index.values():
+                entry[1] = 0
+
+    def stats(self):
+        """
+
+        :return: (dict) number of recorded exchanges, hits, misses and repeated responses
+        """
+        return {'exchanges': sum(len(positions) for positions, _ in self._index.values()), 'hits': self.hits,
+                'misses': self.misses, 'repeats': self.repeats}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def open_cassette(path, mode='replay'):
+    """
+    Connections configured with the same cassette share one Cassette, so that a pool of them records to (or replays
+    from) a single file.
+
+    :param path: (str) cassette file
+    :param mode: (str) "record" or "replay"
+    :return: (Cassette)
+    """
+    with _cassettes_lock:
+        cassette = _cassettes.get((path, mode))
+        if cassette is None:
+            cassette = _cassettes[(path, mode)] = Cassette(path, mode)
+        return cassette
+
+
+def _remote(url):
+    return urlparse(url).scheme in ('http', 'https')
+
+
+class RecordingTransport(Transport):
+    """
+    zeep transport that makes every call over the network and records it, along with remote WSDL and XSD downloads,
+    to a Cassette.
+    """
+
+    def __init__(self, cassette, **kwargs):
+        """
+
+        :param cassette: (Cassette) opened in "record" mode
+        :param kwargs: passed on to zeep.transports.Transport
+        """
+        super(RecordingTransport, self).__init__(**kwargs)
+        self.cassette = cassette
+
+    def post(self, address, message, headers):
+        started = time.perf_counter()
+        response = super(RecordingTransport, self).post(address, message, headers)
+        self.cassette.record('post', self.cassette.key(message, headers.get('SOAPAction')), started,
+                             time.perf_counter() - started, response.status_code,
+                             response.headers.get('Content-Type', 'text/xml'), response.content)
+        return response
+
+    def load(self, url):
+        started = time.perf_counter()
+        content = super(RecordingTransport, self).load(url)
+        if _remote(url):
+            self.cassette.record('load', url, started, time.perf_counter() - started, 200, '', content)
+        return content
+
+
+class ReplayTransport(Transport):
+    """
+    zeep transport that answers calls and remote WSDL and XSD downloads from a Cassette, without any network access.
+
+    With speed 0 responses are returned as soon as they are found, which isolates the CPU cost of the client. With a
+    speed, each response is held back for its recorded duration divided by speed: 1 reproduces the recorded latency,
+    10 compresses it tenfold. pace additionally holds each response until its recorded time since the start of the
+    recording, divided by speed, has passed since the cassette started replaying, so that a day of traffic comes back
+    with its original rhythm.
+    """
+
+    def __init__(self, cassette, speed=0, pace=False, **kwargs):
+        """
+
+        :param cassette: (Cassette) opened in "replay" mode
+        :param speed: (float) divides the recorded timings; 0 answers immediately
+        :param pace: (bool) keep the recorded spacing between responses, scaled by speed
+        :param kwargs: passed on to zeep.transports.Transport
+        """
+        super(ReplayTransport, self).__init__(**kwargs)
+        self.cassette = cassette
+        self.speed = speed
+        self.pace = pace
+
+    def post(self, address, message, headers):
+        started = time.perf_counter()
+        exchange = self.cassette.play('post', self.cassette.key(message, headers.get('SOAPAction')))
+        if self.speed:
+            release = started + exchange.elapsed / self.speed
+            if self.pace:
+                release = max(release, self.cassette.replay_started + exchange.offset / self.speed)
+            delay = release - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return exchange.response(address)
+
+    def load(self, url):
+        if _remote(url):
+            return self.cassette.play('load', url).body
+        return super(ReplayTransport, self).load(url)
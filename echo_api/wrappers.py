@@ -1,20 +1,50 @@
 import functools
+import inspect
 
 
-def wrap_method(cls, name, wrapper_method_name):
-    # This unbound method will be pulled from the superclass.
-    wrapped = getattr(cls, name, wrapper_method_name)
+def wrap_method(method, wrapper):
+    """
 
-    @functools.wraps(wrapped)
-    def wrapper(self, *args, **kwargs):
-        wrapper_method = getattr(self, wrapper_method_name)
-        return wrapper_method(wrapped.__get__(self, cls), *args, **kwargs)
+    :param method: (bound method) method to wrap
+    :param wrapper: (bound method) called as wrapper(method, *args, **kwargs) in place of method(*args, **kwargs)
+    :return: (function) the wrapped method, carrying the name and docstring of method
+    """
+    @functools.wraps(method)
+    def wrapped(*args, **kwargs):
+        return wrapper(method, *args, **kwargs)
 
-    return wrapper
+    return wrapped
 
 
 def wrap_methods(cls):
-    for wrapper_method_name in cls.WRAPPER_METHOD_NAMES:
-        for name in cls.WRAPPED_METHODS:
-            setattr(cls, name, wrap_method(cls, name, wrapper_method_name))
-    return cls
\ No newline at end of file
+    """
+    Class decorator that resolves the signature of each of cls.WRAPPED_METHODS once, into cls.WRAPPED_SIGNATURES. The
+    methods of the class are left untouched: each instance wraps them for itself with bind_wrappers, so instances that
+    have every wrapper turned off call them directly.
+    """
+    signatures = {}
+    for name in cls.WRAPPED_METHODS:
+        signature = inspect.signature(getattr(cls, name))
+        # as seen from a bound method, without self
+        signatures[name] = signature.replace(parameters=list(signature.parameters.values())[1:])
+    cls.WRAPPED_SIGNATURES = signatures
+    return cls
+
+
+def bind_wrappers(instance, wrapper_method_names):
+    """
+    Wraps instance's WRAPPED_METHODS with the given wrapper methods, replacing any wrappers bound before.
+
+    :param instance: object of a class decorated with wrap_methods
+    :param wrapper_method_names: (list of str) names of the wrapper methods to apply, innermost first; an empty list
+        restores the plain methods
+    :return:
+    """
+    for name in type(instance).WRAPPED_METHODS:
+        instance.__dict__.pop(name, None)
+        if not wrapper_method_names:
+            continue
+        method = getattr(instance, name)
+        for wrapper_method_name in wrapper_method_names:
+            method = wrap_method(method, getattr(instance, wrapper_method_name))
+        instance.__dict__[name] = method
@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import Future
+
+from .api import APICallError
+
+
+class WriteBehindBuffer:
+    """
+    Opt-in buffer for edit_physician calls. Pending edits are merged per PhysicianID (later values win) and written
+    with EchoConnection.edit_physicians, so a burst of edits to one physician costs one read of its screen and at most
+    one API_UpdateData instead of one of each per edit. Each flush also makes one bulk API_GeneralQuery per chunk_size
+    physicians, which is all that physicians whose values already match cost. Pending edits are written once
+    max_pending physicians have pending edits, max_delay seconds after the first of them was buffered, or when flush()
+    is called.
+
+    example:
+    - with WriteBehindBuffer(connection, max_delay=2) as buffer:
+    -     first = buffer.edit_physician(1, FirstName="Jane")
+    -     second = buffer.edit_physician(1, LastName="Jones")
+    - second.result()  # both fields were written by one API_UpdateData
+    """
+
+    def __init__(self, connection, max_pending=100, max_delay=1.0, chunk_size=500, workers=4):
+        """
+
+        :param connection: (EchoConnection) connection the edits are written with
+        :param max_pending: (int) number of physicians with pending edits that triggers a flush
+        :param max_delay: (float) seconds an edit may stay buffered; None to only flush on size or flush()
+        :param chunk_size: (int) see EchoConnection.edit_physicians
+        :param workers: (int) see EchoConnection.edit_physicians
+        """
+        self.connection = connection
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._pending = {}
+        self._futures = {}
+        self._timer = None
+        self._closed = False
+        self._lock = threading.Lock()
+        # flushes are serialized so that edits to the same physician are written in the order they were buffered
+        self._flush_lock = threading.Lock()
+
+    def edit_physician(self, physician_id, **kwargs):
+        """
+        buffered equivalent of EchoConnection.edit_physician
+
+        :param physician_id: (int) id of physician to be edited
+        :param kwargs: see EchoConnection.add_physician for the list of fields
+        :return: (concurrent.futures.Future) resolves, once the edit has been written, to the report of
+            EchoConnection.edit_physicians for this physician ("updated" or "unchanged"), or raises APICallError
+        """
+        future = Future()
+        physician_id = int(physician_id)
+        with self._lock:
+            if self._closed:
+                raise APICallError("The write-behind buffer has been closed.")
+            self._pending.setdefault(physician_id, {}).update(kwargs)
+            self._futures.setdefault(physician_id, []).append(future)
+            full = len(self._pending) >= self.max_pending
+            if not full and self._timer is None and self.max_delay is not None:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+    def flush(self):
+        """
+        Writes every pending edit and resolves their futures.
+
+        :return: (int) number of physicians written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, futures = self._pending, self._futures
+                self._pending, self._futures = {}, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+            try:
+                report = self.connection.edit_physicians(pending, chunk_size=self.chunk_size, workers=self.workers)
+            except BaseException as error:
+                for physician_futures in futures.values():
+                    for future in physician_futures:
+                        future.set_exception(error)
+                raise
+            for physician_id, physician_futures in futures.items():
+                self._resolve(physician_id, report[physician_id], physician_futures)
+            return len(pending)
+
+    @staticmethod
+    def _resolve(physician_id, report, futures):
+        if report['status'] == 'missing':
+            error = APICallError('No Physicians matching id {physician_id}'.format(physician_id=physician_id))
+        elif report['status'] == 'error':
+            error = APICallError(report['error'])
+        elif report['status'] == 'updated' and "Error|" in report['result']:
+            error = APICallError(report['result'])
+        else:
+            error = None
+        for future in futures:
+            if error is None:
+                future.set_result(report)
+            else:
+                future.set_exception(error)
+
+    def pending(self):
+        """
+
+        :return: (int) number of physicians with edits waiting to be written
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def close(self):
+        """
+        Writes the pending edits; later edits are refused.
+
+        :return:
+        """
+        with self._lock:
+            self._closed = True
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -45,7 +45,10 @@ setup(
 
         # Indicate who your project is intended for
         'Intended Audience :: Developers',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Operating System :: Microsoft :: Windows :: Windows 10',
         'Operating System :: POSIX :: Linux',
         'Topic :: Office/Business',
@@ -56,13 +59,13 @@ setup(
 
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3 :: Only',
     ],
 
     # What does your project relate to?
     keywords='ECHO Python API SOAP',
 
-    packages = find_packages(),
+    packages = find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
 
     # Alternatively, if you want to distribute just a my_module.py, uncomment
     # this:
@@ -74,5 +77,12 @@ setup(
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=['xmlmanip', 'requests==2.20.0', 'zeep==2.3.0', 'configparser'],
 
-    python_requires='>=3.4',
+    # aiohttp is only needed for echo_api.async_api
+    extras_require={
+        'async': ['aiohttp>=3.0'],
+    },
+
+    # the lazy package exports rely on module __getattr__ (PEP 562) and the pickled WSDL definitions on
+    # Pickler.reducer_override (3.8)
+    python_requires='>=3.8',
 )
\ No newline at end of file
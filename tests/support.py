@@ -0,0 +1,61 @@
+"""
+Helpers for the offline tests: a benchmarks.fake_echo server per test case, with fresh tables for every test, and
+connections configured against it.
+"""
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import fixtures
+from benchmarks.fake_echo import EchoData, serve_in_thread
+from echo_api.api import EchoConnection
+from echo_api.cache import SCREEN_CACHE
+
+
+class FakeEchoTestCase(unittest.TestCase):
+    """
+    Every test starts with rows rows in each table of the fake service and an empty screen cache.
+    """
+    rows = 20
+    server_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = serve_in_thread(data=EchoData(cls.rows), **cls.server_options)
+        cls.settings = fixtures.settings(cls.server.wsdl_url, cls.server.endpoint)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.data = EchoData(self.rows)
+        SCREEN_CACHE.invalidate()
+
+    def connection(self, connection_class=EchoConnection, settings=None, **kwargs):
+        """
+
+        :param connection_class: (class) EchoConnection or a subclass
+        :param settings: (Settings, optional) defaults to the settings of the fake server
+        :param kwargs: (kwargs) passed on to connection_class
+        :return: connection_class instance
+        """
+        return connection_class(settings or self.settings, **kwargs)
+
+    def temporary_directory(self):
+        """
+
+        :return: (str) directory removed when the test ends
+        """
+        directory = tempfile.mkdtemp(prefix='echo_api_test')
+        self.addCleanup(shutil.rmtree, directory, True)
+        return directory
+
+    def table(self, table):
+        """
+
+        :param table: (str) table of the fake service
+        :return: (OrderedDict) {primary key: row} as currently stored by the fake service
+        """
+        return self.server.data.tables[table]
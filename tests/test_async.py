@@ -0,0 +1,164 @@
+import asyncio
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from benchmarks import fixtures
+from echo_api.api import APICallError
+from echo_api.checkpoint import Checkpoint
+from echo_api.metrics import Metrics
+
+from .support import FakeEchoTestCase
+
+if aiohttp is not None:
+    from echo_api.async_api import AsyncEchoConnection
+
+
+@unittest.skipIf(aiohttp is None, 'the async extra is not installed')
+class TestAsyncConnection(FakeEchoTestCase):
+
+    def run_with(self, coroutine_function, **kwargs):
+        # the WSDL is parsed before the loop starts, the calls all run inside it
+        connection = self.connection(AsyncEchoConnection, **kwargs).prepare()
+
+        async def main():
+            async with connection:
+                return await coroutine_function(connection)
+
+        return asyncio.run(main())
+
+    def test_concurrent_reads(self):
+        async def show(connection):
+            return await asyncio.gather(*[connection.show_physician(number) for number in range(1, 11)])
+
+        physicians = self.run_with(show)
+        self.assertEqual([physician[0]['PhysicianID'] for physician in physicians],
+                         [str(number) for number in range(1, 11)])
+
+    def test_client_built_inside_the_loop(self):
+        async def show(connection):
+            return await connection.show_office(3)
+
+        connection = self.connection(AsyncEchoConnection)
+
+        async def main():
+            async with connection:
+                return await show(connection)
+
+        self.assertEqual(asyncio.run(main())['OfficeID'], '3')
+
+    def test_writes(self):
+        async def write(connection):
+            await connection.edit_physician(2, LastName='Async')
+            await connection.add_contact_log_entry(2, Subject='async', Notes='from a coroutine')
+            await connection.add_medical_license(2, LicenseNumber='ASYNC-1')
+            with self.assertRaises(APICallError):
+                await connection.get_contact_log(self.rows + 1)
+
+        self.run_with(write)
+        self.assertEqual(self.table('PhysicianDetail')[2]['LastName'], 'Async')
+        guid = fixtures.physician_guid(2)
+        self.assertEqual([row['Subject'] for row in self.table('ContactLog').values() if row['EntityGuid'] == guid][-1],
+                         'async')
+        self.assertIn('ASYNC-1', [row['LicenseNumber'] for row in self.table('MedicalLicenses').values()])
+
+    def test_bulk_writes_and_guids(self):
+        async def write(connection):
+            guids = await connection.resolve_guids([1, 2, self.rows + 1])
+            await connection.add_contact_log_entries(3, [{'Subject': 'a', 'Notes': 'a'},
+                                                         {'Subject': 'b', 'Notes': 'b'}], append_only=True)
+            calls = self.server.calls
+            report = await connection.edit_physicians({3: {'LastName': 'Bulk'}, 4: {'LastName': 'Bulk'},
+                                                       self.rows + 1: {'LastName': 'Nobody'}})
+            return guids, report, self.server.calls - calls
+
+        guids, report, calls = self.run_with(write)
+        self.assertEqual(guids, {1: fixtures.physician_guid(1), 2: fixtures.physician_guid(2)})
+        guid = fixtures.physician_guid(3)
+        self.assertEqual([row['Subject'] for row in self.table('ContactLog').values() if row['EntityGuid'] == guid][1:],
+                         ['a', 'b'])
+        self.assertEqual({physician_id: item['status'] for physician_id, item in report.items()},
+                         {3: 'updated', 4: 'updated', self.rows + 1: 'missing'})
+        self.assertEqual(calls, 5)  # the bulk query, then a screen read and an update per changed physician
+        self.assertEqual(self.table('PhysicianDetail')[4]['LastName'], 'Bulk')
+
+    def test_delete_contact_log_entry_append_only(self):
+        async def delete(connection):
+            await connection.add_contact_log_entry(7, Subject='gone', Notes='soon')
+            guid = fixtures.physician_guid(7)
+            call_id = [key for key, row in self.table('ContactLog').items() if row['EntityGuid'] == guid][-1]
+            await connection.delete_contact_log_entry(7, call_id=call_id, append_only=True)
+            return call_id
+
+        self.assertNotIn(self.run_with(delete), self.table('ContactLog'))
+
+    def test_pages(self):
+        async def pages(connection):
+            sizes = [len(page) async for page in connection.iter_pages('PhysicianDetail', page_size=7)]
+            return sizes, await connection.show_physicians(page_size=6), await connection.show_physicians()
+
+        sizes, paged, whole = self.run_with(pages)
+        self.assertEqual(sizes, [7, 7, 6])
+        self.assertEqual(paged, whole)
+
+    def test_bulk_lookups_and_queries_match_the_sync_helpers(self):
+        async def read(connection):
+            return (await connection.get_physicians(range(1, self.rows + 3), chunk_size=3, workers=3),
+                    await connection.show_offices_by_id([5, 1, 5], chunk_size=1),
+                    await connection.get_physicians_medical_licenses([1, 2], chunk_size=1),
+                    (await connection.query("SELECT * FROM Offices WHERE OfficeID > 10")).filter(OfficeID__lt=13).rows,
+                    [row async for row in connection.iter_query("SELECT * FROM ContactLog")],
+                    [row async for row in connection.iter_practices(page_size=3)])
+
+        sync = self.connection()
+        self.assertEqual(self.run_with(read), (
+            sync.get_physicians(range(1, self.rows + 3)), sync.show_offices_by_id([1, 5]),
+            sync.get_physicians_medical_licenses([1, 2]),
+            sync.query("SELECT * FROM Offices WHERE OfficeID > 10").filter(OfficeID__lt=13).rows,
+            list(sync.iter_query("SELECT * FROM ContactLog")), list(sync.iter_practices(page_size=3))))
+
+    def test_changes_since(self):
+        checkpoint = Checkpoint('{directory}/checkpoint.json'.format(directory=self.temporary_directory()))
+
+        async def poll(connection):
+            first = [row async for row in connection.changes_since('PhysicianDetail', checkpoint=checkpoint)]
+            await connection.edit_physician(4, DateUpdated='2030-01-01T00:00:00')
+            second = [row async for row in connection.changes_since('PhysicianDetail', checkpoint=checkpoint)]
+            return len(first), [row['PhysicianID'] for row in second]
+
+        self.assertEqual(self.run_with(poll), (self.rows, ['4']))
+        self.assertEqual(Checkpoint(checkpoint.path).get('PhysicianDetail'), '2030-01-01T00:00:00')
+
+    def test_metrics_and_response_cache(self):
+        metrics = Metrics()
+
+        async def read(connection):
+            await connection.show_physician(1)
+            calls = self.server.calls
+            await connection.show_physician(1)
+            cached = self.server.calls - calls
+            await connection.edit_physician(1, LastName='Cached')
+            return cached, (await connection.show_physician(1))[0]['LastName']
+
+        self.assertEqual(self.run_with(read, metrics=metrics, response_cache_size=10), (0, 'Cached'))
+        operations = metrics.snapshot()['operations']
+        self.assertEqual(operations['show_physician']['calls'], 3)
+        self.assertTrue(operations['show_physician']['helper'])
+        self.assertGreater(operations['show_physician']['parse']['count'], 0)
+        self.assertEqual(operations['API_UpdateData']['calls'], 1)
+        self.assertEqual(metrics.snapshot()['logins'], 1)
+
+    def test_expired_sessions_are_renewed(self):
+        async def show(connection):
+            await connection.show_physician(1)
+            self.server.sessions.clear()
+            return await connection.show_physician(2)
+
+        self.assertEqual(self.run_with(show)[0]['PhysicianID'], '2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+import logging
+import os
+import threading
+import unittest
+
+from benchmarks import fixtures
+from echo_api.api import APICallError, EchoDebug
+from echo_api.cache import ResponseCache, WSDL_CACHE
+from echo_api.checkpoint import Checkpoint
+from echo_api.metrics import Metrics
+from echo_api.mirror import EchoMirror
+from echo_api.query import Record, ResultTable
+
+from .support import FakeEchoTestCase
+
+
+class TestReads(FakeEchoTestCase):
+
+    def test_show_helpers(self):
+        connection = self.connection()
+        physician = connection.show_physician(3)
+        self.assertEqual([row['PhysicianID'] for row in physician], ['3'])
+        self.assertEqual(physician[0]['EntityGuid'], fixtures.physician_guid(3))
+        self.assertEqual(connection.show_office(4)['OfficeID'], '4')
+        self.assertEqual([row['PhysicianID'] for row in connection.show_physicians()],
+                         [str(number) for number in range(1, self.rows + 1)])
+        self.assertEqual(connection.show_physicians(show_all=False)['PhysicianID'], str(self.rows))
+        self.assertTrue(all(row['OfficeID'] == row['PracticeID'] for row in connection.show_practices()))
+        self.assertEqual([row['PhysicianID'] for row in connection.show_physician_medical_licenses(2)], ['2'])
+        self.assertEqual([row['EntityGuid'] for row in connection.show_physician_contact_log(2)],
+                         [fixtures.physician_guid(2)])
+        self.assertEqual(len(connection.show_contact_logs()), self.rows)
+        self.assertEqual(len(connection.show_medical_licenses()), self.rows)
+
+    def test_one_login_per_connection(self):
+        metrics = Metrics()
+        connection = self.connection(metrics=metrics)
+        for physician_id in range(1, 6):
+            connection.show_physician(physician_id)
+        self.assertEqual(metrics.snapshot()['logins'], 1)
+
+    def test_expired_sessions_are_renewed(self):
+        metrics = Metrics()
+        connection = self.connection(metrics=metrics)
+        connection.show_physician(1)
+        self.server.sessions.clear()
+        self.assertEqual(connection.show_physician(2)[0]['PhysicianID'], '2')
+        self.assertEqual(metrics.snapshot()['relogins'], 1)
+
+    def test_errors_raise(self):
+        connection = self.connection()
+        with self.assertRaises(APICallError):
+            connection.query("SELECT Missing FROM PhysicianDetail")
+        with self.assertRaises(APICallError):
+            connection.get_contact_log(self.rows + 1)
+
+    def test_response_cache_is_invalidated_by_writes(self):
+        connection = self.connection(response_cache_size=10)
+        connection.get_physician(1)
+        calls = self.server.calls
+        connection.get_physician(1)
+        self.assertEqual(self.server.calls, calls)
+        connection.edit_physician(1, LastName='Cached')
+        self.assertEqual(connection.show_physician(1)[0]['LastName'], 'Cached')
+
+    def test_guid_cache(self):
+        connection = self.connection()
+        self.assertEqual(connection.resolve_guids([1, 2, self.rows + 1]),
+                         {1: fixtures.physician_guid(1), 2: fixtures.physician_guid(2)})
+        calls = self.server.calls
+        self.assertEqual(connection._get_physician_guid(2), fixtures.physician_guid(2))
+        self.assertEqual(self.server.calls, calls)
+
+    def test_bulk_lookups(self):
+        connection = self.connection()
+        ids = list(range(1, self.rows + 3))
+        self.assertEqual(sorted(connection.get_physicians(ids, chunk_size=3, workers=3)), ids[:self.rows])
+        self.assertEqual([row['OfficeID'] for row in connection.show_offices_by_id([5, 1, 5], chunk_size=1)],
+                         ['1', '5'])
+        licenses = connection.get_physicians_medical_licenses([1, 2], chunk_size=1)
+        self.assertEqual(sorted(licenses), [1, 2])
+
+    def test_bulk_lookups_follow_the_row_settings(self):
+        typed = self.connection(typed_rows=True)
+        self.assertEqual(typed.get_physicians([3])[3]['PhysicianID'], 3)
+        self.assertEqual(typed.show_offices_by_id([2])[0]['OfficeID'], 2)
+        self.assertEqual(typed.get_physicians_medical_licenses([2])[2][0]['AutoID'], 2)
+        self.assertEqual(typed.resolve_guids([2]), {2: fixtures.physician_guid(2)})
+        compact = self.connection(compact_rows=True)
+        self.assertIsInstance(compact.show_physicians_by_id([1, 2])[1], Record)
+        self.assertIsInstance(compact.get_offices([4])[4], Record)
+        status = self.table('PhysicianDetail')[3]['EnrollmentStatusID']
+        self.assertEqual(typed.edit_physicians({3: {'EnrollmentStatusID': status}}), {3: {'status': 'unchanged'}})
+
+    def test_query_and_iter_query(self):
+        connection = self.connection()
+        table = connection.query("SELECT * FROM Offices WHERE OfficeID > 10")
+        self.assertEqual(len(table), self.rows - 10)
+        self.assertEqual(table.filter(OfficeID__lt=13).order_by('-OfficeID')[0]['OfficeID'], '12')
+        self.assertEqual(sum(1 for _ in connection.iter_query("SELECT * FROM ContactLog")), self.rows)
+        self.assertEqual(sum(1 for _ in connection.iter_physicians()), self.rows)
+
+    def test_iter_pages(self):
+        connection = self.connection()
+        pages = list(connection.iter_pages('PhysicianDetail', page_size=7))
+        self.assertEqual([len(page) for page in pages], [7, 7, 6])
+        self.assertEqual([row['PhysicianID'] for page in pages for row in page],
+                         [str(number) for number in range(1, self.rows + 1)])
+        self.assertEqual(connection.show_physicians(page_size=6), connection.show_physicians())
+        self.assertEqual(connection.show_practices(page_size=2), connection.show_practices())
+
+    def test_pages_skip_rows_without_a_key(self):
+        connection = self.connection()
+        self.table('PhysicianDetail')[self.rows + 1] = {'LastName': 'No key'}
+        self.table('PhysicianDetail')[self.rows + 2] = {'PhysicianID': '-1', 'LastName': 'Placeholder'}
+        # the row without a key sorts last, so it ends the first, full, page
+        pages = list(connection.iter_pages('PhysicianDetail', page_size=self.rows + 2))
+        self.assertEqual([len(page) for page in pages], [self.rows + 2, 0])
+        self.assertEqual(connection.show_physicians(page_size=self.rows + 2), connection.show_physicians())
+        self.assertEqual(len(connection.show_physicians(page_size=7)), self.rows)
+        with self.assertRaises(APICallError):
+            connection._page_cursor(ResultTable([{'LastName': 'No key'}]), 'PhysicianDetail', 'PhysicianID')
+
+    def test_changes_since(self):
+        connection = self.connection()
+        checkpoint = Checkpoint('{directory}/checkpoint.json'.format(directory=self.temporary_directory()))
+        self.assertEqual(len(list(connection.changes_since('PhysicianDetail', checkpoint=checkpoint))), self.rows)
+        self.assertEqual(list(connection.changes_since('PhysicianDetail', checkpoint=checkpoint)), [])
+        connection.edit_physician(4, DateUpdated='2030-01-01T00:00:00')
+        changed = list(connection.changes_since('PhysicianDetail', checkpoint=checkpoint))
+        self.assertEqual([row['PhysicianID'] for row in changed], ['4'])
+        self.assertEqual(Checkpoint(checkpoint.path).get('PhysicianDetail'), '2030-01-01T00:00:00')
+
+    def test_coalesced_reads(self):
+        connection = self.connection()
+        self.server.latency = 0.2
+        self.addCleanup(setattr, self.server, 'latency', 0.0)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(connection.get_physician(1))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(connection.single_flight.stats()['coalesced'], 3)
+
+    def test_mirror(self):
+        connection = self.connection()
+        mirror = EchoMirror(':memory:', connection)
+        self.addCleanup(mirror.close)
+        self.assertEqual(mirror.snapshot(chunk_size=7)['PhysicianDetail'], self.rows)
+        physician = mirror.show_physician(3)[0]
+        self.assertEqual(physician['PhysicianID'], 3)
+        self.assertEqual(physician['LastName'], connection.show_physician(3)[0]['LastName'])
+        self.assertEqual(len(mirror.show_practices()), len(connection.show_practices()))
+
+    def test_metrics(self):
+        metrics = Metrics()
+        connection = self.connection(metrics=metrics)
+        connection.show_physicians()
+        with self.assertRaises(APICallError):
+            connection.query("SELECT Missing FROM PhysicianDetail")
+        operations = metrics.snapshot()['operations']
+        self.assertEqual(operations['show_physicians']['calls'], 1)
+        self.assertEqual(operations['API_GeneralQuery']['calls'], 2)
+        self.assertEqual(sum(operations['API_GeneralQuery']['errors'].values()), 1)
+        self.assertIn('echo_api_calls_total', metrics.prometheus())
+
+
+class TestDebug(FakeEchoTestCase):
+
+    def test_logging_is_left_to_the_application(self):
+        logger = logging.getLogger('echo_api.debug')
+        handlers, level = list(logger.handlers), logger.level
+        connection = self.connection(EchoDebug, show_xml=False)
+        self.assertEqual((logger.handlers, logger.level), (handlers, level))
+        with self.assertLogs(logger, 'DEBUG') as logs:
+            connection.show_physician(1)
+        self.assertTrue(any('API_GetData' in message for message in logs.output))
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_writes_match_reads_the_way_the_service_compares_values(self):
+        cache = ResponseCache(10)
+        guid = fixtures.physician_guid(10)
+        contact_log = ('CallLog', 'Symed', '@EntityGuid|{guid}|guid'.format(guid=guid))
+        physician = ('PhysicianDetail', 'Symed', '@PhysicianID|10|int')
+        cache.set(contact_log, 'contact log')
+        cache.set(physician, 'physician')
+        self.assertNotEqual(guid, guid.upper())
+        cache.invalidate_write('@EntityGuid|{{{guid}}}|guid'.format(guid=guid.upper()), 'CallLog')
+        self.assertIsNone(cache.get(contact_log))
+        self.assertEqual(cache.get(physician), 'physician')
+        cache.invalidate_write('@PhysicianID|010|int')
+        self.assertIsNone(cache.get(physician))
+
+
+class TestConnect(FakeEchoTestCase):
+
+    def test_connections_are_lazy(self):
+        calls = self.server.calls
+        connection = self.connection()
+        self.assertEqual(self.server.calls, calls)
+        self.assertIs(connection.connect(), connection)
+        self.assertIsNotNone(connection.session_id)
+
+    def test_parsed_definitions_persist_between_processes(self):
+        cache_dir = self.temporary_directory()
+        settings = fixtures.settings(self.server.wsdl_url, self.server.endpoint, wsdl_cache_dir=cache_dir)
+        self.addCleanup(WSDL_CACHE.invalidate)
+        WSDL_CACHE.invalidate()
+        self.connection(settings=settings).connect()
+        # what a new process sees: nothing in memory, the pickled definition on disk
+        WSDL_CACHE.invalidate()
+        before = WSDL_CACHE.stats()
+        self.assertEqual(self.connection(settings=settings).show_office(2)['OfficeID'], '2')
+        after = WSDL_CACHE.stats()
+        self.assertEqual((after['disk_hits'] - before['disk_hits'], after['misses'] - before['misses']), (1, 0))
+        WSDL_CACHE.invalidate(cache_dir=cache_dir)
+        self.assertFalse([name for name in os.listdir(cache_dir) if name.endswith('.pickle')])
+
+    def test_failed_definition_saves_are_logged(self):
+        cache_dir = self.temporary_directory()
+        with self.assertLogs('echo_api.cache', 'WARNING'):
+            WSDL_CACHE._save_definition(cache_dir, 'unpicklable', lambda: None)
+        self.assertEqual(os.listdir(cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
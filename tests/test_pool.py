@@ -0,0 +1,123 @@
+import threading
+import unittest
+
+from echo_api.api import APICallError
+from echo_api.pool import EchoConnectionPool, PoolClosedError, PoolExhaustedError
+from echo_api.write_behind import WriteBehindBuffer
+
+from .support import FakeEchoTestCase
+
+
+class TestPool(FakeEchoTestCase):
+
+    def pool(self, **kwargs):
+        pool = EchoConnectionPool(self.settings, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        pool = self.pool(min_size=1, max_size=2)
+        with pool.connection() as first:
+            first.show_physician(1)
+        with pool.connection() as second:
+            second.show_physician(2)
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats(), {'size': 1, 'idle': 1, 'max_size': 2})
+
+    def test_exhausted_and_closed(self):
+        pool = self.pool(min_size=0, max_size=1)
+        connection = pool.acquire()
+        with self.assertRaises(PoolExhaustedError):
+            pool.acquire(timeout=0.05)
+        pool.release(connection)
+        pool.close()
+        with self.assertRaises(PoolClosedError):
+            pool.acquire()
+
+    def test_service_errors_keep_the_connection(self):
+        pool = self.pool(min_size=0, max_size=1)
+        with self.assertRaises(APICallError):
+            with pool.connection() as connection:
+                connection.query("SELECT Missing FROM Offices")
+        with self.assertRaises(KeyError):
+            with pool.connection() as connection:
+                raise KeyError('discarded')
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_concurrent_use(self):
+        pool = self.pool(min_size=0, max_size=3)
+        results = {}
+
+        def show(physician_id):
+            with pool.connection(timeout=5) as connection:
+                results[physician_id] = connection.show_physician(physician_id)[0]['PhysicianID']
+
+        threads = [threading.Thread(target=show, args=(number,)) for number in range(1, 11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {number: str(number) for number in range(1, 11)})
+        self.assertLessEqual(pool.stats()['size'], 3)
+
+    def test_reads_are_coalesced_across_connections(self):
+        pool = self.pool(min_size=4, max_size=4)
+        self.server.latency = 0.2
+        self.addCleanup(setattr, self.server, 'latency', 0.0)
+        connections = [pool.acquire() for _ in range(4)]
+        results = []
+        threads = [threading.Thread(target=lambda connection=connection: results.append(connection.get_physician(1)))
+                   for connection in connections]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for connection in connections:
+            self.assertIs(connection.single_flight, pool.single_flight)
+            pool.release(connection)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(pool.single_flight.stats()['coalesced'], 3)
+        self.assertIsNone(self.pool(min_size=1, coalesce_reads=False).single_flight)
+
+
+class TestWriteBehind(FakeEchoTestCase):
+
+    def test_edits_are_merged(self):
+        connection = self.connection()
+        with WriteBehindBuffer(connection, max_delay=None) as buffer:
+            first = buffer.edit_physician(1, FirstName='Jane')
+            second = buffer.edit_physician('1', LastName='Jones')
+            missing = buffer.edit_physician(self.rows + 1, LastName='Nobody')
+            self.assertEqual(buffer.pending(), 2)
+        self.assertEqual(first.result()['changes'], {'FirstName': 'Jane', 'LastName': 'Jones'})
+        self.assertIs(first.result(), second.result())
+        with self.assertRaises(APICallError):
+            missing.result()
+        row = self.table('PhysicianDetail')[1]
+        self.assertEqual((row['FirstName'], row['LastName']), ('Jane', 'Jones'))
+        with self.assertRaises(APICallError):
+            buffer.edit_physician(1, FirstName='Closed')
+
+    def test_burst_costs_one_read_and_one_write(self):
+        connection = self.connection().connect()
+        buffer = WriteBehindBuffer(connection, max_delay=None)
+        futures = [buffer.edit_physician(4, **{field: 'Burst'}) for field in ('FirstName', 'LastName', 'MiddleName')]
+        calls = self.server.calls
+        buffer.close()
+        # the bulk query, the screen of physician 4 and one API_UpdateData
+        self.assertEqual(self.server.calls - calls, 3)
+        self.assertEqual(len(futures[0].result()['changes']), 3)
+
+    def test_flush_triggers(self):
+        buffer = WriteBehindBuffer(self.connection(), max_pending=2, max_delay=0.05)
+        self.addCleanup(buffer.close)
+        delayed = buffer.edit_physician(3, LastName='Later')
+        self.assertEqual(delayed.result(timeout=5)['status'], 'updated')
+        buffer.edit_physician(4, LastName='Full')
+        buffer.edit_physician(5, LastName='Full')
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(self.table('PhysicianDetail')[5]['LastName'], 'Full')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import pickle
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from benchmarks import fixtures
+from echo_api.api import APICallError, Helpers
+from echo_api.query import QueryError, Record, ResultTable, parse_datetime, record_class, row_decoder, \
+    sort_key
+
+
+class TestResultTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = ResultTable([
+            {'ID': '1', 'Name': 'Jones', 'Score': '10', 'Active': 'true'},
+            {'ID': '2', 'Name': 'johnson', 'Score': '9'},
+            {'ID': '10', 'Name': 'Smith', 'Score': 'n/a', 'Active': 'false'},
+            {'ID': '-1'},
+        ])
+
+    def ids(self, rows):
+        return [row['ID'] for row in rows]
+
+    def test_equality_lookups_convert_to_the_type_of_the_value(self):
+        self.assertEqual(self.ids(self.table.filter(ID=10)), ['10'])
+        self.assertEqual(self.ids(self.table.filter(Name='JONES')), ['1'])
+        self.assertEqual(self.ids(self.table.filter(Active=True)), ['1'])
+        self.assertEqual(self.ids(self.table.filter(ID__in=[1, 2])), ['1', '2'])
+
+    def test_comparisons_skip_missing_and_unconvertible_values(self):
+        self.assertEqual(self.ids(self.table.filter(Score__gt=9)), ['1'])
+        self.assertEqual(self.ids(self.table.filter(Score__ne=9)), ['1'])
+        self.assertEqual(self.ids(self.table.filter(Name__startswith='jo', ID__ne=-1)), ['1', '2'])
+        self.assertEqual(self.ids(self.table.filter(Name__contains='SMI')), ['10'])
+
+    def test_unknown_lookup(self):
+        with self.assertRaises(QueryError):
+            self.table.filter(ID__like=1)
+
+    def test_ordering_is_numeric_for_integers(self):
+        self.assertEqual(self.ids(self.table.order_by('ID')), ['-1', '1', '2', '10'])
+        self.assertEqual(self.ids(self.table.order_by('-ID')), ['10', '2', '1', '-1'])
+        self.assertEqual(self.ids(self.table.order_by('ID').limit(2, offset=1)), ['1', '2'])
+        self.assertEqual(self.ids(self.table.top('ID', 2)), ['10', '2'])
+        self.assertEqual(self.table.last('ID')['ID'], '10')
+        self.assertIsNone(ResultTable([]).last('ID'))
+
+    def test_sort_key(self):
+        values = ['b', None, ' 7', '+3', '-', '10', 'A', '-2', 4, Decimal('5.5')]
+        self.assertEqual(sorted(values, key=sort_key), [None, '-2', '+3', 4, Decimal('5.5'), ' 7', '10', '-', 'A', 'b'])
+
+
+class TestDecoding(unittest.TestCase):
+
+    def test_parse_datetime(self):
+        self.assertEqual(parse_datetime('2018-01-02'), datetime(2018, 1, 2))
+        self.assertEqual(parse_datetime('2018-01-02T03:04:05.123-05:00'), datetime(2018, 1, 2, 3, 4, 5))
+        with self.assertRaises(ValueError):
+            parse_datetime('2018-13-02T00:00:00')
+
+    def test_typed_rows(self):
+        dataset = fixtures.dataset('MedicalLicenses', 3)
+        rows = list(Helpers._iter_rows(dataset, typed=True))
+        self.assertEqual(rows[0]['AutoID'], 1)
+        self.assertEqual(rows[0]['LicenseNumber'], 'LIC00000001')
+        self.assertIs(rows[0]['Active'], True)
+        self.assertIsInstance(rows[0]['DateUpdated'], datetime)
+        self.assertEqual(rows[0]['DateUpdated'], parse_datetime(fixtures.rows('MedicalLicenses', 1)[0]['DateUpdated']))
+        self.assertEqual([row['AutoID'] for row in Helpers._search_schema(dataset, typed=True, AutoID__gt=1)], [2, 3])
+
+    def test_decoders_are_cached_per_schema(self):
+        self.assertIs(row_decoder(fixtures.dataset('Offices', 1)), row_decoder(fixtures.dataset('Offices', 5)))
+        self.assertIsNot(row_decoder(fixtures.dataset('Offices', 1)), row_decoder(fixtures.dataset('ContactLog', 1)))
+
+    def test_repeated_guids_share_one_uuid(self):
+        rows = list(Helpers._iter_rows(fixtures.render('ContactLog', [
+            {'CallID': '1', 'EntityGuid': fixtures.physician_guid(1)},
+            {'CallID': '2', 'EntityGuid': fixtures.physician_guid(1)}]), typed=True))
+        self.assertEqual(rows[0]['EntityGuid'], UUID(fixtures.physician_guid(1)))
+        self.assertIs(rows[0]['EntityGuid'], rows[1]['EntityGuid'])
+
+    def test_unconvertible_values_are_kept(self):
+        dataset = fixtures.render('Offices', [{'OfficeID': 'none', 'Name': 'Office'}], ['OfficeID', 'Name'])
+        self.assertEqual(list(Helpers._iter_rows(dataset, typed=True))[0]['OfficeID'], 'none')
+
+    def test_whole_datasets_parse_to_the_streamed_rows(self):
+        datasets = [fixtures.dataset('ContactLog', 5), fixtures.render('Offices', [{'OfficeID': '1'}, {'Name': 'x'}]),
+                    fixtures.dataset('Offices', 2).replace('<Table>', '<Table xmlns="urn:rows">')]
+        for dataset in datasets:
+            for options in ({}, {'typed': True}, {'compact': True}, {'typed': True, 'compact': True}):
+                self.assertEqual(Helpers._parse_rows(dataset, **options), list(Helpers._iter_rows(dataset, **options)))
+        self.assertEqual(len(Helpers._parse_rows(datasets[2])), 2)
+
+    def test_error_responses_raise(self):
+        with self.assertRaises(APICallError):
+            list(Helpers._iter_rows("Error|Invalid column name 'x'"))
+        with self.assertRaises(APICallError):
+            Helpers._result_table("Error|Invalid column name 'x'")
+
+
+class TestRecord(unittest.TestCase):
+
+    def test_compact_rows_match_the_dict_rows(self):
+        dataset = fixtures.dataset('PhysicianDetail', 5)
+        rows = Helpers._search_schema(dataset, PhysicianID__ne=-1)
+        records = Helpers._search_schema(dataset, compact=True, PhysicianID__ne=-1)
+        self.assertTrue(all(isinstance(record, Record) for record in records))
+        self.assertEqual([dict(record) for record in records], [dict(row) for row in rows])
+        self.assertEqual(records[0].LastName, rows[0]['LastName'])
+
+    def test_mapping_behaviour(self):
+        cls = record_class(['ID', 'Last Name', 'get', 'class'])
+        self.assertIs(cls, record_class(('ID', 'Last Name', 'get', 'class')))
+        record = cls()
+        record.update({'ID': 1, 'Last Name': 'Jones', 'get': 'x'})
+        self.assertEqual(list(record), ['ID', 'Last Name', 'get'])
+        self.assertEqual(len(record), 3)
+        self.assertNotIn('class', record)
+        self.assertEqual(record.get('class', 'missing'), 'missing')
+        self.assertEqual(record.get('get'), 'x')
+        del record['get']
+        self.assertEqual(dict(record), {'ID': 1, 'Last Name': 'Jones'})
+        with self.assertRaises(KeyError):
+            record['Unknown'] = 1
+        with self.assertRaises(KeyError):
+            record['class']
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+
+
+if __name__ == '__main__':
+    unittest.main()
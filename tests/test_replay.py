@@ -0,0 +1,35 @@
+import os
+import unittest
+
+from benchmarks import fixtures
+from benchmarks.fake_echo import EchoData, serve_in_thread
+from echo_api.api import EchoConnection
+from echo_api.replay import CassetteMissError, open_cassette
+
+from .support import FakeEchoTestCase
+
+
+class TestReplay(FakeEchoTestCase):
+
+    def test_record_then_replay_offline(self):
+        # a server of its own, so that it can be shut down before replaying
+        server = serve_in_thread(data=EchoData(self.rows))
+        path = os.path.join(self.temporary_directory(), 'calls.cassette')
+        options = {'cassette_file': path}
+        recording = EchoConnection(fixtures.settings(server.wsdl_url, server.endpoint, cassette_mode='record',
+                                                     **options))
+        recorded = [recording.show_physician(number) for number in (1, 2)]
+        server.shutdown()
+        server.server_close()
+        open_cassette(path, 'record').close()
+
+        replaying = EchoConnection(fixtures.settings(server.wsdl_url, server.endpoint, cassette_mode='replay',
+                                                     **options))
+        self.assertEqual([replaying.show_physician(number) for number in (1, 2)], recorded)
+        with self.assertRaises(CassetteMissError):
+            replaying.show_physician(3)
+        self.assertEqual(open_cassette(path, 'replay').stats()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from benchmarks import fixtures
+from echo_api.api import APICallError
+
+from .support import FakeEchoTestCase
+
+
+def entry(subject):
+    return {'Subject': subject, 'Notes': 'Notes on {subject}'.format(subject=subject)}
+
+
+class TestWrites(FakeEchoTestCase):
+
+    def contact_log(self, physician_id):
+        guid = fixtures.physician_guid(physician_id)
+        return [row for row in self.table('ContactLog').values() if row['EntityGuid'] == guid]
+
+    def test_add_and_edit_physician(self):
+        connection = self.connection()
+        connection.add_physician(1, LastName='Jones', FirstName='Jane')
+        physician_id = max(self.table('PhysicianDetail'))
+        self.assertEqual(self.table('PhysicianDetail')[physician_id]['LastName'], 'Jones')
+        connection.edit_physician(physician_id, LastName='Smith')
+        self.assertEqual(self.table('PhysicianDetail')[physician_id]['LastName'], 'Smith')
+        self.assertEqual(connection.show_physician(physician_id)[0]['FirstName'], 'Jane')
+
+    def test_delete_physician(self):
+        connection = self.connection()
+        with self.assertRaises(APICallError):
+            connection.delete_physician(3)
+        connection.delete_physician(3, 1)
+        self.assertNotIn(3, self.table('PhysicianDetail'))
+
+    def test_add_and_delete_office(self):
+        connection = self.connection()
+        with self.assertRaises(APICallError):
+            connection.add_office()
+        office_id = int(connection.add_office(2).split('|')[1])
+        self.assertEqual(self.table('Offices')[office_id]['PracticeID'], '2')
+        connection.delete_office(office_id)
+        self.assertNotIn(office_id, self.table('Offices'))
+
+    def test_add_medical_license(self):
+        connection = self.connection()
+        connection.add_medical_license(2, PhysicianID=2, LicenseNumber='NEW-1', LicenseStateOfIssue='TX')
+        calls = self.server.calls
+        connection.add_medical_license(2, append_only=True, LicenseNumber='NEW-2')
+        self.assertEqual(self.server.calls - calls, 2)  # the empty MedicalLicenses dataset, then the diffgram
+        licenses = [row for row in self.table('MedicalLicenses').values() if row['PhysicianID'] == '2']
+        self.assertEqual(sorted(row['LicenseNumber'] for row in licenses), ['LIC00000002', 'NEW-1', 'NEW-2'])
+
+    def test_add_contact_log_entries(self):
+        connection = self.connection()
+        for append_only in (True, False):
+            connection.add_contact_log_entries(5, [entry('first'), entry('second')], append_only=append_only)
+        self.assertEqual([row['Subject'] for row in self.contact_log(5)[1:]],
+                         ['first', 'second', 'first', 'second'])
+        self.assertEqual(len(self.table('ContactLog')), self.rows + 4)
+        connection.add_contact_log_entry(6, Subject='single', Notes='note')
+        self.assertEqual([row['Notes'] for row in self.contact_log(6)][1:], ['note'])
+
+    def test_delete_contact_log_entry(self):
+        connection = self.connection()
+        connection.add_contact_log_entries(7, [entry('a'), entry('b'), entry('c')], append_only=True)
+        first, second, third = [int(row['CallID']) for row in self.contact_log(7)[1:]]
+        connection.delete_contact_log_entry(7, call_id=first)
+        self.assertNotIn(first, self.table('ContactLog'))
+        connection.delete_contact_log_entry(7, call_id=second, append_only=True)
+        self.assertNotIn(second, self.table('ContactLog'))
+        self.assertIn(third, self.table('ContactLog'))
+        with self.assertRaises(APICallError):
+            connection.delete_contact_log_entry(7, call_id=second)
+        with self.assertRaises(APICallError):
+            connection.delete_contact_log_entry(7, limit=1, CallID__ne='-1')
+        self.assertEqual(len(self.contact_log(7)), 2)
+
+    def test_edit_physicians(self):
+        connection = self.connection()
+        current = self.table('PhysicianDetail')[2]['LastName']
+        report = connection.edit_physicians({1: {'LastName': 'Bulk'}, '2': {'LastName': current},
+                                             self.rows + 1: {'LastName': 'Nobody'}}, chunk_size=1)
+        self.assertEqual(report[1]['status'], 'updated')
+        self.assertEqual(report[1]['changes'], {'LastName': 'Bulk'})
+        self.assertEqual(report[2], {'status': 'unchanged'})
+        self.assertEqual(report[self.rows + 1], {'status': 'missing'})
+        self.assertEqual(self.table('PhysicianDetail')[1]['LastName'], 'Bulk')
+        self.assertEqual(self.table('PhysicianDetail')[2]['LastName'], current)
+
+    def test_edit_physicians_reads_each_changed_screen_once(self):
+        connection = self.connection().connect()
+        calls = self.server.calls
+        report = connection.edit_physicians({number: {'FirstName': 'Same' if number == 3 else
+                                                      self.table('PhysicianDetail')[number]['FirstName']}
+                                             for number in range(1, 11)})
+        self.assertEqual([physician_id for physician_id, item in report.items() if item['status'] == 'updated'], [3])
+        # one bulk query, then the screen of physician 3 and its update
+        self.assertEqual(self.server.calls - calls, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()